@@ -0,0 +1,187 @@
+"""
+Admission control for /chat.
+
+Every chat turn makes several LLM calls, so a traffic spike quickly exceeds
+what the providers allow. Turns are admitted in three steps, and a turn that
+is refused gets a 429 with Retry-After right away instead of waiting for a
+provider error:
+
+1. Token buckets: one per session (a single client cannot monopolise the
+   service) and one for the whole process.
+2. A concurrency limit on turns being answered. Turns beyond it wait in a
+   bounded FIFO queue.
+3. Deadline-aware shedding: a turn is given `queue_timeout` seconds to start.
+   If the expected wait, from the queue length and the recent time per turn,
+   is already longer, it is refused on arrival rather than after the wait;
+   a queued turn whose deadline passes is dropped.
+
+However far demand exceeds capacity, an admitted turn waits at most
+`queue_timeout` before it is answered at close to the unloaded speed. The
+limits apply per worker process.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Optional
+
+from .core.utils.metrics import CHAT_REJECTIONS
+
+
+class Overloaded(Exception):
+    """Raised when a turn is not admitted; `retry_after` is in seconds."""
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """
+        Takes a token and returns 0, or returns the seconds until one is available.
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def give_back(self) -> None:
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        rate: float = 20.0,
+        burst: float = 40.0,
+        session_rate: float = 1 / 3,
+        session_burst: float = 5.0,
+        max_concurrency: int = 16,
+        max_queue: int = 64,
+        queue_timeout: float = 2.0,
+        max_sessions: int = 10000,
+        enabled: bool = True
+    ):
+        self.enabled = enabled
+        self.bucket = TokenBucket(rate, burst)
+        self.session_rate = session_rate
+        self.session_burst = session_burst
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_sessions = max_sessions
+        # Least recently used first; a bucket that is evicted starts full again
+        self._sessions: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Moving average of the time to answer a turn, for the expected queue wait
+        self._turn_seconds: Optional[float] = None
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _reject(self, reason: str, retry_after: float) -> Overloaded:
+        CHAT_REJECTIONS.labels(reason).inc()
+        return Overloaded(reason, retry_after)
+
+    def _session_bucket(self, session_id: str) -> TokenBucket:
+        bucket = self._sessions.get(session_id)
+        if bucket is None:
+            bucket = self._sessions[session_id] = TokenBucket(self.session_rate, self.session_burst)
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return bucket
+
+    def _check_rates(self, session_id: str, now: float) -> None:
+        session_bucket = self._session_bucket(session_id)
+        wait = session_bucket.take(now)
+        if wait:
+            raise self._reject("session_rate", wait)
+        wait = self.bucket.take(now)
+        if wait:
+            # Refused turns do not count against the session
+            session_bucket.give_back()
+            raise self._reject("global_rate", wait)
+
+    def expected_wait(self, position: int) -> float:
+        """
+        Seconds until the turn at queue `position` (0 is next) can start.
+        """
+        if self._turn_seconds is None:
+            return 0.0
+        return (position + 1) * self._turn_seconds / self.max_concurrency
+
+    async def _acquire(self, deadline: float) -> None:
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            return
+        position = len(self._waiters)
+        if position >= self.max_queue:
+            raise self._reject("queue_full", max(self.expected_wait(position), 1.0))
+        remaining = deadline - time.monotonic()
+        if self.expected_wait(position) > remaining:
+            raise self._reject("deadline", self.expected_wait(position))
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # The releasing turn hands its slot over by resolving the future
+            await asyncio.wait_for(asyncio.shield(waiter), remaining)
+        except BaseException as exc:
+            if waiter.done() and not waiter.cancelled():
+                # The slot arrived just as we gave up: pass it on
+                self._release()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(exc, asyncio.TimeoutError):
+                raise self._reject("deadline", self.expected_wait(len(self._waiters)))
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _record(self, seconds: float) -> None:
+        if self._turn_seconds is None:
+            self._turn_seconds = seconds
+        else:
+            self._turn_seconds += 0.2 * (seconds - self._turn_seconds)
+
+    @asynccontextmanager
+    async def admit(self, session_id: str):
+        """
+        Holds a slot for answering one turn of `session_id`. Raises Overloaded when the
+        turn is refused.
+        """
+        if not self.enabled:
+            yield
+            return
+        now = time.monotonic()
+        self._check_rates(session_id, now)
+        await self._acquire(now + self.queue_timeout)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._record(time.monotonic() - started)
+            self._release()
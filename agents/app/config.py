@@ -7,6 +7,60 @@ class Settings(BaseSettings):
     DEFAULT_MODEL: str 
     BACKEND_API_KEY: str
     PINECONE_API_KEY: str
+    INIT_VECTOR_INDEX_ON_STARTUP: bool = False
+    GEMINI_MODEL: str = "gemini-2.0-flash"
+    # Use the local stub provider instead of Groq/Gemini (tests and benchmarks)
+    LLM_USE_STUB: bool = False
+    LLM_HEDGE_ENABLED: bool = True
+    # Hedge delay used until a provider has enough latency samples for a p95
+    LLM_HEDGE_DEFAULT_DELAY: float = 2.0
+    LLM_MAX_WORKERS: int = 32
+    # LLM calls in flight per provider; callers beyond it wait, and hedges go to a less busy provider
+    LLM_PROVIDER_MAX_CONCURRENCY: int = 8
+    # Seconds between incremental index syncs from the backend catalog (0 disables)
+    INDEX_SYNC_INTERVAL_SECONDS: float = 0.0
+    INDEX_SYNC_BATCH_SIZE: int = 96
+    INDEX_SYNC_CONCURRENCY: int = 4
+    # Fuse BM25 with the vector search and filter on cuisine/area/price/dietary mentions
+    HYBRID_SEARCH_ENABLED: bool = True
+    SEARCH_TOP_K: int = 3
+    # Approximate token budget for the search results appended to the find-restaurant prompt
+    SEARCH_CONTEXT_TOKEN_BUDGET: int = 600
+    # Fetch availability in the background once restaurant and date are known
+    AVAILABILITY_PREFETCH_ENABLED: bool = True
+    AVAILABILITY_CACHE_TTL_SECONDS: float = 60.0
+    # How long the final booking step waits for an in-flight availability fetch
+    AVAILABILITY_WAIT_SECONDS: float = 0.5
+    # Semantic cache for standalone find-restaurant questions
+    FIND_CACHE_ENABLED: bool = True
+    FIND_CACHE_SIMILARITY_THRESHOLD: float = 0.92
+    FIND_CACHE_TTL_SECONDS: float = 3600.0
+    FIND_CACHE_MAX_ENTRIES: int = 256
+    # Nearest open times offered when the requested slot is full
+    SLOT_SEARCH_ALTERNATIVES: int = 3
+    # Put the user on the waitlist when the confirmed slot turns out to be fully booked
+    WAITLIST_ON_FULL_SLOT: bool = True
+    # Admission control for /chat (per worker process). Turns over the global or per-session
+    # token-bucket rate are refused with 429 and Retry-After; at most CHAT_MAX_CONCURRENCY turns are
+    # answered at once and CHAT_MAX_QUEUE more wait, each for at most CHAT_QUEUE_TIMEOUT_SECONDS
+    CHAT_ADMISSION_ENABLED: bool = True
+    CHAT_RATE_LIMIT_PER_SECOND: float = 20.0
+    CHAT_RATE_LIMIT_BURST: int = 40
+    CHAT_SESSION_RATE_LIMIT_PER_MINUTE: float = 20.0
+    CHAT_SESSION_RATE_LIMIT_BURST: int = 5
+    CHAT_MAX_CONCURRENCY: int = 16
+    CHAT_MAX_QUEUE: int = 64
+    CHAT_QUEUE_TIMEOUT_SECONDS: float = 2.0
+    # Shared conversation state: sqlite:///path (workers on one host), redis://host:port/db or memory://
+    STATE_STORE_URL: str = "sqlite:///./agents_state.db"
+    SESSION_TIMEOUT_SECONDS: int = 3600
+    SESSION_PURGE_INTERVAL_SECONDS: float = 600.0
+    # Longest a turn holds its session; a second turn of the session is refused meanwhile
+    SESSION_LEASE_SECONDS: float = 120.0
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = True
+    # Fraction of DEBUG prompt/response payload logs that are kept
+    LOG_PAYLOAD_SAMPLE_RATE: float = 0.0
     
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from .utils.api_client import APIClient
+from .utils.metrics import record_cache_lookup, track_stage
+
+logger = logging.getLogger(__name__)
+
+# The backend reports availability in half-hour slots
+SLOT_MINUTES = 30
+
+
+def _minutes(slot: str) -> int:
+    hours, minutes = slot.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def slot_for(availability: Dict[str, int], requested_time: str) -> Optional[str]:
+    """
+    The availability slot a requested HH:MM falls into, or None outside opening hours.
+    """
+    try:
+        requested = _minutes(requested_time)
+    except (ValueError, AttributeError):
+        return None
+    slot_start = requested - requested % SLOT_MINUTES
+    slot = f"{slot_start // 60:02d}:{slot_start % 60:02d}"
+    return slot if slot in availability else None
+
+
+def alternative_times(availability: Dict[str, int], requested_time: str, limit: int = 3) -> List[str]:
+    """
+    Open slots closest to the requested time.
+    """
+    try:
+        requested = _minutes(requested_time)
+    except (ValueError, AttributeError):
+        requested = 0
+    open_slots = [slot for slot, tables in availability.items() if tables > 0]
+    return sorted(sorted(open_slots, key=lambda slot: abs(_minutes(slot) - requested))[:limit])
+
+
+def describe_options(options: List[Dict], requested_date: str) -> List[str]:
+    """
+    Options from the nearest-slot search as "HH:MM", with the date when it differs from the request.
+    """
+    return [
+        option["time"] if option["date"] == requested_date else f"{option['time']} on {option['date']}"
+        for option in options
+    ]
+
+
+class AvailabilityPrefetcher:
+    """
+    Fetches a restaurant's availability for a date in the background as soon as
+    both are known, so by the time the user has given a time (or confirmed) the
+    answer is usually already cached. Availability depends on the party size
+    (large parties stay longer), so it is cached per party size too. Restaurant
+    names are resolved to backend IDs through a cached copy of the catalog.
+    """
+    def __init__(self, api_client: APIClient, ttl: float = 60.0, catalog_ttl: float = 600.0):
+        self.api_client = api_client
+        self.ttl = ttl
+        self.catalog_ttl = catalog_ttl
+        self._restaurant_ids: Dict[str, int] = {}
+        self._catalog_loaded_at = 0.0
+        self._catalog_lock = asyncio.Lock()
+        # (restaurant name, date, party size) -> (fetched at, task resolving to the availability or None)
+        self._entries: Dict[Tuple[str, str, Optional[int]], Tuple[float, asyncio.Task]] = {}
+
+    @staticmethod
+    def _key(name: str, date: str, party_size: Any) -> Tuple[str, str, Optional[int]]:
+        try:
+            party_size = int(party_size) if party_size else None
+        except (TypeError, ValueError):
+            party_size = None
+        return name.strip().lower(), date, party_size
+
+    async def _load_catalog(self) -> None:
+        ids = {}
+        skip, page_size = 0, 100
+        while True:
+            page = await self.api_client.list_restaurants(skip=skip, limit=page_size)
+            if "error" in page:
+                logger.warning("Could not load the restaurant catalog: %s", page["error"])
+                return
+            ids.update({restaurant["restaurant_name"].strip().lower(): restaurant["restaurant_id"] for restaurant in page["restaurants"]})
+            if len(page["restaurants"]) < page_size:
+                break
+            skip += page_size
+        self._restaurant_ids = ids
+        self._catalog_loaded_at = time.monotonic()
+
+    async def restaurant_id(self, name: str) -> Optional[int]:
+        key = name.strip().lower()
+        async with self._catalog_lock:
+            stale = time.monotonic() - self._catalog_loaded_at > self.catalog_ttl
+            if stale or key not in self._restaurant_ids:
+                # A miss may be a restaurant added since the last load
+                if stale or time.monotonic() - self._catalog_loaded_at > 5.0:
+                    await self._load_catalog()
+        return self._restaurant_ids.get(key)
+
+    async def _fetch(self, name: str, date: str, party_size: Optional[int]) -> Optional[Dict[str, int]]:
+        try:
+            with track_stage("availability_prefetch"):
+                restaurant_id = await self.restaurant_id(name)
+                if restaurant_id is None:
+                    return None
+                response = await self.api_client.get_restaurant_availability(restaurant_id, date, party_size)
+            if "error" in response:
+                logger.warning("Availability prefetch failed for %s on %s: %s", name, date, response["error"])
+                return None
+            return response
+        except Exception:
+            logger.exception("Error in AvailabilityPrefetcher._fetch()")
+            return None
+
+    def _prune(self, now: float) -> None:
+        expired = [key for key, (fetched_at, task) in self._entries.items() if now - fetched_at >= self.ttl and task.done()]
+        for key in expired:
+            del self._entries[key]
+
+    def prefetch(self, name: str, date: str, party_size: Any = None) -> None:
+        """
+        Starts fetching in the background unless a fresh or in-flight fetch exists.
+        """
+        now = time.monotonic()
+        self._prune(now)
+        key = self._key(name, date, party_size)
+        entry = self._entries.get(key)
+        if entry is not None and now - entry[0] < self.ttl:
+            return
+        self._entries[key] = (now, asyncio.ensure_future(self._fetch(name, date, key[2])))
+
+    async def get(self, name: str, date: str, party_size: Any = None, timeout: float = 0.0) -> Optional[Dict[str, int]]:
+        """
+        The prefetched availability for a party of `party_size`, waiting up to
+        `timeout` seconds for an in-flight fetch. Returns None when nothing is
+        available in time.
+        """
+        entry = self._entries.get(self._key(name, date, party_size))
+        if entry is None or time.monotonic() - entry[0] >= self.ttl:
+            record_cache_lookup("availability", False)
+            return None
+        task = entry[1]
+        if not task.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+            except asyncio.TimeoutError:
+                record_cache_lookup("availability", False)
+                return None
+        record_cache_lookup("availability", task.result() is not None)
+        return task.result()
+
+    def invalidate(self, name: str, date: str) -> None:
+        """
+        Drops the cached availability of the day for every party size.
+        """
+        name = name.strip().lower()
+        for key in [key for key in self._entries if key[:2] == (name, date)]:
+            del self._entries[key]
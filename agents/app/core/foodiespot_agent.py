@@ -1,4 +1,6 @@
+import asyncio
 import json
+import logging
 import random
 from enum import Enum
 from typing import List, Dict, Any, Optional
@@ -7,7 +9,16 @@ from ..schemas import User,IntentClassificationResponse, ReservationDetailsExtra
 from .utils.api_client import APIClient
 from .utils.llm_client import LLMClient
 from .utils.prompts import find_restaurant_prompt, intent_classifier_prompt, similarity_search_filter_prompt, reservation_details_extraction_prompt, missing_reservation_details_prompt, handle_reservation_error_prompt
-from .vector_store import search_restaurants,format_search_results_for_llm
+from ..config import settings
+from .utils.metrics import SLOT_FILL_REQUESTS, track_stage
+from .slot_filling import SLOT_ORDER, SlotValue, detect_changes, parse_slot
+from .utils.semantic_cache import SemanticCache
+from .hybrid_search import HybridRetriever
+from .availability import AvailabilityPrefetcher, alternative_times, describe_options, slot_for
+from . import vector_store
+from .vector_store import embed_query, load_catalog_file, search_restaurants, format_search_results_for_llm
+
+logger = logging.getLogger(__name__)
 
 class AgentState(Enum):
     # level 1
@@ -30,10 +41,55 @@ class ReservationDetails():
         self.party_size: Optional[int] = None
         self.has_user_confirmed: Optional[bool] = None
         self.user_id: Optional[int] = None
+        # field -> SlotValue recording where each known value came from
+        self.provenance: Dict[str, SlotValue] = {}
+        self.extracted: bool = False
 
     def set_user_id(self, user_id:int):
         self.user_id = user_id
 
+    def reset(self):
+        self.__init__()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **{field: getattr(self, field) for field in SLOT_ORDER},
+            "user_id": self.user_id,
+            "extracted": self.extracted,
+            "provenance": {field: slot.to_dict() for field, slot in self.provenance.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ReservationDetails":
+        details = cls()
+        for field in (*SLOT_ORDER, "user_id", "extracted"):
+            if field in data:
+                setattr(details, field, data[field])
+        details.provenance = {field: SlotValue.from_dict(slot) for field, slot in data.get("provenance", {}).items()}
+        return details
+
+    def set_field(self, field:str, value, source:str, turn:int, force:bool=False) -> bool:
+        """
+        Sets a slot unless it already holds a value from a more trusted source.
+        Returns whether the value was set.
+        """
+        if value is None or value == "null":
+            return False
+        current = self.provenance.get(field)
+        slot = SlotValue(value, source, turn)
+        if not force and current is not None and current.confidence > slot.confidence and current.value == getattr(self, field):
+            return False
+        setattr(self, field, value)
+        self.provenance[field] = slot
+        return True
+
+    def clear_field(self, field:str):
+        setattr(self, field, None)
+        self.provenance.pop(field, None)
+
+    def known_fields(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in SLOT_ORDER if field in self.provenance}
+
     def missing_fields(self):
         """
         Returns a list of missing fields in the reservation details.
@@ -53,11 +109,15 @@ class ReservationDetails():
 
 class AgentContext(BaseModel):
     """
-    AgentContext stores the current state of the agent, the user's intent, and the conversation history.
+    AgentContext stores the current state of the agent, the user's intent, the conversation history
+    and the partial reservation details for one session. It is serialised with the session, so
+    any worker can continue the conversation.
     """
     current_state: AgentState
     user_intent: Optional[str] = None
     conversation_history: List[Dict[str,str]] = []
+    # ReservationDetails.to_dict()
+    reservation: Dict[str, Any] = {}
 
 class IntentClassifier:
     """
@@ -66,16 +126,17 @@ class IntentClassifier:
     def __init__(self, llm_client):
         self.llm_client:LLMClient = llm_client
 
-    def classify_intent(self, conversation_history:List[Dict[str,str]]) -> str:
+    async def classify_intent(self, conversation_history:List[Dict[str,str]]) -> str:
         try:
             messages = [
                 {"role": "system", "content": intent_classifier_prompt},
                 *conversation_history
             ]
-            response = self.llm_client.get_response(messages,perf=False,response_schema=IntentClassificationResponse)
+            with track_stage("intent_classification"):
+                response = await self.llm_client.get_response(messages,perf=False,response_schema=IntentClassificationResponse)
             return response.get("category","OTHER")
         except Exception as e:
-            print("Error in IntentClassifier.classify_intent():",e)
+            logger.exception("Error in IntentClassifier.classify_intent()")
             return "OTHER"
 
 class FindRestaurant:
@@ -88,16 +149,34 @@ class FindRestaurant:
         self.coversation_history = [
             {"role":"system", "content":find_restaurant_prompt}
         ]
+        self.retriever = HybridRetriever() if settings.HYBRID_SEARCH_ENABLED else None
+        # Answers to standalone questions, keyed by the question's embedding
+        self.response_cache = None
+        if settings.FIND_CACHE_ENABLED:
+            self.response_cache = SemanticCache(
+                "find_restaurant",
+                threshold=settings.FIND_CACHE_SIMILARITY_THRESHOLD,
+                ttl=settings.FIND_CACHE_TTL_SECONDS,
+                max_entries=settings.FIND_CACHE_MAX_ENTRIES,
+                generation=lambda: vector_store.index_version
+            )
 
-    def _search_and_format_for_llm(self,query, filter_dict=None, top_k=4):
+    def _search_and_format_for_llm(self,query, conversation_history:List[Dict[str,str]], top_k=None):
         """
-        This function searches for restaurants based on the user query in the vector database and formats the search results for the LLM
+        This function searches for restaurants based on the user query (hybrid lexical + vector search when enabled) and formats the search results for the LLM.
+        Returns the IDs of the matched restaurants and the formatted context.
         """
-        results = search_restaurants(query, filter_dict, top_k)
-        context = format_search_results_for_llm(results)
-        return context
+        top_k = top_k or settings.SEARCH_TOP_K
+        if self.retriever is not None:
+            results = self.retriever.search(query, conversation_history, top_k)
+        else:
+            results = search_restaurants(query, None, top_k)
+        question = next((message["content"] for message in reversed(conversation_history) if message["role"] == "user"), "")
+        context = format_search_results_for_llm(results, question=question)
+        restaurant_ids = [match["id"] for match in (results or {}).get("matches", [])]
+        return restaurant_ids, context
     
-    def similarity_search_filter(self,conversation_history:List[Dict[str,str]]):
+    async def similarity_search_filter(self,conversation_history:List[Dict[str,str]]):
         """
         This function prompts the LLM to extract the keywords from the conversation history that describe the user's intent.
         """
@@ -110,26 +189,72 @@ class FindRestaurant:
                 conversation += f"{message['role']}: {message['content']}\n"
             conversation += "Based on the conversation, what are the keywords that describe the user what the user is talking about?"
             messages.append({"role":"user","content":conversation})
-            response = self.llm_client.get_response(messages,is_json=False)
+            with track_stage("keyword_extraction"):
+                response = await self.llm_client.get_response(messages,is_json=False)
             return response
         except Exception as e:
-            print("Error in FindRestaurant.similarity_search_filter():",e)
+            logger.exception("Error in FindRestaurant.similarity_search_filter()")
             return "None"
 
     
-    def handle_messages(self, coversation_history:List[Dict[str,str]]):
+    def exact_answer(self, question:str) -> Optional[str]:
+        """
+        The cached answer to a question asked before in the same words. Needs no
+        embedding, so it is cheap enough to try before the intent is classified.
+        """
+        if self.response_cache is None:
+            return None
         try:
-            keywords = self.similarity_search_filter(coversation_history)
-            results = self._search_and_format_for_llm(keywords)
+            cached = self.response_cache.get_exact(question)
+        except Exception:
+            logger.exception("Error in FindRestaurant.exact_answer()")
+            return None
+        return cached["answer"] if cached is not None else None
+
+    async def cached_answer(self, question:str):
+        """
+        (answer, query_vector): the cached answer to a standalone question when the same or
+        a similar question was answered before, and the question's embedding if the lookup
+        computed it. A failing lookup counts as a miss.
+        """
+        answer = self.exact_answer(question)
+        if answer is not None or self.response_cache is None:
+            return answer, None
+        try:
+            query_vector = await asyncio.to_thread(embed_query, question)
+            cached = self.response_cache.get_similar(query_vector)
+        except Exception:
+            logger.exception("Error in FindRestaurant.cached_answer()")
+            return None, None
+        return (cached["answer"] if cached is not None else None), query_vector
+
+    async def handle_messages(self, coversation_history:List[Dict[str,str]], follow_up:bool=False):
+        """
+        Standalone questions (not follow-ups to an earlier recommendation) are
+        answered from the response cache when a similar question was seen before.
+        """
+        try:
+            question = coversation_history[-1]["content"]
+            query_vector = None
+            if self.response_cache is not None and not follow_up:
+                answer, query_vector = await self.cached_answer(question)
+                if answer is not None:
+                    return answer
+
+            keywords = await self.similarity_search_filter(coversation_history)
+            restaurant_ids, results = self._search_and_format_for_llm(keywords, coversation_history)
             system_pompt_with_context = self.system_prompt + results
             messages = [
                 {"role": "system", "content": system_pompt_with_context},
                 *coversation_history
             ]
-            response = self.llm_client.get_response(messages,is_json=False)
+            with track_stage("answer_generation"):
+                response = await self.llm_client.get_response(messages,is_json=False)
+            if query_vector is not None and not follow_up:
+                self.response_cache.put(question, query_vector, {"restaurant_ids": restaurant_ids, "answer": response})
             return response
         except Exception as e:
-            print("Error in FindRestaurant.handle_messages():",e)
+            logger.exception("Error in FindRestaurant.handle_messages()")
             return "I'm sorry, I'm having trouble understanding you right now. Please try again."
 
 class MakeReservation:
@@ -137,10 +262,60 @@ class MakeReservation:
     def __init__(self, llm_client,api_client):
         self.llm_client = llm_client
         self.api_client = api_client
-        self.reservation_complete:bool = False
-        self.reservation_details = ReservationDetails()
+        self.restaurant_names = [restaurant["name"] for restaurant in load_catalog_file()]
+        self.prefetcher = None
+        if settings.AVAILABILITY_PREFETCH_ENABLED:
+            self.prefetcher = AvailabilityPrefetcher(api_client, ttl=settings.AVAILABILITY_CACHE_TTL_SECONDS)
+
+    async def update_reservation_details(self, coversation_history:List[Dict[str,str]], details:ReservationDetails):
+        """
+        Incremental slot filling. Only the newest user message is parsed for the
+        pending slot (and any other slot it clearly states). The LLM reads just the
+        last exchange when the parsers cannot, and the whole conversation only on
+        the first reservation turn or when the user revises a detail given earlier.
+        """
+        message = coversation_history[-1]["content"]
+        turn = len(coversation_history)
+
+        if not details.extracted:
+            details.extracted = True
+            SLOT_FILL_REQUESTS.labels("llm_full").inc()
+            await self.extract_reservation_details(coversation_history, details)
+            return
 
-    def extract_reservation_details(self, coversation_history:List[Dict[str,str]]):
+        changes = detect_changes(message, details.known_fields(), self.restaurant_names)
+        if changes:
+            logger.debug("Reservation details revised: %s", changes)
+            SLOT_FILL_REQUESTS.labels("llm_full").inc()
+            await self.extract_reservation_details(coversation_history, details)
+            # The newest message states these explicitly, so it wins over the re-extraction
+            for field, value in changes.items():
+                details.set_field(field, value, "parser", turn, force=True)
+            # Any earlier confirmation was for the old details
+            details.set_field("has_user_confirmed", False, "parser", turn, force=True)
+            return
+
+        missing = details.missing_fields()
+        if not missing:
+            return
+        pending = missing[0]
+        filled = details.set_field(pending, parse_slot(pending, message, self.restaurant_names, strict=False), "parser", turn)
+        # Users often answer more than was asked ("8pm for 4 people")
+        for field in missing[1:]:
+            if field != "has_user_confirmed":
+                details.set_field(field, parse_slot(field, message, self.restaurant_names, strict=True), "parser", turn)
+        if filled:
+            SLOT_FILL_REQUESTS.labels("parser").inc()
+            return
+
+        SLOT_FILL_REQUESTS.labels("llm_incremental").inc()
+        await self.extract_reservation_details(coversation_history[-2:], details, source="llm_incremental", turn=turn)
+
+    async def extract_reservation_details(self, coversation_history:List[Dict[str,str]], details:ReservationDetails, source:str="llm_full", turn:Optional[int]=None):
+        """
+        LLM extraction over `coversation_history`. A full extraction replaces every
+        slot; an incremental one (over the last exchange only) merges the slots it found.
+        """
         try:
             messages = [
                 {"role": "system", "content": reservation_details_extraction_prompt},
@@ -150,102 +325,230 @@ class MakeReservation:
                 conversation += f"{message['role']}: {message['content']}\n"
             conversation += "Based on the conversation, please extract the reservation details."
             messages.append({"role":"user","content":conversation})
-            response = self.llm_client.get_response(messages,is_json=True,perf=True,response_schema=ReservationDetailsExtractorResponse)
+            with track_stage("reservation_extraction"):
+                response = await self.llm_client.get_response(messages,is_json=True,perf=True,response_schema=ReservationDetailsExtractorResponse)
+            turn = turn or len(coversation_history)
             for key in response:
-                if hasattr(self.reservation_details,key):
-                    setattr(self.reservation_details,key,response[key])
+                if key not in SLOT_ORDER:
+                    continue
+                if source == "llm_full" and response[key] in (None, "null"):
+                    setattr(details, key, None)
+                    details.provenance.pop(key, None)
+                else:
+                    details.set_field(key, response[key], source, turn, force=source == "llm_full")
         except Exception as e:
-            print("Error in MakeReservation.extract_reservation_details():",e)
+            logger.exception("Error in MakeReservation.extract_reservation_details()")
+
+    async def check_requested_time(self, details:ReservationDetails, wait:float=0.0) -> Optional[str]:
+        """
+        Uses prefetched availability to catch a fully booked time before the user
+        confirms. Clears the time (or the date, when the whole day is full) and
+        returns a note for the next prompt with the closest open times.
+        Returns None when the time is open or availability is not known yet.
+        """
+        if self.prefetcher is None or not (details.restaurant_name and details.date and details.time):
+            return None
+        availability = await self.prefetcher.get(details.restaurant_name, details.date, details.party_size, timeout=wait)
+        if not availability:
+            return None
+        slot = slot_for(availability, details.time)
+        if slot is None or availability[slot] > 0:
+            return None
+
+        alternatives = alternative_times(availability, details.time)
+        logger.debug("Requested time %s is fully booked, alternatives: %s", details.time, alternatives)
+        note = f"{details.restaurant_name} is fully booked on {details.date} at {details.time}."
+        details.clear_field("has_user_confirmed")
+        if alternatives:
+            details.clear_field("time")
+            return f"{note} Tell the user and offer these available times instead: {', '.join(alternatives)}."
+        nearest = await self.nearest_alternatives(details)
+        details.clear_field("date")
+        details.clear_field("time")
+        if nearest:
+            return f"{note} There are no free tables that day. Tell the user and offer these nearest available times instead: {', '.join(nearest)}."
+        return f"{note} There are no free tables that day. Tell the user and ask for another date."
+
+    async def nearest_alternatives(self, details:ReservationDetails) -> List[str]:
+        """
+        Open times nearest to the requested slot, on that day or the days around it,
+        from a single backend search, so they can all be offered in one turn.
+        """
+        if not (details.restaurant_name and details.date and details.time):
+            return []
+        with track_stage("backend_slot_search"):
+            result = await self.api_client.find_nearest_slots(
+                details.restaurant_name, details.date, details.time, details.party_size or 1,
+                limit=settings.SLOT_SEARCH_ALTERNATIVES
+            )
+        if "error" in result:
+            logger.debug("Nearest slot search failed: %s", result["error"])
+            return []
+        return describe_options(result["options"], details.date)
 
-    async def make_reservation(self) -> Dict[str, Any]:
+    async def make_reservation(self, details:ReservationDetails) -> Dict[str, Any]:
         try:
             reservation_data = {
-                "restaurant_name": self.reservation_details.restaurant_name,
-                "date": self.reservation_details.date,
-                "time": self.reservation_details.time,
-                "guests": self.reservation_details.party_size,
-                "user_id": self.reservation_details.user_id
+                "restaurant_name": details.restaurant_name,
+                "date": details.date,
+                "time": details.time,
+                "guests": details.party_size,
+                "user_id": details.user_id
             }
-            response = await self.api_client.make_reservation(reservation_data)
+            with track_stage("backend_booking"):
+                response = await self.api_client.make_reservation(reservation_data)
             return response
         except Exception as e:
-            print("Error in MakeReservation.make_reservation():",e)
+            logger.exception("Error in MakeReservation.make_reservation()")
             return {
                 "status": "error",
                 "message": f"Failed to make reservation: {str(e)}",
                 "error_code": "SYSTEM_ERROR"
             }
 
-    async def handle_messages(self, coversation_history:List[Dict[str,str]]):
+    async def join_waitlist(self, details:ReservationDetails, alternatives:List[str]=()) -> Optional[str]:
+        """
+        After a confirmed booking was rejected, queue the party for the slot instead.
+        Returns the reply for the user, mentioning `alternatives` as other open times,
+        or None if the waitlist could not take the party.
+        """
+        if not settings.WAITLIST_ON_FULL_SLOT:
+            return None
+        reservation_data = {
+            "restaurant_name": details.restaurant_name,
+            "date": details.date,
+            "time": details.time,
+            "guests": details.party_size,
+            "user_id": details.user_id
+        }
+        with track_stage("backend_waitlist"):
+            entry = await self.api_client.join_waitlist(reservation_data)
+        if "error" in entry:
+            logger.debug("Could not join the waitlist: %s", entry["error"])
+            return None
+        if self.prefetcher is not None:
+            self.prefetcher.invalidate(details.restaurant_name, details.date)
+        slot = f"{details.restaurant_name} on {details.date} at {details.time}"
+        details.reset()
+        if entry.get("status") == "Promoted":
+            return f"A table just opened up, so your reservation at {slot} is confirmed. You will receive a confirmation shortly."
+        reply = (
+            f"{slot} is fully booked, so I have put you on the waitlist (you are number {entry.get('position')}). "
+            "If a table frees up you will be booked automatically and receive a confirmation."
+        )
+        if alternatives:
+            reply += f" If another time works for you, these are open: {', '.join(alternatives)}."
+        return reply
+
+    async def handle_messages(self, coversation_history:List[Dict[str,str]], details:ReservationDetails):
         try:
-            self.extract_reservation_details(coversation_history)
-            print(self.reservation_details)
-            missing_fields = self.reservation_details.missing_fields()
+            await self.update_reservation_details(coversation_history, details)
+            if self.prefetcher is not None and details.restaurant_name and details.date:
+                # Fetch while the LLM writes the next question, so the time can be checked before booking
+                self.prefetcher.prefetch(details.restaurant_name, details.date, details.party_size)
+            ready_to_book = not details.missing_fields()
+            availability_note = await self.check_requested_time(details, wait=settings.AVAILABILITY_WAIT_SECONDS if ready_to_book else 0.0)
+            missing_fields = details.missing_fields()
             missing_fields = sorted(missing_fields, key=lambda x: ["restaurant_name", "date", "time", "party_size","has_user_confirmed"].index(x))
 
             if len(missing_fields) != 0:
                 first_field = missing_fields[0]
-                print("first_field",first_field,missing_fields)
+                logger.debug("Reservation missing fields: %s", missing_fields)
                 system_prompt = missing_reservation_details_prompt + f"\n\nMISSING FIELD -> {first_field}"
+                if availability_note:
+                    system_prompt += f"\n\nNOTE: {availability_note}"
                 messages = [
                     {"role": "system", "content": system_prompt },
                     *coversation_history
                 ]
-                response = self.llm_client.get_response(messages,is_json=False)
+                with track_stage("answer_generation"):
+                    response = await self.llm_client.get_response(messages,is_json=False)
                 return response
             else:
-                response = await self.make_reservation()
-                if response["status"] == "success":
-                    self.reservation_complete = True
-                    self.reservation_details = ReservationDetails()
+                response = await self.make_reservation(details)
+                if response.get("status") == "success":
+                    if self.prefetcher is not None:
+                        self.prefetcher.invalidate(details.restaurant_name, details.date)
+                    details.reset()
                     return f"{response['message']} Please show this code at the counter: {response['reservation_code']}."
-                else:
-                    messages = [
-                        {"role": "system", "content": handle_reservation_error_prompt},
-                        {"role": "user", "content": json.dumps(response) },
-                    ]
-                    response = self.llm_client.get_response(messages,is_json=False)
-                    return response
+                if response.get("error_code") == "NO_AVAILABILITY":
+                    # The slot was taken meanwhile: offer the waitlist and the nearest open times in this turn
+                    alternatives = await self.nearest_alternatives(details)
+                    waitlisted = await self.join_waitlist(details, alternatives)
+                    if waitlisted:
+                        return waitlisted
+                    if alternatives:
+                        response["alternative_times"] = alternatives
+                messages = [
+                    {"role": "system", "content": handle_reservation_error_prompt},
+                    {"role": "user", "content": json.dumps(response) },
+                ]
+                with track_stage("answer_generation"):
+                    response = await self.llm_client.get_response(messages,is_json=False)
+                return response
 
         except Exception as e:
-            print("Error in MakeReservation.handle_messages():",e)
+            logger.exception("Error in MakeReservation.handle_messages()")
             return "I'm sorry, I'm having trouble understanding you right now. Please try again."        
 
 class FoodieSpotAgent:
     def __init__(self):
         self.llm_client = LLMClient()
         self.api_client = APIClient()
-        self.context = AgentContext(current_state=AgentState.GREETING)
 
         self.intent_classifier = IntentClassifier(self.llm_client)
         self.find_restaurant = FindRestaurant(self.llm_client)
         self.make_reservation = MakeReservation(self.llm_client,self.api_client)
 
-    async def run(self, user_input: str,user_data:User) -> Dict[str, Any]:
+    def new_context(self) -> AgentContext:
+        return AgentContext(current_state=AgentState.GREETING)
+
+    async def run(self, user_input: str,user_data:User, context:AgentContext) -> Dict[str, Any]:
+        """
+        Runs one turn of the conversation, updating `context` in place.
+        The agent itself holds no per-session state.
+        """
         try:
-            self.context.conversation_history.append({"role":"user", "content":user_input})
+            context.conversation_history.append({"role":"user", "content":user_input})
+
+            previous_state = context.current_state
+            # Only find-restaurant questions are cached, so a standalone question asked before
+            # in the same words is answered without classifying the intent, i.e. without any
+            # LLM call. Similar questions are only looked up once the intent is known.
+            if previous_state not in (AgentState.FIND_RESTAURANT, AgentState.MAKE_RESERVATION):
+                cached = self.find_restaurant.exact_answer(user_input)
+                if cached is not None:
+                    context.user_intent = "FIND_RESTAURANT"
+                    context.current_state = AgentState.FIND_RESTAURANT
+                    context.conversation_history.append({"role":"assistant", "content":cached})
+                    return {"message": cached}
 
             # Classifying the user intent for all the messages
-            self.context.user_intent = self.intent_classifier.classify_intent(self.context.conversation_history)
-            self.context.current_state = self.get_next_state(self.context.user_intent)
+            context.user_intent = await self.intent_classifier.classify_intent(context.conversation_history)
+            context.current_state = self.get_next_state(context.user_intent)
 
-            if self.context.current_state == AgentState.FIND_RESTAURANT:
-                response = self.find_restaurant.handle_messages(self.context.conversation_history)
-                self.context.conversation_history.append({"role":"assistant", "content":response})
+            if context.current_state == AgentState.FIND_RESTAURANT:
+                response = await self.find_restaurant.handle_messages(
+                    context.conversation_history,
+                    follow_up=previous_state == AgentState.FIND_RESTAURANT
+                )
+                context.conversation_history.append({"role":"assistant", "content":response})
                 return {"message": response}
 
-            elif self.context.current_state == AgentState.MAKE_RESERVATION:
+            elif context.current_state == AgentState.MAKE_RESERVATION:
                 if isinstance(user_data, dict):
                     user_id = user_data.get('user_id')
                 else:
                     user_id = getattr(user_data, 'user_id', None)
-                if self.make_reservation.reservation_details.user_id is None and user_id is not None:
-                    self.make_reservation.reservation_details.set_user_id(user_id)
-                response = await self.make_reservation.handle_messages(self.context.conversation_history)
-                self.context.conversation_history.append({"role": "assistant", "content": response})
+                details = ReservationDetails.from_dict(context.reservation)
+                if details.user_id is None and user_id is not None:
+                    details.set_user_id(user_id)
+                response = await self.make_reservation.handle_messages(context.conversation_history, details)
+                context.reservation = details.to_dict()
+                context.conversation_history.append({"role": "assistant", "content": response})
                 return {"message": response}
 
-            elif self.context.current_state == AgentState.OTHER:
+            elif context.current_state == AgentState.OTHER:
                 other_intent_messages = [  
                     "I'm still learning, and my specialty is helping with restaurants! I can find restaurants based on cuisine, price, and location, or even help you book a table. Is there anything restaurant-related I can assist you with today?",
                     "Thanks for your message! I'm designed to be a restaurant expert. If you're looking for recommendations or reservations, I'd be happy to help. Otherwise, I might not be the best resource.",
@@ -254,12 +557,12 @@ class FoodieSpotAgent:
                     "Thanks for your message! I'm always learning how to be more helpful. While I'm currently focused on restaurant recommendations and reservations, your input helps me improve. If you'd like to tell me what you were trying to do, it can help me in the future."
                 ]
                 response = random.choice(other_intent_messages)
-                self.context.conversation_history.append({'role':'assistant', 'content':response})
+                context.conversation_history.append({'role':'assistant', 'content':response})
                 return {"message": response}
 
 
         except Exception as e:
-            print("Error in agent.run():",e)
+            logger.exception("Error in agent.run()")
             return {"message": "I'm sorry, I'm having trouble understanding you right now. Please try again"}
         
     def get_next_state(self, user_intent):
@@ -270,7 +573,4 @@ class FoodieSpotAgent:
         elif user_intent == "OTHER":
             return AgentState.OTHER
         else:
-            return AgentState.GREETING   
-
-    def clear(self):
-        self.context = AgentContext(current_state=AgentState.GREETING)
\ No newline at end of file
+            return AgentState.GREETING
\ No newline at end of file
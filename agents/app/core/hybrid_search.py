@@ -0,0 +1,201 @@
+import logging
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+from . import vector_store
+from .utils.metrics import track_stage
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Metadata fields indexed for lexical search
+LEXICAL_FIELDS = ("name", "cuisine", "area", "ambiance", "description", "specialties", "features", "dietary_options")
+# Fields whose values are exact labels, so Pinecone can filter on them before ranking
+EXACT_FILTER_FIELDS = ("cuisine", "area", "price_range")
+# Relaxed in this order when the filters leave no candidates
+RELAX_ORDER = ("dietary_options", "price_range", "area", "cuisine")
+
+DIETARY_TERMS = ("vegetarian", "non-vegetarian", "vegan", "gluten-free", "jain", "halal", "seafood")
+PRICE_SYNONYMS = {
+    "cheap": "Budget",
+    "affordable": "Budget",
+    "budget": "Budget",
+    "inexpensive": "Budget",
+    "mid-range": "Moderate",
+    "moderate": "Moderate",
+    "reasonably priced": "Moderate",
+    "premium": "Premium",
+    "upscale": "Premium",
+    "expensive": "Premium",
+    "luxury": "Luxury",
+    "luxurious": "Luxury",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _phrase_pattern(phrase: str) -> re.Pattern:
+    # Hyphens count as part of a word so "vegetarian" does not match "non-vegetarian"
+    words = [re.escape(word) for word in re.split(r"\s+", phrase.strip().lower())]
+    return re.compile(r"(?<![\w-])" + r"\s*".join(words) + r"(?![\w-])")
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a small in-memory corpus.
+    """
+    def __init__(self, documents: Dict[str, str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_frequencies = {doc_id: Counter(tokenize(text)) for doc_id, text in documents.items()}
+        self.lengths = {doc_id: sum(tf.values()) for doc_id, tf in self.term_frequencies.items()}
+        self.average_length = (sum(self.lengths.values()) / len(self.lengths)) if self.lengths else 0.0
+        self.postings: Dict[str, List[str]] = defaultdict(list)
+        for doc_id, tf in self.term_frequencies.items():
+            for term in tf:
+                self.postings[term].append(doc_id)
+        total = len(self.term_frequencies)
+        self.idf = {
+            term: math.log(1 + (total - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            for term, doc_ids in self.postings.items()
+        }
+
+    def search(self, query: str, candidates: Optional[Set[str]] = None, top_k: int = 10) -> List[str]:
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            for doc_id in self.postings.get(term, ()):
+                if candidates is not None and doc_id not in candidates:
+                    continue
+                tf = self.term_frequencies[doc_id][term]
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / (self.average_length or 1.0))
+                scores[doc_id] += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)[:top_k]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> Dict[str, float]:
+    fused: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] += 1.0 / (k + rank)
+    return fused
+
+
+class HybridRetriever:
+    """
+    Combines BM25 over the restaurant metadata with the vector search, fused by
+    reciprocal rank. Cuisine, area, price and dietary constraints mentioned by the
+    user are matched against the catalog's own vocabulary and applied before
+    ranking. The corpus is read from the index metadata and rebuilt whenever
+    vector_store.index_version changes.
+    """
+    def __init__(self, rrf_k: int = 60, vector_candidates: int = 20):
+        self.rrf_k = rrf_k
+        self.vector_candidates = vector_candidates
+        self._version = None
+        self.metadata: Dict[str, Dict] = {}
+        self.bm25: Optional[BM25Index] = None
+        self.vocabulary: Dict[str, Dict[re.Pattern, Set[str]]] = {}
+
+    def _ensure_corpus(self) -> None:
+        if self._version == vector_store.index_version and self.bm25 is not None:
+            return
+        with track_stage("lexical_index_build"):
+            self.metadata = vector_store.fetch_all_metadata()
+            self.bm25 = BM25Index({
+                doc_id: " ".join(str(metadata.get(field, "")) for field in LEXICAL_FIELDS)
+                for doc_id, metadata in self.metadata.items()
+            })
+            self.vocabulary = self._build_vocabulary()
+        self._version = vector_store.index_version
+        logger.info("Built lexical index over %d restaurants", len(self.metadata))
+
+    def _build_vocabulary(self) -> Dict[str, Dict[re.Pattern, Set[str]]]:
+        """
+        Maps each filterable field to {phrase pattern: catalog values it selects}.
+        Spelling variants such as "Indiranagar"/"Indira Nagar" select each other.
+        """
+        vocabulary: Dict[str, Dict[re.Pattern, Set[str]]] = {}
+        for field in EXACT_FILTER_FIELDS:
+            variants: Dict[str, Set[str]] = defaultdict(set)
+            for metadata in self.metadata.values():
+                value = metadata.get(field)
+                if value:
+                    variants[re.sub(r"\s+", "", value.lower())].add(value)
+            vocabulary[field] = {
+                _phrase_pattern(value): values
+                for values in variants.values()
+                for value in values
+            }
+        known_prices = {metadata.get("price_range") for metadata in self.metadata.values()}
+        for phrase, value in PRICE_SYNONYMS.items():
+            if value in known_prices:
+                vocabulary["price_range"].setdefault(_phrase_pattern(phrase), set()).add(value)
+        vocabulary["dietary_options"] = {_phrase_pattern(term): {term} for term in DIETARY_TERMS}
+        return vocabulary
+
+    def extract_filters(self, conversation_history: List[Dict[str, str]]) -> Dict[str, Set[str]]:
+        """
+        For each field, uses the most recent user message that mentions any of its values,
+        so a later "actually, something Chinese" replaces an earlier cuisine.
+        """
+        self._ensure_corpus()
+        user_messages = [message["content"].lower() for message in conversation_history if message["role"] == "user"]
+        filters: Dict[str, Set[str]] = {}
+        for field, patterns in self.vocabulary.items():
+            for message in reversed(user_messages):
+                values = set().union(*(values for pattern, values in patterns.items() if pattern.search(message)))
+                if values:
+                    filters[field] = values
+                    break
+        return filters
+
+    def _matches(self, metadata: Dict, filters: Dict[str, Set[str]]) -> bool:
+        for field, values in filters.items():
+            if field == "dietary_options":
+                text = str(metadata.get(field, "")).lower()
+                if not all(_phrase_pattern(term).search(text) for term in values):
+                    return False
+            elif metadata.get(field) not in values:
+                return False
+        return True
+
+    def _candidates(self, filters: Dict[str, Set[str]]):
+        """
+        Applies the filters, relaxing the least important ones until at least one restaurant matches.
+        """
+        filters = dict(filters)
+        for field in (None, *RELAX_ORDER):
+            if field is not None and filters.pop(field, None) is not None:
+                logger.debug("Relaxed search filter %s", field)
+            allowed = {doc_id for doc_id, metadata in self.metadata.items() if self._matches(metadata, filters)}
+            if allowed:
+                return filters, allowed
+        return {}, set(self.metadata)
+
+    def search(self, query: str, conversation_history: List[Dict[str, str]], top_k: int = 3) -> Dict:
+        """
+        Returns results shaped like a Pinecone query response; scores are the fused
+        ranks normalised to 0-1.
+        """
+        filters, allowed = self._candidates(self.extract_filters(conversation_history))
+        lexical_query = " ".join([query, *(m["content"] for m in conversation_history[-1:] if m["role"] == "user")])
+        with track_stage("lexical_query"):
+            lexical_ranking = self.bm25.search(lexical_query, candidates=allowed, top_k=self.vector_candidates)
+
+        pinecone_filter = {field: {"$in": sorted(filters[field])} for field in EXACT_FILTER_FIELDS if field in filters}
+        vector_results = vector_store.search_restaurants(query, pinecone_filter or None, self.vector_candidates)
+        vector_ranking = [match["id"] for match in (vector_results or {}).get("matches", []) if match["id"] in allowed]
+
+        fused = reciprocal_rank_fusion([vector_ranking, lexical_ranking], k=self.rrf_k)
+        best = 2.0 / (self.rrf_k + 1)
+        ranked = sorted(fused, key=lambda doc_id: fused[doc_id], reverse=True)[:top_k]
+        return {
+            "matches": [
+                {"id": doc_id, "score": fused[doc_id] / best, "metadata": self.metadata[doc_id]}
+                for doc_id in ranked
+            ],
+            "filters": {field: sorted(values) for field, values in filters.items()},
+        }
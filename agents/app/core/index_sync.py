@@ -0,0 +1,197 @@
+"""
+Incremental sync of the Pinecone index from the backend restaurant catalog.
+
+Each indexed vector carries a content hash in its metadata. A sync pages
+through the backend's /restaurants/ endpoint, compares every restaurant's
+hash with the indexed one, re-embeds only new or changed restaurants in
+bounded batches and deletes vectors whose restaurant no longer exists.
+
+    python -m app.core.index_sync [--dry-run]
+"""
+import argparse
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from ..config import settings
+from ..logging_config import setup_logging
+from .utils.api_client import APIClient
+from .utils.metrics import track_stage
+from . import vector_store
+from .vector_store import (
+    CONTACT_FIELDS, METADATA_FIELDS, NAMESPACE, batched, embed_passages, get_pinecone_index,
+    load_catalog_file, restaurant_document, vector_metadata, with_content_hash
+)
+
+logger = logging.getLogger(__name__)
+
+FETCH_BATCH_SIZE = 100
+UPSERT_BATCH_SIZE = 100
+DELETE_BATCH_SIZE = 1000
+
+
+class IndexSyncError(Exception):
+    """Raised when the catalog cannot be read, so nothing is changed in the index."""
+
+
+async def fetch_catalog(api_client: APIClient, page_size: int = 100) -> List[Dict[str, Any]]:
+    restaurants = []
+    skip = 0
+    while True:
+        page = await api_client.list_restaurants(skip=skip, limit=page_size)
+        if "error" in page:
+            raise IndexSyncError(page["error"])
+        restaurants.extend(page["restaurants"])
+        if len(page["restaurants"]) < page_size:
+            return restaurants
+        skip += page_size
+
+
+def backend_document(restaurant: Dict[str, Any], enrichment: Dict[str, Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Builds the text and metadata for a backend restaurant. Restaurants that also
+    appear in restaurants.json (matched by name) keep its richer details;
+    the backend's name and description always win.
+    """
+    name = restaurant["restaurant_name"]
+    description = restaurant.get("restaurant_description") or ""
+    details = enrichment.get(name.strip().lower())
+    if details is not None:
+        text, metadata = restaurant_document(details)
+        if metadata["name"] == name and metadata["description"] == description:
+            return text, metadata
+    else:
+        metadata = {field: "" for field in METADATA_FIELDS}
+    metadata = {**metadata, "name": name, "description": description}
+
+    text = f"{name}. {description}".strip()
+    extra = [
+        f"{field.replace('_', ' ').capitalize()}: {metadata[field]}."
+        for field in METADATA_FIELDS
+        if field not in ("name", "description", *CONTACT_FIELDS) and metadata.get(field)
+    ]
+    if extra:
+        text = " ".join([text, *extra])
+    return with_content_hash(text, metadata)
+
+
+async def indexed_hashes(index, semaphore: asyncio.Semaphore) -> Dict[str, Optional[str]]:
+    """
+    Returns {vector id: content hash} for the namespace. Vectors written before
+    hashes were tracked map to None and are treated as changed.
+    """
+    ids = [
+        vector_id
+        for page in await asyncio.to_thread(lambda: list(index.list(namespace=NAMESPACE)))
+        for vector_id in page
+    ]
+
+    async def fetch(batch):
+        async with semaphore:
+            response = await asyncio.to_thread(index.fetch, ids=batch, namespace=NAMESPACE)
+        vectors = response.get("vectors") if isinstance(response, dict) else response.vectors
+        return {vector_id: vector_metadata(vector).get("content_hash") for vector_id, vector in vectors.items()}
+
+    hashes = {}
+    for batch_hashes in await asyncio.gather(*(fetch(batch) for batch in batched(ids, FETCH_BATCH_SIZE))):
+        hashes.update(batch_hashes)
+    return hashes
+
+
+async def sync_index(
+    api_client: Optional[APIClient] = None,
+    dry_run: bool = False,
+    embed_batch_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Brings the index in line with the backend catalog and returns the number of
+    upserted, deleted and unchanged restaurants.
+    """
+    embed_batch_size = min(embed_batch_size or settings.INDEX_SYNC_BATCH_SIZE, vector_store.EMBED_BATCH_SIZE)
+    semaphore = asyncio.Semaphore(concurrency or settings.INDEX_SYNC_CONCURRENCY)
+    owns_client = api_client is None
+    api_client = api_client or APIClient()
+    try:
+        with track_stage("index_sync_catalog"):
+            catalog = await fetch_catalog(api_client)
+    finally:
+        if owns_client:
+            await api_client.close()
+    if not catalog:
+        # An empty catalog is far more likely a backend problem than a real state
+        raise IndexSyncError("Backend returned no restaurants; refusing to empty the index")
+
+    enrichment = {restaurant["name"].strip().lower(): restaurant for restaurant in load_catalog_file()}
+    documents = {
+        str(restaurant["restaurant_id"]): backend_document(restaurant, enrichment)
+        for restaurant in catalog
+    }
+
+    index = await asyncio.to_thread(get_pinecone_index)
+    with track_stage("index_sync_diff"):
+        indexed = await indexed_hashes(index, semaphore)
+    changed = [
+        vector_id for vector_id, (_, metadata) in documents.items()
+        if indexed.get(vector_id) != metadata["content_hash"]
+    ]
+    removed = sorted(set(indexed) - set(documents))
+    summary = {"upserted": len(changed), "deleted": len(removed), "unchanged": len(documents) - len(changed)}
+    logger.info("Index sync plan", extra={"data": {**summary, "dry_run": dry_run}})
+    if dry_run or not (changed or removed):
+        return summary
+
+    async def upsert(batch: List[str]):
+        async with semaphore:
+            with track_stage("index_sync_embed"):
+                embeddings = await asyncio.to_thread(embed_passages, [documents[vector_id][0] for vector_id in batch])
+            vectors = [
+                {"id": vector_id, "values": embedding, "metadata": documents[vector_id][1]}
+                for vector_id, embedding in zip(batch, embeddings)
+            ]
+            for upsert_batch in batched(vectors, UPSERT_BATCH_SIZE):
+                await asyncio.to_thread(index.upsert, vectors=upsert_batch, namespace=NAMESPACE)
+
+    async def delete(batch: List[str]):
+        async with semaphore:
+            await asyncio.to_thread(index.delete, ids=batch, namespace=NAMESPACE)
+
+    try:
+        await asyncio.gather(
+            *(upsert(batch) for batch in batched(changed, embed_batch_size)),
+            *(delete(batch) for batch in batched(removed, DELETE_BATCH_SIZE)),
+        )
+    finally:
+        # Even a partial sync changes search results
+        vector_store.bump_index_version()
+    logger.info("Index sync complete", extra={"data": summary})
+    return summary
+
+
+async def run_periodic_sync(interval: float):
+    """
+    Background loop started by the API when INDEX_SYNC_INTERVAL_SECONDS is set.
+    """
+    while True:
+        try:
+            await sync_index()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Error in index_sync.run_periodic_sync()")
+        await asyncio.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync the Pinecone restaurant index with the backend catalog.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    parser.add_argument("--batch-size", type=int, default=None, help="Restaurants per embed request")
+    parser.add_argument("--concurrency", type=int, default=None, help="Embed/upsert requests in flight at once")
+    args = parser.parse_args()
+
+    setup_logging(settings.LOG_LEVEL, json_format=settings.LOG_JSON)
+    summary = asyncio.run(sync_index(dry_run=args.dry_run, embed_batch_size=args.batch_size, concurrency=args.concurrency))
+    logger.info("Index sync summary: %s", summary)
+
+
+if __name__ == "__main__":
+    main()
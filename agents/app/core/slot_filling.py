@@ -0,0 +1,222 @@
+"""
+Rule-based parsers for reservation slots. They read a single user message,
+so filling a pending slot costs the same however long the conversation is.
+The LLM extractor is only needed when these parsers cannot read the answer
+or when the user revises a detail given earlier.
+"""
+import calendar
+import re
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+SLOT_ORDER = ["restaurant_name", "date", "time", "party_size", "has_user_confirmed"]
+
+# How much a value from each source is trusted; a less trusted source never overwrites a more trusted one
+SOURCE_CONFIDENCE = {
+    "parser": 0.9,
+    "llm_incremental": 0.8,
+    "llm_full": 0.7,
+}
+
+WORD_NUMBERS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+NUMBER = r"(\d{1,3}|" + "|".join(WORD_NUMBERS) + r")"
+MAX_PARTY_SIZE = 50
+
+MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): number for number, name in enumerate(calendar.month_abbr) if name})
+MONTH = r"(" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\.?"
+WEEKDAYS = {name.lower(): number for number, name in enumerate(calendar.day_name)}
+
+AFFIRMATIVE = re.compile(r"\b(yes|yeah|yep|yup|sure|confirm|confirmed|go ahead|please do|book it|sounds good|ok|okay|perfect|correct|absolutely)\b")
+NEGATIVE = re.compile(r"\b(no(?! problem)|nope|don't|do not|cancel|wait|not yet|hold on)\b")
+
+
+class SlotValue:
+    """
+    A filled reservation slot and where it came from.
+    """
+    def __init__(self, value: Any, source: str, turn: int):
+        self.value = value
+        self.source = source
+        self.confidence = SOURCE_CONFIDENCE[source]
+        self.turn = turn
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"value": self.value, "source": self.source, "turn": self.turn}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SlotValue":
+        return cls(data["value"], data["source"], data["turn"])
+
+    def __repr__(self):
+        return f"SlotValue({self.value!r}, source={self.source!r}, turn={self.turn})"
+
+
+def _to_number(token: str) -> int:
+    return int(token) if token.isdigit() else WORD_NUMBERS[token]
+
+
+def parse_party_size(text: str, strict: bool = True) -> Optional[int]:
+    """
+    strict=False also accepts a bare number, for when the party size is the question just asked.
+    """
+    lowered = text.lower()
+    match = (
+        re.search(NUMBER + r"\s*(?:people|persons|person|guests|pax|adults|diners|of us)\b", lowered)
+        or re.search(r"\b(?:party of|table for|for)\s+" + NUMBER + r"\b(?!\s*(?:am|pm|a\.m|p\.m|:|\.\d|o'clock))", lowered)
+    )
+    if match is None and not strict:
+        match = re.fullmatch(r"\s*(?:just\s+)?" + NUMBER + r"\s*[.!]?\s*", lowered)
+    if match is not None:
+        size = _to_number(match.group(1))
+        return size if 0 < size <= MAX_PARTY_SIZE else None
+    if re.search(r"\b(just me|only me|myself)\b", lowered):
+        return 1
+    if re.search(r"\b(a couple|two of us|me and my (?:wife|husband|partner|friend|girlfriend|boyfriend))\b", lowered):
+        return 2
+    return None
+
+
+def parse_time(text: str, strict: bool = True) -> Optional[str]:
+    """
+    Returns HH:MM (24 hour). `strict` is accepted for a uniform parser signature;
+    bare numbers are never read as times since "7" could be a party size.
+    """
+    lowered = text.lower()
+    meridiem = None
+    match = re.search(r"(?<![\d.:/-])(\d{1,2})[:.](\d{2})(?![\d.:/-]\d)\s*(am|pm|a\.m\.?|p\.m\.?)?", lowered)
+    if match:
+        hour, minute, meridiem = int(match.group(1)), int(match.group(2)), match.group(3)
+    else:
+        match = re.search(r"\b(\d{1,2})\s*(am|pm|a\.m\.?|p\.m\.?)", lowered)
+        if match:
+            hour, minute, meridiem = int(match.group(1)), 0, match.group(2)
+        elif re.search(r"\bnoon\b", lowered):
+            return "12:00"
+        elif re.search(r"\bmidnight\b", lowered):
+            return "00:00"
+        else:
+            match = re.search(r"\b(\d{1,2})(?::(\d{2}))?\s*(?:o'clock\s*)?in the (evening|night|afternoon|morning)\b", lowered)
+            if not match:
+                return None
+            hour, minute = int(match.group(1)), int(match.group(2) or 0)
+            meridiem = "am" if match.group(3) == "morning" else "pm"
+
+    if meridiem:
+        if hour < 1 or hour > 12:
+            return None
+        if meridiem.startswith("p") and hour != 12:
+            hour += 12
+        elif meridiem.startswith("a") and hour == 12:
+            hour = 0
+    if hour > 23 or minute > 59:
+        return None
+    return f"{hour:02d}:{minute:02d}"
+
+
+def _future(candidate: date, today: date) -> date:
+    return candidate if candidate >= today else candidate.replace(year=candidate.year + 1)
+
+
+def parse_date(text: str, strict: bool = True, today: Optional[date] = None) -> Optional[str]:
+    """
+    Returns YYYY-MM-DD for ISO dates, day/month forms, month names, weekdays and
+    relative days ("today", "tomorrow", "day after tomorrow").
+    """
+    today = today or date.today()
+    lowered = text.lower()
+    try:
+        match = re.search(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b", lowered)
+        if match:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3))).isoformat()
+        if re.search(r"\bday after tomorrow\b", lowered):
+            return (today + timedelta(days=2)).isoformat()
+        if re.search(r"\btomorrow\b", lowered):
+            return (today + timedelta(days=1)).isoformat()
+        if re.search(r"\b(today|tonight|this evening)\b", lowered):
+            return today.isoformat()
+
+        match = re.search(r"\b(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?" + MONTH + r"(?:,?\s+(\d{4}))?\b", lowered)
+        if match:
+            day, month, year = int(match.group(1)), MONTHS[match.group(2)], match.group(3)
+        else:
+            match = re.search(r"\b" + MONTH + r"\s+(\d{1,2})(?:st|nd|rd|th)?(?:,?\s+(\d{4}))?\b", lowered)
+            if match:
+                month, day, year = MONTHS[match.group(1)], int(match.group(2)), match.group(3)
+            else:
+                # Day first, as written in India
+                match = re.search(r"(?<![\d:.])(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?(?![\d:])", lowered)
+                if match:
+                    day, month, year = int(match.group(1)), int(match.group(2)), match.group(3)
+        if match:
+            if year is None:
+                return _future(date(today.year, month, day), today).isoformat()
+            year = int(year)
+            return date(year if year > 99 else 2000 + year, month, day).isoformat()
+
+        match = re.search(r"\b(?:(next|this|on)\s+)?(" + "|".join(WEEKDAYS) + r")\b", lowered)
+        if match:
+            days_ahead = (WEEKDAYS[match.group(2)] - today.weekday()) % 7
+            if days_ahead == 0 and match.group(1) == "next":
+                days_ahead = 7
+            return (today + timedelta(days=days_ahead)).isoformat()
+    except ValueError:
+        # e.g. 31/02
+        return None
+    return None
+
+
+def parse_confirmation(text: str, strict: bool = True) -> Optional[bool]:
+    lowered = text.lower()
+    if NEGATIVE.search(lowered):
+        return False
+    if AFFIRMATIVE.search(lowered):
+        return True
+    return None
+
+
+def parse_restaurant_name(text: str, restaurant_names: Iterable[str]) -> Optional[str]:
+    """
+    Longest known restaurant name mentioned in `text`.
+    """
+    lowered = text.lower()
+    found = None
+    for name in restaurant_names:
+        if re.search(r"(?<!\w)" + re.escape(name.lower()) + r"(?!\w)", lowered) and (found is None or len(name) > len(found)):
+            found = name
+    return found
+
+
+def parse_slot(field: str, text: str, restaurant_names: Iterable[str] = (), strict: bool = True) -> Optional[Any]:
+    if field == "restaurant_name":
+        return parse_restaurant_name(text, restaurant_names)
+    if field == "date":
+        return parse_date(text, strict)
+    if field == "time":
+        return parse_time(text, strict)
+    if field == "party_size":
+        return parse_party_size(text, strict)
+    if field == "has_user_confirmed":
+        return parse_confirmation(text, strict)
+    return None
+
+
+def detect_changes(text: str, known: Dict[str, Any], restaurant_names: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Slots already filled that the message states a different value for.
+    Confirmation is not a revisable detail, so it is never reported.
+    """
+    changes = {}
+    for field, value in known.items():
+        if field == "has_user_confirmed" or value is None:
+            continue
+        parsed = parse_slot(field, text, restaurant_names, strict=True)
+        # Compare normalised forms so "7 PM" and "19:00" are the same time
+        current = parse_slot(field, str(value), restaurant_names, strict=False)
+        current = value if current is None else current
+        if parsed is not None and str(parsed).lower() != str(current).lower():
+            changes[field] = parsed
+    return changes
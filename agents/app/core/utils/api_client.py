@@ -1,6 +1,13 @@
 from typing import Optional, Dict, Any
 from ...config import settings
+from ...logging_config import request_id_var, REQUEST_ID_HEADER
 import httpx
+import orjson
+
+# The backend's rejection of a booking because the slot is full, as opposed to
+# an unknown restaurant, an invalid request or a server error
+NO_TABLES_STATUS = 404
+NO_TABLES_DETAIL = "No tables available at the requested time."
 
 class APIClient:
     def __init__(self):
@@ -44,17 +51,23 @@ class APIClient:
         params: Optional[Dict] = None, 
         json: Optional[Dict] = None
     ) -> Dict:
+        request_id = request_id_var.get()
         try:
             response = await self.client.request(
                 method=method,
                 url=f"{self.base_url}{endpoint}",
                 params=params,
-                json=json
+                json=json,
+                headers={REQUEST_ID_HEADER: request_id} if request_id else None
             )
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
         except httpx.HTTPStatusError as e:
-            return {"error": f"HTTP error: {str(e)}"}
+            try:
+                detail = orjson.loads(e.response.content).get("detail")
+            except Exception:
+                detail = None
+            return {"error": f"HTTP error: {str(e)}", "status_code": e.response.status_code, "detail": detail}
         except httpx.RequestError as e:
             return {"error": f"Request error: {str(e)}"}
         except Exception as e:
@@ -82,6 +95,60 @@ class APIClient:
         except Exception as e:
             return {"error": f"Failed to fetch user reservations: {str(e)}"}
         
+    async def get_restaurant_availability(self, restaurant_id: int, date: str, party_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Available tables per half-hour slot ("HH:MM" -> count) for a date (YYYY-MM-DD),
+        counting only tables free for the whole stay of a party of `party_size` when given.
+        """
+        try:
+            params = {"date": date}
+            if party_size:
+                params["party_size"] = party_size
+            response = await self.get(f"/restaurants/{restaurant_id}/availability", params=params)
+            if "error" in response:
+                return {"error": response["error"]}
+            return response
+        except Exception as e:
+            return {"error": f"Failed to fetch availability: {str(e)}"}
+
+    async def find_nearest_slots(self, restaurant_name: str, date: str, time: str, party_size: int, limit: int = 5) -> Dict[str, Any]:
+        """
+        Bookable (restaurant, date, time) options nearest to the requested date (YYYY-MM-DD)
+        and time (HH:MM), ordered by distance.
+        """
+        try:
+            response = await self.get("/availability/nearest", params={
+                "restaurant_name": restaurant_name,
+                "date": date,
+                "time": time,
+                "party_size": party_size,
+                "limit": limit
+            })
+            if isinstance(response, dict) and "error" in response:
+                return {"error": response["error"]}
+            return {"options": response}
+        except Exception as e:
+            return {"error": f"Failed to search availability: {str(e)}"}
+
+    async def list_restaurants(self, skip: int = 0, limit: int = 100) -> Dict[str, Any]:
+        """
+        Fetch one page of the backend restaurant catalog.
+        The backend answers 404 past the last page, which is returned as an empty page.
+        """
+        request_id = request_id_var.get()
+        try:
+            response = await self.client.get(
+                f"{self.base_url}/restaurants/",
+                params={"skip": skip, "limit": limit},
+                headers={REQUEST_ID_HEADER: request_id} if request_id else None
+            )
+            if response.status_code == 404:
+                return {"restaurants": []}
+            response.raise_for_status()
+            return {"restaurants": orjson.loads(response.content)}
+        except Exception as e:
+            return {"error": f"Failed to fetch restaurants: {str(e)}"}
+
     async def make_reservation(self, reservation_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Make a reservation using the backend API
@@ -109,10 +176,11 @@ class APIClient:
             response = await self.post("/book-restaurant/", json=reservation_data)
             
             if "error" in response:
+                full = response.get("status_code") == NO_TABLES_STATUS and response.get("detail") == NO_TABLES_DETAIL
                 return {
                     "status": "error",
-                    "message": response["error"],
-                    "error_code": "API_ERROR"
+                    "message": response.get("detail") or response["error"],
+                    "error_code": "NO_AVAILABILITY" if full else "API_ERROR"
                 }
             
             return {
@@ -132,5 +200,19 @@ class APIClient:
                 "message": f"Failed to make reservation: {str(e)}",
                 "error_code": "SYSTEM_ERROR"
             }
+
+    async def join_waitlist(self, reservation_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Put a party on the waitlist of a fully booked slot; takes the same fields as
+        make_reservation. Returns the waitlist entry ("status" is "Waiting" with a
+        "position", or "Promoted" if a table freed up meanwhile) or an error.
+        """
+        try:
+            response = await self.post("/waitlist/", json=reservation_data)
+            if "error" in response:
+                return {"error": response["error"]}
+            return response
+        except Exception as e:
+            return {"error": f"Failed to join waitlist: {str(e)}"}
         
     
\ No newline at end of file
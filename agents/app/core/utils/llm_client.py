@@ -1,58 +1,58 @@
-import json
-from typing import List, Dict
-from groq import Groq
-from google import genai
+import logging
+from typing import List, Dict, Optional
 from ...config import settings
+from ...logging_config import PAYLOAD_LOGGER
+from .llm_providers import GeminiProvider, GroqProvider, StubProvider
+from .llm_router import LLMRouter, LLMClientError
+
+payload_logger = logging.getLogger(PAYLOAD_LOGGER)
+
+__all__ = ["LLMClient", "LLMClientError", "build_default_router"]
+
+
+def build_default_router() -> LLMRouter:
+    """
+    Structured extraction prefers Gemini (it enforces the response schema),
+    everything else prefers Groq; each falls back to the other provider.
+    """
+    if settings.LLM_USE_STUB:
+        stub = StubProvider()
+        routes = {"default": [stub]}
+    else:
+        groq = GroqProvider()
+        gemini = GeminiProvider()
+        routes = {
+            "extraction": [gemini, groq],
+            "default": [groq, gemini],
+        }
+    return LLMRouter(
+        routes,
+        hedge=settings.LLM_HEDGE_ENABLED,
+        hedge_default_delay=settings.LLM_HEDGE_DEFAULT_DELAY,
+        max_workers=settings.LLM_MAX_WORKERS,
+        provider_max_concurrency=settings.LLM_PROVIDER_MAX_CONCURRENCY
+    )
 
 
 class LLMClient:
-    def __init__(self):
-        self.groq_llm = Groq(api_key=settings.GROQ_API_KEY)
-        self.gemini_llm = genai.Client(api_key=settings.GOOGLE_API_KEY)
-        
+    def __init__(self, router: Optional[LLMRouter] = None):
+        self.router = router or build_default_router()
 
-    def get_response(self, messages: List[Dict[str, str]],is_json=True,perf=False,response_schema=None):
-        print("#"*100)
-        print(messages)
-        try:
-            if perf:
-                response_format = None
-                if is_json:
-                    response_format = {
-                        'response_mime_type': 'application/json',
-                        'response_schema': response_schema,
-                    }
-                prompt = "".join([message['content'] if message['role']!='system' else f"{message['role']}:{message['content']}" for message in messages])
-                response = self.gemini_llm.models.generate_content(
-                    model="gemini-2.0-flash",
-                    contents=prompt,
-                    config=response_format,
-                )
-                print(response.text)
-                print("#"*100)
-                if is_json:
-                    return json.loads(response.text)
-                else:
-                    return response.text
-            else:
-                response_format = None
-                if is_json:
-                    response_format = {"type": "json_object"}
-                response = self.groq_llm.chat.completions.create(
-                    model=settings.DEFAULT_MODEL,
-                    messages=messages,
-                    temperature=1,
-                    max_completion_tokens=100,
-                    top_p=1,
-                    stream=False,
-                    response_format=response_format,
-                    stop=None,
-                )
-                print(response.choices[0].message.content)
-                print("#"*100)
-                if is_json:
-                    return json.loads(response.choices[0].message.content)
-                else:
-                    return response.choices[0].message.content
-        except Exception as e:
-            return {"Error in LLM Client": str(e)}
\ No newline at end of file
+    async def get_response(self, messages: List[Dict[str, str]],is_json=True,perf=False,response_schema=None):
+        """
+        Returns the parsed JSON object (is_json) or the response text.
+        `perf` marks schema-bound extraction calls. Raises LLMClientError when
+        every provider for the call type failed.
+        """
+        if perf:
+            call_type = "extraction"
+        elif is_json:
+            call_type = "classification"
+        else:
+            call_type = "generation"
+        if payload_logger.isEnabledFor(logging.DEBUG):
+            payload_logger.debug("LLM request", extra={"data": {"call_type": call_type, "messages": messages}})
+        response = await self.router.complete(call_type, messages, is_json=is_json, response_schema=response_schema)
+        if payload_logger.isEnabledFor(logging.DEBUG):
+            payload_logger.debug("LLM response", extra={"data": {"call_type": call_type, "content": response}})
+        return response
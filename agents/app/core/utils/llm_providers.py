@@ -0,0 +1,128 @@
+import json
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from ...config import settings
+
+# (text, prompt_tokens, completion_tokens)
+Completion = Tuple[str, int, int]
+
+
+class LLMProvider:
+    """
+    A single provider/model pair. `complete` is a blocking call that returns the
+    raw response text and the token usage reported by the provider. Subclasses
+    import and construct their SDK client on first use to keep startup fast.
+    """
+    name: str = "provider"
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    def complete(self, messages: List[Dict[str, str]], is_json: bool, response_schema=None) -> Completion:
+        raise NotImplementedError
+
+
+class GroqProvider(LLMProvider):
+    name = "groq"
+
+    def __init__(self, model: Optional[str] = None):
+        super().__init__(model or settings.DEFAULT_MODEL)
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from groq import Groq
+            self._client = Groq(api_key=settings.GROQ_API_KEY)
+        return self._client
+
+    def complete(self, messages, is_json, response_schema=None) -> Completion:
+        response_format = None
+        if is_json:
+            response_format = {"type": "json_object"}
+            if response_schema is not None:
+                # JSON mode does not enforce a schema, so describe it in the prompt
+                messages = [
+                    *messages,
+                    {"role": "system", "content": f"Respond with JSON matching this schema: {json.dumps(response_schema.model_json_schema())}"}
+                ]
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=1,
+            max_completion_tokens=100,
+            top_p=1,
+            stream=False,
+            response_format=response_format,
+            stop=None,
+        )
+        usage = getattr(response, "usage", None)
+        return (
+            response.choices[0].message.content,
+            getattr(usage, "prompt_tokens", 0) or 0,
+            getattr(usage, "completion_tokens", 0) or 0,
+        )
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, model: Optional[str] = None):
+        super().__init__(model or settings.GEMINI_MODEL)
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from google import genai
+            self._client = genai.Client(api_key=settings.GOOGLE_API_KEY)
+        return self._client
+
+    def complete(self, messages, is_json, response_schema=None) -> Completion:
+        response_format = None
+        if is_json:
+            response_format = {'response_mime_type': 'application/json'}
+            if response_schema is not None:
+                response_format['response_schema'] = response_schema
+        prompt = "".join([message['content'] if message['role']!='system' else f"{message['role']}:{message['content']}" for message in messages])
+        response = self.client.models.generate_content(
+            model=self.model,
+            contents=prompt,
+            config=response_format,
+        )
+        usage = getattr(response, "usage_metadata", None)
+        return (
+            response.text,
+            getattr(usage, "prompt_token_count", 0) or 0,
+            getattr(usage, "candidates_token_count", 0) or 0,
+        )
+
+
+class StubProvider(LLMProvider):
+    """
+    Local provider for tests and benchmarks. `responder` receives the call
+    arguments and returns either text or a JSON-serialisable object; `latency`
+    returns the number of seconds to block for each call.
+    """
+    name = "stub"
+
+    def __init__(self, responder: Optional[Callable] = None, latency: Optional[Callable[[], float]] = None, model: str = "stub-model"):
+        super().__init__(model)
+        self.responder = responder or self._default_responder
+        self.latency = latency
+
+    @staticmethod
+    def _default_responder(messages, is_json, response_schema):
+        return {} if is_json else "This is a stub response."
+
+    def complete(self, messages, is_json, response_schema=None) -> Completion:
+        if self.latency:
+            time.sleep(self.latency())
+        response = self.responder(messages, is_json, response_schema)
+        text = response if isinstance(response, str) else json.dumps(response)
+        # Rough token estimate so usage metrics are populated
+        return text, sum(len(message["content"]) for message in messages) // 4, len(text) // 4
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from .llm_providers import LLMProvider
+from .metrics import LLM_HEDGES, record_llm_usage
+
+logger = logging.getLogger(__name__)
+
+
+class LLMClientError(Exception):
+    """Raised when every provider for a call type failed."""
+
+
+class ProviderStats:
+    """
+    Rolling latency and error statistics for one provider over its last `window` calls.
+    """
+    def __init__(self, window: int = 100, min_samples: int = 5, max_error_rate: float = 0.5, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.calls = deque(maxlen=window)  # (seconds, ok)
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def record(self, seconds: float, ok: bool) -> None:
+        self.calls.append((seconds, ok))
+        if ok:
+            self.consecutive_failures = 0
+        else:
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.failure_threshold:
+                self.open_until = time.monotonic() + self.cooldown
+
+    @property
+    def error_rate(self) -> float:
+        if not self.calls:
+            return 0.0
+        return sum(1 for _, ok in self.calls if not ok) / len(self.calls)
+
+    def p95(self) -> Optional[float]:
+        latencies = sorted(seconds for seconds, ok in self.calls if ok)
+        if len(latencies) < self.min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    @property
+    def healthy(self) -> bool:
+        if time.monotonic() < self.open_until:
+            return False
+        return len(self.calls) < self.min_samples or self.error_rate <= self.max_error_rate
+
+
+class LLMRouter:
+    """
+    Routes each call type to an ordered list of providers.
+    Healthy providers are tried fastest-first by rolling p95 latency, unhealthy
+    ones last; providers without enough samples yet go first, in configured
+    order, so every provider gets measured.
+    With hedging on, a second provider is started when the first has not
+    answered within its p95, and whichever succeeds first wins.
+    At most `provider_max_concurrency` calls run per provider; further calls
+    wait for a slot, and providers with no free slot are ranked after the
+    others so hedges and fallbacks spill over to a less busy provider.
+    """
+    def __init__(
+        self,
+        routes: Dict[str, List[LLMProvider]],
+        hedge: bool = True,
+        hedge_default_delay: float = 2.0,
+        hedge_min_delay: float = 0.05,
+        max_workers: int = 32,
+        provider_max_concurrency: Optional[int] = None
+    ):
+        self.routes = routes
+        self.hedge = hedge
+        self.hedge_default_delay = hedge_default_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.stats: Dict[str, ProviderStats] = {}
+        self.provider_max_concurrency = provider_max_concurrency
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        # Provider SDK calls are blocking, so they run on a dedicated pool off the event loop
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._background = set()
+
+    def _stats(self, provider: LLMProvider) -> ProviderStats:
+        if provider.key not in self.stats:
+            self.stats[provider.key] = ProviderStats()
+        return self.stats[provider.key]
+
+    def _provider_slots(self, provider: LLMProvider) -> Optional[asyncio.Semaphore]:
+        if not self.provider_max_concurrency:
+            return None
+        if provider.key not in self._slots:
+            self._slots[provider.key] = asyncio.Semaphore(self.provider_max_concurrency)
+        return self._slots[provider.key]
+
+    def _saturated(self, provider: LLMProvider) -> bool:
+        slots = self._slots.get(provider.key)
+        return slots is not None and slots.locked()
+
+    def ranked_providers(self, call_type: str) -> List[LLMProvider]:
+        providers = self.routes.get(call_type) or self.routes["default"]
+
+        def rank(item):
+            order, provider = item
+            stats = self._stats(provider)
+            p95 = stats.p95()
+            return (not stats.healthy, self._saturated(provider), p95 is not None, p95 or 0.0, order)
+
+        return [provider for _, provider in sorted(enumerate(providers), key=rank)]
+
+    def hedge_delay(self, provider: LLMProvider) -> float:
+        p95 = self._stats(provider).p95()
+        return max(self.hedge_min_delay, p95 if p95 is not None else self.hedge_default_delay)
+
+    async def _attempt(self, provider: LLMProvider, messages, is_json: bool, response_schema):
+        slots = self._provider_slots(provider)
+        if slots is None:
+            return await self._call(provider, messages, is_json, response_schema)
+        async with slots:
+            return await self._call(provider, messages, is_json, response_schema)
+
+    async def _call(self, provider: LLMProvider, messages, is_json: bool, response_schema):
+        loop = asyncio.get_running_loop()
+        # Timed from here so waiting for a slot does not count as provider latency
+        started = time.perf_counter()
+        try:
+            text, prompt_tokens, completion_tokens = await loop.run_in_executor(
+                self.executor, provider.complete, messages, is_json, response_schema
+            )
+            result = json.loads(text) if is_json else text
+        except Exception:
+            self._stats(provider).record(time.perf_counter() - started, ok=False)
+            record_llm_usage(provider.name, provider.model, status="error")
+            raise
+        self._stats(provider).record(time.perf_counter() - started, ok=True)
+        record_llm_usage(provider.name, provider.model, prompt_tokens, completion_tokens)
+        return result
+
+    def _start(self, provider: LLMProvider, messages, is_json, response_schema) -> asyncio.Task:
+        task = asyncio.ensure_future(self._attempt(provider, messages, is_json, response_schema))
+        task.provider = provider
+        # Keep a reference so a hedge that loses the race can finish and record its stats
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    async def complete(self, call_type: str, messages: List[Dict[str, str]], is_json: bool = True, response_schema=None):
+        providers = self.ranked_providers(call_type)
+        pending = set()
+        errors = []
+        next_provider = 0
+
+        while next_provider < len(providers) or pending:
+            if not pending:
+                pending.add(self._start(providers[next_provider], messages, is_json, response_schema))
+                next_provider += 1
+
+            can_hedge = self.hedge and next_provider < len(providers) and len(pending) == 1
+            timeout = self.hedge_delay(next(iter(pending)).provider) if can_hedge else None
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                LLM_HEDGES.labels(call_type).inc()
+                pending.add(self._start(providers[next_provider], messages, is_json, response_schema))
+                next_provider += 1
+                continue
+
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                errors.append(f"{task.provider.key}: {task.exception()}")
+                logger.warning("LLM provider %s failed for %s: %s", task.provider.key, call_type, task.exception())
+
+        raise LLMClientError(f"All LLM providers failed for {call_type}: {'; '.join(errors)}")
@@ -0,0 +1,93 @@
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+# Buckets tuned for LLM and network round trips (5 ms to 30 s)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HTTP_REQUESTS = Counter(
+    "foodiespot_http_requests_total",
+    "HTTP requests handled by the agents service",
+    ["method", "path", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "foodiespot_http_request_duration_seconds",
+    "End-to-end HTTP request latency",
+    ["method", "path"],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_LATENCY = Histogram(
+    "foodiespot_stage_duration_seconds",
+    "Latency of each stage of the agent pipeline",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_ERRORS = Counter(
+    "foodiespot_stage_errors_total",
+    "Exceptions raised inside a pipeline stage",
+    ["stage"]
+)
+LLM_REQUESTS = Counter(
+    "foodiespot_llm_requests_total",
+    "LLM calls by provider, model and outcome",
+    ["provider", "model", "status"]
+)
+LLM_TOKENS = Counter(
+    "foodiespot_llm_tokens_total",
+    "Tokens used by provider, model and direction (prompt/completion)",
+    ["provider", "model", "direction"]
+)
+LLM_HEDGES = Counter(
+    "foodiespot_llm_hedged_requests_total",
+    "LLM calls where a second provider was started after the first missed its p95 deadline",
+    ["call_type"]
+)
+SLOT_FILL_REQUESTS = Counter(
+    "foodiespot_slot_fill_requests_total",
+    "Reservation turns by how the details were extracted (parser, llm_incremental, llm_full)",
+    ["mode"]
+)
+CHAT_REJECTIONS = Counter(
+    "foodiespot_chat_rejections_total",
+    "Chat turns refused by admission control, by reason (global_rate, session_rate, queue_full, deadline)",
+    ["reason"]
+)
+CACHE_REQUESTS = Counter(
+    "foodiespot_cache_requests_total",
+    "Cache lookups by cache name and result (hit/miss)",
+    ["cache", "result"]
+)
+
+
+@contextmanager
+def track_stage(stage: str):
+    """
+    Time a block of the agent pipeline and record it under `stage`.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_LATENCY.labels(stage).observe(time.perf_counter() - started)
+
+
+def record_llm_usage(provider: str, model: str, prompt_tokens: int = 0, completion_tokens: int = 0, status: str = "success"):
+    LLM_REQUESTS.labels(provider, model, status).inc()
+    if prompt_tokens:
+        LLM_TOKENS.labels(provider, model, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(provider, model, "completion").inc(completion_tokens)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def render_metrics():
+    """
+    Returns the metrics payload and its content type in the Prometheus text format.
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
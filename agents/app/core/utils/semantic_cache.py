@@ -0,0 +1,110 @@
+import math
+import operator
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional
+from .metrics import record_cache_lookup
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _unit(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+class _Entry:
+    __slots__ = ("vector", "value", "expires_at")
+
+    def __init__(self, vector: List[float], value: Any, expires_at: float):
+        self.vector = vector
+        self.value = value
+        self.expires_at = expires_at
+
+
+class SemanticCache:
+    """
+    LRU cache keyed by text embeddings. A lookup hits when an exact (normalised)
+    text match exists, or when the cosine similarity between the query vector
+    and a cached vector is at least `threshold`.
+    Entries expire after `ttl` seconds and at most `max_entries` are kept.
+    `generation` returns a version of the underlying data (e.g. the vector
+    index); when it changes every entry is dropped.
+    """
+    def __init__(
+        self,
+        name: str,
+        threshold: float = 0.92,
+        ttl: float = 3600.0,
+        max_entries: int = 256,
+        generation: Optional[Callable[[], Any]] = None
+    ):
+        self.name = name
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation = generation
+        self._generation = generation() if generation else None
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def invalidate(self) -> None:
+        self._entries.clear()
+
+    def _check_generation(self) -> None:
+        if self.generation is None:
+            return
+        current = self.generation()
+        if current != self._generation:
+            self._generation = current
+            self.invalidate()
+
+    def _live(self, key: str, entry: _Entry, now: float) -> bool:
+        if entry.expires_at <= now:
+            del self._entries[key]
+            return False
+        return True
+
+    def get_exact(self, text: str) -> Optional[Any]:
+        """
+        Cheap lookup by normalised text, used before paying for an embedding.
+        Misses are not recorded since a similarity lookup usually follows.
+        """
+        self._check_generation()
+        key = _normalize_text(text)
+        entry = self._entries.get(key)
+        if entry is None or not self._live(key, entry, time.monotonic()):
+            return None
+        self._entries.move_to_end(key)
+        record_cache_lookup(self.name, True)
+        return entry.value
+
+    def get_similar(self, vector: List[float]) -> Optional[Any]:
+        self._check_generation()
+        query = _unit(vector)
+        now = time.monotonic()
+        best_key, best_score = None, self.threshold
+        for key, entry in list(self._entries.items()):
+            if not self._live(key, entry, now):
+                continue
+            score = sum(map(operator.mul, query, entry.vector))
+            if score >= best_score:
+                best_key, best_score = key, score
+
+        record_cache_lookup(self.name, best_key is not None)
+        if best_key is None:
+            return None
+        self._entries.move_to_end(best_key)
+        return self._entries[best_key].value
+
+    def put(self, text: str, vector: List[float], value: Any) -> None:
+        self._check_generation()
+        key = _normalize_text(text)
+        self._entries[key] = _Entry(_unit(vector), value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -1,20 +1,111 @@
-from pinecone.grpc import PineconeGRPC as Pinecone
-from pinecone import ServerlessSpec
+import hashlib
 import time
 import json
+import logging
 import os
+import re
 from ..config import settings
+from ..logging_config import setup_logging
+from .utils.metrics import track_stage
 
-pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+logger = logging.getLogger(__name__)
 
 index_name = "restaurant-search"
+NAMESPACE = "restaurants"
+EMBED_MODEL = "multilingual-e5-large"
+# Pinecone's inference API accepts at most 96 passages per embed request for this model
+EMBED_BATCH_SIZE = 96
 
+CATALOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "restaurants.json")
+METADATA_FIELDS = (
+    "name", "cuisine", "area", "price_range", "ambiance", "description", "specialties",
+    "dietary_options", "features", "phone", "address", "email", "website", "hours", "reservation_required",
+)
+CONTACT_FIELDS = ("phone", "address", "email", "website", "hours", "reservation_required")
+
+pc = None
 index = None
+# Bumped whenever the index is (re)loaded or deleted so caches built on it can be dropped
+index_version = 0
+
+def get_pinecone_client():
+    """
+    Build the Pinecone client on first use so importing this module stays cheap.
+    """
+    global pc
+    if pc is None:
+        from pinecone.grpc import PineconeGRPC as Pinecone
+        pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+    return pc
+
+def batched(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def load_catalog_file():
+    with open(CATALOG_FILE) as f:
+        return json.load(f)
+
+def restaurant_document(restaurant):
+    """
+    Returns the text to embed and the vector metadata for an entry of restaurants.json.
+    The metadata carries a hash of both so index syncs can skip unchanged restaurants.
+    """
+    metadata = {field: restaurant.get(field, "") for field in METADATA_FIELDS if field not in CONTACT_FIELDS}
+    metadata.update({field: restaurant.get("contact", {}).get(field, "") for field in CONTACT_FIELDS})
+    return with_content_hash(restaurant["text_for_embedding"], metadata)
+
+def with_content_hash(text, metadata):
+    metadata = {key: value for key, value in metadata.items() if key != "content_hash"}
+    payload = json.dumps({"text": text, "metadata": metadata}, sort_keys=True)
+    metadata["content_hash"] = hashlib.sha256(payload.encode()).hexdigest()
+    return text, metadata
+
+def embed_passages(texts):
+    """
+    Embeds one batch of passages (at most EMBED_BATCH_SIZE) and returns their vectors.
+    """
+    embeddings = get_pinecone_client().inference.embed(
+        model=EMBED_MODEL,
+        inputs=texts,
+        parameters={
+            "input_type": "passage",
+            "truncate": "END"
+        }
+    )
+    return [embedding["values"] for embedding in embeddings]
+
+def vector_metadata(vector):
+    """
+    Metadata of a fetched vector; the gRPC client returns objects, the REST client dicts.
+    """
+    metadata = vector.get("metadata") if isinstance(vector, dict) else getattr(vector, "metadata", None)
+    return metadata or {}
+
+def fetch_all_metadata(batch_size=100):
+    """
+    Returns {vector id: metadata} for every restaurant in the index.
+    """
+    index = get_pinecone_index()
+    ids = [vector_id for page in index.list(namespace=NAMESPACE) for vector_id in page]
+    metadata = {}
+    for batch in batched(ids, batch_size):
+        response = index.fetch(ids=batch, namespace=NAMESPACE)
+        vectors = response.get("vectors") if isinstance(response, dict) else response.vectors
+        metadata.update({vector_id: vector_metadata(vector) for vector_id, vector in vectors.items()})
+    return metadata
+
+def bump_index_version():
+    global index_version
+    index_version += 1
 
 def init_vector_index():
-    print("Creating Pinecone index...")
-    global index
+    logger.info("Creating Pinecone index...")
+    global index, index_version
+    index_version += 1
+    pc = get_pinecone_client()
     if not pc.has_index(index_name):
+        from pinecone import ServerlessSpec
         pc.create_index(
             name=index_name,
             dimension=1024,
@@ -24,122 +115,160 @@ def init_vector_index():
                 region="us-east-1"
             )
         )
-        print("Index created successfully!")
+        logger.info("Index created successfully!")
         while not pc.describe_index(index_name).status['ready']:
             time.sleep(1)
         index = pc.Index(index_name)
-        print("Index is ready!")
-        restaurants_dir = os.path.dirname(os.path.abspath(__file__))
-        file_path = os.path.join(restaurants_dir, "restaurants.json")
-        with open(file_path) as f:
-            restaurants = json.load(f)
-        restaurant_texts = [restaurant["text_for_embedding"] for restaurant in restaurants]
-
-        embeddings = pc.inference.embed(
-            model="multilingual-e5-large",
-            inputs=restaurant_texts,
-            parameters={
-                "input_type": "passage",
-                "truncate": "END"
-            }
-        )
+        logger.info("Index is ready!")
+        restaurants = load_catalog_file()
         records = []
-        for restaurant, embedding in zip(restaurants, embeddings):
-            records.append({
-                "id": str(restaurant["id"]),
-                "values": embedding["values"],
-                "metadata": {
-                    "name": restaurant["name"],
-                    "cuisine": restaurant["cuisine"],
-                    "area": restaurant["area"],
-                    "price_range": restaurant["price_range"],
-                    "ambiance": restaurant["ambiance"],
-                    "description": restaurant["description"],
-                    "specialties": restaurant["specialties"],
-                    "dietary_options": restaurant["dietary_options"],
-                    "features": restaurant["features"],
-                    "phone": restaurant['contact']["phone"],
-                    "address": restaurant['contact']["address"],
-                    "email": restaurant['contact']["email"],
-                    "website": restaurant['contact']["website"],
-                    "hours": restaurant['contact']["hours"],
-                    "reservation_required": restaurant['contact']["reservation_required"]
-                }
-            })
-    
-        index.upsert(
-            vectors=records,
-            namespace="restaurants"
-        )
-        print(f"Upserted {len(records)} restaurant records to Pinecone")
+        for restaurant in restaurants:
+            text, metadata = restaurant_document(restaurant)
+            records.append({"id": str(restaurant["id"]), "text": text, "metadata": metadata})
+        for batch in batched(records, EMBED_BATCH_SIZE):
+            embeddings = embed_passages([record["text"] for record in batch])
+            index.upsert(
+                vectors=[
+                    {"id": record["id"], "values": embedding, "metadata": record["metadata"]}
+                    for record, embedding in zip(batch, embeddings)
+                ],
+                namespace=NAMESPACE
+            )
+        logger.info("Upserted %d restaurant records to Pinecone", len(records))
     else:
         index = pc.Index(index_name)
-        print("Index already exists, skipping creation.")
-        print("Index stats:", index.describe_index_stats())
+        logger.info("Index already exists, skipping creation.")
 
 
 def delete_index():
-    global index
-    print("Deleting Pinecone index...")
+    global index, index_version
+    index_version += 1
+    logger.info("Deleting Pinecone index...")
+    pc = get_pinecone_client()
     if pc.has_index(index_name):
         pc.delete_index(index_name)
         index = None 
-    print("Index deleted successfully!")
+    logger.info("Index deleted successfully!")
 
 def get_pinecone_index():
     global index
     if index is None:
+        pc = get_pinecone_client()
         if not pc.has_index(index_name):
             init_vector_index()
         else:
             index = pc.Index(index_name)
     return index
 
+def embed_query(query):
+    """
+    Returns the query embedding for `query`.
+    """
+    with track_stage("embedding"):
+        query_embedding = get_pinecone_client().inference.embed(
+            model=EMBED_MODEL,
+            inputs=[query],
+            parameters={"input_type": "query"}
+        )
+    return query_embedding[0]["values"]
+
 def search_restaurants(query,filter_dict=None,top_k=5):
     """
     This function searches for restaurants based on the user query in the vector database.
     """
     index = get_pinecone_index()
-    query_embedding = pc.inference.embed(
-        model="multilingual-e5-large",
-        inputs=[query],
-        parameters={"input_type": "query"}
-    )
-    results = index.query(
-        namespace="restaurants",
-        vector=query_embedding[0]["values"],
-        filter=filter_dict,
-        top_k=top_k,
-        include_metadata=True
-    )
+    query_vector = embed_query(query)
+    with track_stage("vector_query"):
+        results = index.query(
+            namespace=NAMESPACE,
+            vector=query_vector,
+            filter=filter_dict,
+            top_k=top_k,
+            include_metadata=True
+        )
     return results
 
 
-def format_search_results_for_llm(results):
+# Columns that are always sent, in this order
+CORE_COLUMNS = ("name", "area", "cuisine", "price_range")
+# Optional columns, most useful first; dropped from the end when over budget
+DETAIL_COLUMNS = ("specialties", "dietary_options", "features", "ambiance", "description")
+# Contact columns are only sent when the question asks for them; triggers match whole words
+COLUMN_TRIGGERS = {
+    "phone": ("phone", "telephone", "call", "contact", "phone number", "contact number"),
+    "address": ("address", "where is", "located", "location", "directions", "how do i get"),
+    "email": ("email", "e-mail", "mail", "contact"),
+    "website": ("website", "site", "online", "link", "url"),
+    "hours": ("hours", "opening", "closing", "open until", "open on", "open at", "closes", "close at", "timing", "timings"),
+    "reservation_required": ("reservation", "reservations", "reserve", "book", "booking", "walk-in", "walk in"),
+}
+COLUMN_PATTERNS = {
+    column: re.compile(r"\b(?:" + "|".join(re.escape(trigger) for trigger in triggers) + r")\b")
+    for column, triggers in COLUMN_TRIGGERS.items()
+}
+MAX_CELL_CHARS = {"description": 140, "features": 100, "specialties": 100}
+DEFAULT_MAX_CELL_CHARS = 80
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 1
+
+
+def _cell(metadata, column):
+    value = " ".join(str(metadata.get(column, "") or "-").split()).replace("|", "/")
+    limit = MAX_CELL_CHARS.get(column, DEFAULT_MAX_CELL_CHARS)
+    return value if len(value) <= limit else value[:limit - 1].rstrip() + "…"
+
+
+def _render_table(rows, columns):
+    lines = ["RESTAURANT SEARCH RESULTS (best match first)", " | ".join(columns)]
+    lines.extend(" | ".join(row[column] for column in columns) for row in rows)
+    return "\n".join(lines)
+
+
+def format_search_results_for_llm(results, question=None, token_budget=None):
     """
-    Helper function to format the search results from vector database to nice text to include in the context for the LLM
+    Formats the search results as a compact table for the LLM context.
+    Contact columns are included only when `question` asks for them. When the
+    table exceeds `token_budget`, the optional detail columns are dropped first,
+    then the lowest-ranked restaurants (the best match is always kept), and only
+    then the columns the question asked for.
+
+    >>> matches = [{"metadata": {"name": name, "area": "Downtown", "cuisine": "Thai", "price_range": "$$",
+    ...             "phone": "555-0100", "description": "Family run"}} for name in ("Baan", "Siam", "Lotus")]
+    >>> print(format_search_results_for_llm({"matches": matches}, question="What is their phone number?", token_budget=35))
+    RESTAURANT SEARCH RESULTS (best match first)
+    name | area | cuisine | price_range | phone
+    Baan | Downtown | Thai | $$ | 555-0100
     """
     if not results or "matches" not in results or not results["matches"]:
         return "No restaurants found matching your criteria."
-    formatted_context = "RESTAURANT SEARCH RESULTS:\n\n"
-    for i, match in enumerate(results["matches"], 1):
-        restaurant = match["metadata"]
-        similarity_score = match["score"]
-        formatted_context += f"RESTAURANT #{i} (Relevance Score: {similarity_score:.2f})\n"
-        formatted_context += f"Name: {restaurant['name']}\n"
-        formatted_context += f"Cuisine: {restaurant['cuisine']}\n"
-        formatted_context += f"Location: {restaurant['area']}\n"
-        formatted_context += f"Price Range: {restaurant['price_range']}\n"
-        formatted_context += f"Ambiance: {restaurant['ambiance']}\n"
-        formatted_context += f"Description: {restaurant['description']}\n"
-        formatted_context += f"Specialties: {restaurant['specialties']}\n"
-        formatted_context += f"Dietary Options: {restaurant['dietary_options']}\n"
-        formatted_context += f"Contact:\n"
-        formatted_context += f"\tPhone: {restaurant['phone']}\n"
-        formatted_context += f"\tAddress: {restaurant['address']}\n"
-        formatted_context += f"\tEmail: {restaurant['email']}\n"
-        formatted_context += f"\tWebsite: {restaurant['website']}\n"
-        formatted_context += f"\tHours: {restaurant['hours']}\n"
-        formatted_context += f"\tReservation Required: {restaurant['reservation_required']}\n"
-        formatted_context += f"Features: {restaurant['features']}\n\n"
-    return formatted_context
\ No newline at end of file
+    token_budget = token_budget or settings.SEARCH_CONTEXT_TOKEN_BUDGET
+
+    lowered = (question or "").lower()
+    requested = [column for column, pattern in COLUMN_PATTERNS.items() if pattern.search(lowered)]
+    details = list(DETAIL_COLUMNS)
+    columns = [*CORE_COLUMNS, *requested, *details]
+    rows = [{column: _cell(match["metadata"], column) for column in columns} for match in results["matches"]]
+
+    context = _render_table(rows, columns)
+    while estimate_tokens(context) > token_budget:
+        if details:
+            columns.remove(details.pop())
+        elif len(rows) > 1:
+            rows.pop()
+        elif len(columns) > len(CORE_COLUMNS):
+            columns.pop()
+        else:
+            return context[:token_budget * 4]
+        context = _render_table(rows, columns)
+    return context
+
+
+if __name__ == "__main__":
+    # Bootstrap the index outside of the serving process:
+    # python -m app.core.vector_store
+    setup_logging(settings.LOG_LEVEL, json_format=settings.LOG_JSON)
+    init_vector_index()
+    logger.info("Index stats: %s", get_pinecone_index().describe_index_stats())
@@ -1,23 +1,61 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import logging
+import math
+import time
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
+from .profiling import startup_profile
+from .admission import AdmissionController, Overloaded
+from .config import settings
+from .logging_config import setup_logging, request_id_var, session_id_var, new_request_id, REQUEST_ID_HEADER
 from .schemas import ChatRequest, ChatResponse, GetConversationHistoryResponse
-from .session_manager import SessionManager
+from .session_manager import SessionBusy, SessionManager
+from .state_store import build_state_store, VersionConflict
 from .core.foodiespot_agent import FoodieSpotAgent
 from .core.vector_store import init_vector_index
+from .core.index_sync import run_periodic_sync
 from .core.utils.api_client import APIClient
+from .core.utils.metrics import HTTP_REQUESTS, HTTP_LATENCY, record_cache_lookup, render_metrics
+
+setup_logging(settings.LOG_LEVEL, json_format=settings.LOG_JSON, payload_sample_rate=settings.LOG_PAYLOAD_SAMPLE_RATE)
+logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_vector_index()
+    # The Pinecone index is connected lazily on the first search;
+    # bootstrap it with `python -m app.core.vector_store`
+    if settings.INIT_VECTOR_INDEX_ON_STARTUP:
+        with startup_profile.step("init_vector_index"):
+            init_vector_index()
+    logger.info(startup_profile.report())
+    sync_task = None
+    if settings.INDEX_SYNC_INTERVAL_SECONDS > 0:
+        sync_task = asyncio.create_task(run_periodic_sync(settings.INDEX_SYNC_INTERVAL_SECONDS))
+    purge_task = asyncio.create_task(purge_expired_sessions())
     yield
-    # Currently nothing to do here (when the app is shutting down)
+    purge_task.cancel()
+    if sync_task is not None:
+        sync_task.cancel()
+
+async def purge_expired_sessions():
+    # Every worker runs this; the deletes are idempotent
+    while True:
+        try:
+            purged = await session_manager.purge_expired()
+            if purged:
+                logger.info("Purged %d expired sessions", purged)
+        except Exception:
+            logger.exception("Error in purge_expired_sessions()")
+        await asyncio.sleep(settings.SESSION_PURGE_INTERVAL_SECONDS)
 
 app = FastAPI(
     title="Restaurant Agent API",
     description="Chat API for restaurant management agent",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -28,9 +66,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-agent = FoodieSpotAgent()
-session_manager = SessionManager(session_timeout=3600) 
-api_client = APIClient()
+@app.middleware("http")
+async def correlate_request(request: Request, call_next):
+    request_id = request.headers.get(REQUEST_ID_HEADER) or new_request_id()
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers[REQUEST_ID_HEADER] = request_id
+    return response
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Use the route template (e.g. /conversation/{session_id}) to keep label cardinality bounded
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    HTTP_REQUESTS.labels(request.method, path, response.status_code).inc()
+    HTTP_LATENCY.labels(request.method, path).observe(time.perf_counter() - started)
+    return response
+
+with startup_profile.step("construct_agent"):
+    agent = FoodieSpotAgent()
+    # Conversation state is kept in a store shared by all workers, so any worker can serve any turn
+    session_manager = SessionManager(
+        store=build_state_store(settings.STATE_STORE_URL, settings.SESSION_TIMEOUT_SECONDS),
+        session_timeout=settings.SESSION_TIMEOUT_SECONDS,
+        lease_seconds=settings.SESSION_LEASE_SECONDS
+    )
+    api_client = APIClient()
+    admission = AdmissionController(
+        rate=settings.CHAT_RATE_LIMIT_PER_SECOND,
+        burst=settings.CHAT_RATE_LIMIT_BURST,
+        session_rate=settings.CHAT_SESSION_RATE_LIMIT_PER_MINUTE / 60,
+        session_burst=settings.CHAT_SESSION_RATE_LIMIT_BURST,
+        max_concurrency=settings.CHAT_MAX_CONCURRENCY,
+        max_queue=settings.CHAT_MAX_QUEUE,
+        queue_timeout=settings.CHAT_QUEUE_TIMEOUT_SECONDS,
+        enabled=settings.CHAT_ADMISSION_ENABLED
+    )
 
 @app.post("/chat", response_model=ChatResponse, tags=["Chat"])
 async def chat(request: ChatRequest) -> ChatResponse:
@@ -38,29 +114,67 @@ async def chat(request: ChatRequest) -> ChatResponse:
         session_id = str(request.session_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid session ID")
+    session_id_var.set(session_id)
 
-    session_manager.add_message(session_id, "user", request.message)
+    try:
+        async with admission.admit(session_id):
+            return await answer_turn(request, session_id)
+    except Overloaded as exc:
+        logger.info("Refused chat turn of session %s: %s", session_id, exc.reason)
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, please retry shortly",
+            headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+        )
+
+async def answer_turn(request: ChatRequest, session_id: str) -> ChatResponse:
+    try:
+        # Taken before any work, so a concurrent turn of this session is refused before it can book anything
+        async with session_manager.lease(session_id):
+            return await answer_leased_turn(request, session_id)
+    except SessionBusy:
+        logger.info("Refused concurrent turn of session %s", session_id)
+        raise HTTPException(status_code=409, detail="Another message of this conversation is still being answered, please retry")
+
+async def answer_leased_turn(request: ChatRequest, session_id: str) -> ChatResponse:
+    session = await session_manager.get_session(session_id)
+    if not session:
+        session = session_manager.new_session(session_id)
+    session.add_message("user", request.message)
 
-    user_data = None
     if request.user_id:
-        session = session_manager.get_session(session_id)
-        if not hasattr(session,'user_data') or not session.user_data:
+        has_user_data = bool(session.user_data)
+        record_cache_lookup("user_details", has_user_data)
+        if not has_user_data:
             user_data = await api_client.get_user_details(request.user_id)
             if "error" not in user_data:
-                session.user_data = user_data
+                session.set_user_data(user_data)
     
-    result = await agent.run(request.message,session.user_data)
+    result = await agent.run(request.message, session.user_data, session.agent_context)
     response = result["message"]
     
-    session_manager.add_message(session_id, "assistant", response)
+    session.add_message("assistant", response)
+    try:
+        await session_manager.save(session)
+    except VersionConflict:
+        # The lease ran out and another turn saved meanwhile. This turn's side effects (a booking,
+        # say) already happened, so its messages and context go on top of the latest copy.
+        logger.warning("Session %s was updated after the lease of a running turn expired", session_id)
+        latest = await session_manager.get_session(session_id) or session_manager.new_session(session_id)
+        latest.messages.extend(session.messages[-2:])
+        latest.agent_context = session.agent_context
+        latest.user_data = session.user_data or latest.user_data
+        try:
+            await session_manager.save(latest)
+        except VersionConflict:
+            raise HTTPException(status_code=409, detail="The conversation was updated by another request, please retry")
     return ChatResponse(response=str(response), session_id=session_id)
 
 @app.get("/conversation/{session_id}", response_model=GetConversationHistoryResponse, tags=["Chat"])
 async def get_conversation_history(session_id: str):
-    session = session_manager.get_session(session_id)
+    session = await session_manager.get_session(session_id)
     if not session:
-        agent.clear()
-        session = session_manager.create_session()
+        session = await session_manager.create_session()
     
     return GetConversationHistoryResponse(
         history=session.messages,
@@ -69,5 +183,10 @@ async def get_conversation_history(session_id: str):
 
 @app.delete("/session/{session_id}", tags=["Chat"])
 async def clear_session(session_id: str):
-    session_manager.delete_session(session_id)
-    return {"message": "Session cleared"}
\ No newline at end of file
+    await session_manager.delete_session(session_id)
+    return {"message": "Session cleared"}
+
+@app.get("/metrics", tags=["Monitoring"])
+async def metrics():
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
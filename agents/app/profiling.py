@@ -0,0 +1,66 @@
+import re
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(.+)$")
+
+
+class StartupProfile:
+    """
+    StartupProfile records how long each named startup step takes.
+    """
+    def __init__(self):
+        self.created_at = time.perf_counter()
+        self.steps: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def step(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((name, time.perf_counter() - started))
+
+    def report(self) -> str:
+        lines = ["Startup profile:"]
+        for name, seconds in self.steps:
+            lines.append(f"  {name:<30} {seconds * 1000:9.1f} ms")
+        lines.append(f"  {'total since import':<30} {(time.perf_counter() - self.created_at) * 1000:9.1f} ms")
+        return "\n".join(lines)
+
+
+startup_profile = StartupProfile()
+
+
+def import_times(module: str = "app.main", top: int = 20) -> List[Tuple[str, float, float]]:
+    """
+    Import `module` in a fresh interpreter with -X importtime and return the
+    slowest modules as (name, self_ms, cumulative_ms), sorted by cumulative time.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    timings = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, name = match.groups()
+            timings.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    timings.sort(key=lambda timing: timing[2], reverse=True)
+    return timings[:top]
+
+
+if __name__ == "__main__":
+    # Print the slowest imports of the app: python -m app.profiling [module] [top]
+    module = sys.argv[1] if len(sys.argv) > 1 else "app.main"
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(f"{'module':<60} {'self ms':>10} {'cumul. ms':>10}")
+    for name, self_ms, cumulative_ms in import_times(module, top):
+        print(f"{name:<60} {self_ms:>10.1f} {cumulative_ms:>10.1f}")
@@ -1,48 +1,102 @@
+import asyncio
+import json
+import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
-from typing import Dict, Optional, List
-from .schemas import Message, User
+from typing import Any, Dict, Optional, List
+from .schemas import Message
+from .state_store import StateStore, InMemoryStateStore
+from .core.foodiespot_agent import AgentContext, AgentState
 
 class Session:
-    def __init__(self,id:str,messages):
+    """
+    Everything a worker needs to continue a conversation: the chat messages, the cached
+    user details and the agent context. `version` is the stored version this copy was
+    read at; saving fails with VersionConflict if another worker saved in between.
+    """
+    def __init__(self,id:str,messages, agent_context: Optional[AgentContext] = None, user_data: Optional[Dict[str, Any]] = None, version: Optional[int] = None, last_activity: Optional[datetime] = None):
         self.id = id
         self.messages: List[Message] = messages
-        self.last_activity: datetime = datetime.now(timezone.utc)
-        self.user_data: Optional[User] = None
+        self.last_activity: datetime = last_activity or datetime.now(timezone.utc)
+        self.user_data: Optional[Dict[str, Any]] = user_data
+        self.agent_context: AgentContext = agent_context or AgentContext(current_state=AgentState.GREETING)
+        self.version = version
 
-    def set_user_data(self, user_data: User):
+    def set_user_data(self, user_data: Dict[str, Any]):
         self.user_data = user_data
         self.last_activity = datetime.now(timezone.utc)
 
     def add_message(self, role: str, content: str):
-        self.messages.append(Message(role=role, content=content))
+        self.messages.append(Message(role=role, content=content, timestamp=datetime.now(timezone.utc)))
         self.last_activity =  datetime.now(timezone.utc)
 
+    def to_json(self) -> str:
+        return json.dumps({
+            "messages": [message.model_dump(mode="json") for message in self.messages],
+            "user_data": self.user_data,
+            "agent_context": self.agent_context.model_dump(mode="json"),
+        })
+
+    @classmethod
+    def from_record(cls, session_id: str, version: int, data: str, updated_at: float) -> "Session":
+        payload = json.loads(data)
+        return cls(
+            id=session_id,
+            messages=[Message.model_validate(message) for message in payload["messages"]],
+            agent_context=AgentContext.model_validate(payload["agent_context"]),
+            user_data=payload.get("user_data"),
+            version=version,
+            last_activity=datetime.fromtimestamp(updated_at, timezone.utc)
+        )
+
+class SessionBusy(Exception):
+    """Raised when another turn of the session is still being answered."""
+
+
 class SessionManager:
-    def __init__(self, session_timeout: int = 3600):
-        self._sessions: Dict[str, Session] = {}
+    """
+    Sessions live in a StateStore shared by all workers, so any worker can serve any turn.
+    The store calls are blocking, so they run in a thread.
+    """
+    def __init__(self, store: Optional[StateStore] = None, session_timeout: int = 3600, lease_seconds: float = 120.0):
+        self.store = store or InMemoryStateStore()
         self.session_timeout = session_timeout
-        
-    def _cleanup_expired_sessions(self) -> None:
-        current_time = datetime.now(timezone.utc)  
-        expired_sessions = [
-            session_id
-            for session_id, session in self._sessions.items()
-            if (current_time - session.last_activity).total_seconds() > self.session_timeout
-        ]
-        for session_id in expired_sessions:
-            del self._sessions[session_id]
-
-    def get_session(self, session_id: str) -> Optional[Session]:
-        self._cleanup_expired_sessions()
-        session = self._sessions.get(session_id)
-        if session:
-            session.last_activity = datetime.now(timezone.utc)  
-        return session
+        self.lease_seconds = lease_seconds
 
-    def create_session(self) -> Session:
-        session = Session(
-            id=str(uuid.uuid4()),
+    def _load(self, session_id: str) -> Optional[Session]:
+        record = self.store.load(session_id)
+        if record is None:
+            return None
+        version, data, updated_at = record
+        if time.time() - updated_at > self.session_timeout:
+            self.store.delete(session_id)
+            return None
+        return Session.from_record(session_id, version, data, updated_at)
+
+    @asynccontextmanager
+    async def lease(self, session_id: str):
+        """
+        Holds the session's lease for one turn. Raises SessionBusy, before any work is
+        done, if another turn of the session holds it.
+        """
+        owner = uuid.uuid4().hex
+        if not await asyncio.to_thread(self.store.acquire_lease, session_id, owner, self.lease_seconds):
+            raise SessionBusy(session_id)
+        try:
+            yield
+        finally:
+            await asyncio.to_thread(self.store.release_lease, session_id, owner)
+
+    async def get_session(self, session_id: str) -> Optional[Session]:
+        return await asyncio.to_thread(self._load, session_id)
+
+    def new_session(self, session_id: Optional[str] = None) -> Session:
+        """
+        A fresh, unsaved session with the greeting message.
+        """
+        return Session(
+            id=session_id or str(uuid.uuid4()),
             messages=[
                 Message(
                     role="assistant",
@@ -50,16 +104,20 @@ class SessionManager:
                 )
             ]
         )
-        self._sessions[session.id] = session
+
+    async def create_session(self) -> Session:
+        session = self.new_session()
+        await self.save(session)
         return session
 
-    def add_message(self, session_id: str, role: str, content: str) -> None:
-        session = self.get_session(session_id)
-        if not session:
-            session = self.create_session()
-            self._sessions[session_id] = session
-        session.add_message(role, content)
-        return session.id 
+    async def save(self, session: Session) -> None:
+        """
+        Raises VersionConflict if the session was saved by someone else since it was read.
+        """
+        session.version = await asyncio.to_thread(self.store.save, session.id, session.to_json(), session.version)
+
+    async def delete_session(self, session_id: str) -> None:
+        await asyncio.to_thread(self.store.delete, session_id)
 
-    def delete_session(self, session_id: str) -> None:
-        self._sessions.pop(session_id, None)
\ No newline at end of file
+    async def purge_expired(self) -> int:
+        return await asyncio.to_thread(self.store.purge, time.time() - self.session_timeout)
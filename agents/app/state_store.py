@@ -0,0 +1,246 @@
+"""
+Versioned key/value stores for conversation state shared by every worker.
+
+Each record holds a JSON document and an integer version. Writes are
+compare-and-set on the version the caller read, so two workers handling turns
+of the same session cannot silently overwrite each other.
+
+A turn runs under a lease on its session (`acquire_lease`), taken before any
+work is done, so a second turn arriving meanwhile is refused before it can
+book anything. The lease expires on its own if its worker dies; the version
+check remains as a backstop for a turn that outlives its lease.
+
+    memory://                      single process only (tests, local runs)
+    sqlite:///path/to/state.db     WAL-mode SQLite file shared by workers on one host
+    redis://host:6379/0            Redis, for workers on several hosts (needs the `redis` package)
+"""
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# (version, JSON document, last write as a unix timestamp)
+Record = Tuple[int, str, float]
+
+
+class VersionConflict(Exception):
+    """Raised when a record changed since it was read."""
+
+
+class StateStore:
+    def load(self, key: str) -> Optional[Record]:
+        raise NotImplementedError
+
+    def save(self, key: str, data: str, expected_version: Optional[int]) -> int:
+        """
+        Writes `data` if the stored version equals `expected_version` (None: the
+        record must not exist yet) and returns the new version.
+        Raises VersionConflict otherwise.
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def purge(self, older_than: float) -> int:
+        """Deletes records last written before `older_than` and returns how many."""
+        raise NotImplementedError
+
+    def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        """
+        Takes the lease on `key` for `ttl` seconds unless another owner holds an
+        unexpired one. Returns whether it was taken.
+        """
+        raise NotImplementedError
+
+    def release_lease(self, key: str, owner: str) -> None:
+        """Releases the lease on `key` if `owner` still holds it."""
+        raise NotImplementedError
+
+
+class InMemoryStateStore(StateStore):
+    def __init__(self):
+        self._records: Dict[str, Record] = {}
+        # key -> (owner, expires at)
+        self._leases: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, key: str) -> Optional[Record]:
+        return self._records.get(key)
+
+    def save(self, key: str, data: str, expected_version: Optional[int]) -> int:
+        with self._lock:
+            current = self._records.get(key)
+            if (current[0] if current else None) != expected_version:
+                raise VersionConflict(key)
+            version = (expected_version or 0) + 1
+            self._records[key] = (version, data, time.time())
+            return version
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._records.pop(key, None)
+
+    def purge(self, older_than: float) -> int:
+        with self._lock:
+            expired = [key for key, record in self._records.items() if record[2] < older_than]
+            for key in expired:
+                del self._records[key]
+            return len(expired)
+
+    def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease is not None and lease[0] != owner and lease[1] > now:
+                return False
+            self._leases[key] = (owner, now + ttl)
+            return True
+
+    def release_lease(self, key: str, owner: str) -> None:
+        with self._lock:
+            if self._leases.get(key, (None,))[0] == owner:
+                del self._leases[key]
+
+
+class SQLiteStateStore(StateStore):
+    """
+    One connection per thread; WAL lets readers proceed while another process writes.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS agent_state ("
+            " key TEXT PRIMARY KEY, version INTEGER NOT NULL, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._connection().execute("CREATE INDEX IF NOT EXISTS ix_agent_state_updated_at ON agent_state (updated_at)")
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS agent_lease (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Autocommit: every statement below is a single atomic write
+            connection = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def load(self, key: str) -> Optional[Record]:
+        row = self._connection().execute("SELECT version, data, updated_at FROM agent_state WHERE key = ?", (key,)).fetchone()
+        return tuple(row) if row else None
+
+    def save(self, key: str, data: str, expected_version: Optional[int]) -> int:
+        connection = self._connection()
+        if expected_version is None:
+            try:
+                connection.execute(
+                    "INSERT INTO agent_state (key, version, data, updated_at) VALUES (?, 1, ?, ?)",
+                    (key, data, time.time())
+                )
+            except sqlite3.IntegrityError:
+                raise VersionConflict(key)
+            return 1
+        cursor = connection.execute(
+            "UPDATE agent_state SET version = version + 1, data = ?, updated_at = ? WHERE key = ? AND version = ?",
+            (data, time.time(), key, expected_version)
+        )
+        if cursor.rowcount != 1:
+            raise VersionConflict(key)
+        return expected_version + 1
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM agent_state WHERE key = ?", (key,))
+
+    def purge(self, older_than: float) -> int:
+        connection = self._connection()
+        # Leases of workers that died before releasing them
+        connection.execute("DELETE FROM agent_lease WHERE expires_at < ?", (time.time(),))
+        return connection.execute("DELETE FROM agent_state WHERE updated_at < ?", (older_than,)).rowcount
+
+    def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        # One atomic upsert: it only overwrites a lease that has expired or is already ours
+        cursor = self._connection().execute(
+            "INSERT INTO agent_lease (key, owner, expires_at) VALUES (?, ?, ?)"
+            " ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at"
+            " WHERE agent_lease.expires_at < ? OR agent_lease.owner = excluded.owner",
+            (key, owner, now + ttl, now)
+        )
+        return cursor.rowcount == 1
+
+    def release_lease(self, key: str, owner: str) -> None:
+        self._connection().execute("DELETE FROM agent_lease WHERE key = ? AND owner = ?", (key, owner))
+
+
+class RedisStateStore(StateStore):
+    """
+    Records are hashes (version, data, updated_at); the compare-and-set runs as a
+    Lua script so it is atomic on the server. Redis expires idle records itself.
+    """
+    SAVE_SCRIPT = """
+    local current = redis.call('HGET', KEYS[1], 'version')
+    if (ARGV[1] == '' and current) or (ARGV[1] ~= '' and current ~= ARGV[1]) then
+        return -1
+    end
+    local version = (tonumber(current) or 0) + 1
+    redis.call('HSET', KEYS[1], 'version', version, 'data', ARGV[2], 'updated_at', ARGV[3])
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+    return version
+    """
+
+    RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, url: str, ttl: int, prefix: str = "foodiespot:session:"):
+        import redis
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.ttl = ttl
+        self.prefix = prefix
+        self._save = self.client.register_script(self.SAVE_SCRIPT)
+        self._release = self.client.register_script(self.RELEASE_SCRIPT)
+
+    def load(self, key: str) -> Optional[Record]:
+        record = self.client.hgetall(self.prefix + key)
+        if not record:
+            return None
+        return int(record["version"]), record["data"], float(record["updated_at"])
+
+    def save(self, key: str, data: str, expected_version: Optional[int]) -> int:
+        version = self._save(
+            keys=[self.prefix + key],
+            args=["" if expected_version is None else str(expected_version), data, str(time.time()), str(self.ttl)]
+        )
+        if int(version) < 0:
+            raise VersionConflict(key)
+        return int(version)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def purge(self, older_than: float) -> int:
+        # Records carry a TTL, so Redis removes expired sessions on its own
+        return 0
+
+    def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        return bool(self.client.set(f"{self.prefix}lease:{key}", owner, nx=True, px=int(ttl * 1000)))
+
+    def release_lease(self, key: str, owner: str) -> None:
+        self._release(keys=[f"{self.prefix}lease:{key}"], args=[owner])
+
+
+def build_state_store(url: str, ttl: int) -> StateStore:
+    if url.startswith("memory://"):
+        return InMemoryStateStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteStateStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStateStore(url, ttl)
+    raise ValueError(f"Unsupported STATE_STORE_URL: {url}")
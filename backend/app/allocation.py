@@ -0,0 +1,309 @@
+"""
+Table allocation for restaurants with a table inventory.
+
+A restaurant that lists its tables (seat counts, and optional combine groups
+of tables that can be pushed together) gets each reservation assigned to
+concrete tables instead of consuming one anonymous "table" from
+`total_tables`. Restaurants without an inventory keep the count-based model
+in app.occupancy.
+
+`DayAllocation` is the in-memory engine for one restaurant and day: best-fit
+assignment at booking time, and an incremental re-optimization pass that moves
+overlapping reservations onto better fitting tables when a cancellation frees
+capacity. `load_day_allocation` builds it from the database in two queries.
+
+Like app.occupancy, read-only availability and slot search are answered from
+a cache of days (`allocation_index`) that the write paths in crud update after
+each commit. Bookings allocate on a day loaded fresh inside the transaction,
+after `lock_restaurant`, so two bookings can never be given the same table.
+"""
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import date, time
+from itertools import combinations
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+from .occupancy import MINUTES_PER_DAY, DayCache, dining_duration, lock_restaurant, minutes
+
+# Most tables pushed together for one party
+MAX_COMBINED_TABLES = 3
+
+
+class Table(NamedTuple):
+    table_id: int
+    seats: int
+    combine_group: Optional[str] = None
+
+
+class Booking(NamedTuple):
+    party_size: int
+    start: int
+    end: int
+    table_ids: Tuple[int, ...]
+
+
+class DayAllocation:
+    """
+    Table assignments of one restaurant for one day. Times are minutes since midnight.
+    """
+    def __init__(self, tables: Iterable[Table]):
+        # Smallest tables first, so the first fit is the best single-table fit
+        self.tables = sorted(tables, key=lambda table: (table.seats, table.table_id))
+        self.by_id = {table.table_id: table for table in self.tables}
+        self.groups: Dict[str, List[Table]] = defaultdict(list)
+        for table in self.tables:
+            if table.combine_group:
+                self.groups[table.combine_group].append(table)
+        # table_id -> sorted, non-overlapping (start, end, reservation_id)
+        self._busy: Dict[int, List[Tuple[int, int, int]]] = {table.table_id: [] for table in self.tables}
+        self.bookings: Dict[int, Booking] = {}
+
+    @property
+    def total_seats(self) -> int:
+        return sum(table.seats for table in self.tables)
+
+    def is_free(self, table_id: int, start: int, end: int, ignore: Optional[int] = None) -> bool:
+        busy = self._busy[table_id]
+        # Intervals on a table never overlap, so of those starting earlier only the last can collide
+        index = bisect_left(busy, (start,))
+        if index and busy[index - 1][1] > start and busy[index - 1][2] != ignore:
+            return False
+        while index < len(busy) and busy[index][0] < end:
+            if busy[index][2] != ignore:
+                return False
+            index += 1
+        return True
+
+    def free_tables(self, start: int, end: int, ignore: Optional[int] = None) -> List[Table]:
+        return [table for table in self.tables if self.is_free(table.table_id, start, end, ignore)]
+
+    def find(self, party_size: int, start: int, end: int, ignore: Optional[int] = None) -> Optional[Tuple[int, ...]]:
+        """
+        Best fit for a party: the free table or combination of free tables from one
+        combine group with the fewest seats (then the fewest tables) that seats everyone.
+        `ignore` is a reservation whose own tables count as free, for moves.
+        """
+        free = self.free_tables(start, end, ignore)
+        for table in free:
+            if table.seats >= party_size:
+                best = ((table.seats, 1), (table.table_id,))
+                break
+        else:
+            best = None
+
+        free_ids = {table.table_id for table in free}
+        for group_tables in self.groups.values():
+            candidates = [table for table in group_tables if table.table_id in free_ids]
+            if sum(table.seats for table in candidates) < party_size:
+                continue
+            for count in range(2, min(MAX_COMBINED_TABLES, len(candidates)) + 1):
+                for combination in combinations(candidates, count):
+                    seats = sum(table.seats for table in combination)
+                    if seats >= party_size and (best is None or (seats, count) < best[0]):
+                        best = ((seats, count), tuple(sorted(table.table_id for table in combination)))
+        return best[1] if best else None
+
+    def assign(self, reservation_id: int, party_size: int, start: int, end: int, table_ids: Tuple[int, ...]) -> None:
+        self.release(reservation_id)
+        for table_id in table_ids:
+            insort(self._busy[table_id], (start, end, reservation_id))
+        self.bookings[reservation_id] = Booking(party_size, start, end, tuple(table_ids))
+
+    def release(self, reservation_id: int) -> Optional[Booking]:
+        booking = self.bookings.pop(reservation_id, None)
+        if booking is not None:
+            for table_id in booking.table_ids:
+                self._busy[table_id].remove((booking.start, booking.end, reservation_id))
+        return booking
+
+    def seats_of(self, table_ids: Iterable[int]) -> int:
+        return sum(self.by_id[table_id].seats for table_id in table_ids)
+
+    def reoptimize(self, start: int, end: int) -> Dict[int, Tuple[int, ...]]:
+        """
+        Moves reservations overlapping [start, end) (typically a cancelled booking's
+        window) to tables with fewer seats when some have become free, most wasteful
+        first. Only strictly better moves are made. Returns reservation_id -> new tables.
+        """
+        affected = [
+            (reservation_id, booking)
+            for reservation_id, booking in self.bookings.items()
+            if booking.start < end and start < booking.end
+        ]
+        affected.sort(key=lambda item: self.seats_of(item[1].table_ids) - item[1].party_size, reverse=True)
+        moves = {}
+        for reservation_id, booking in affected:
+            current = (self.seats_of(booking.table_ids), len(booking.table_ids))
+            if current[0] == booking.party_size and current[1] == 1:
+                continue
+            better = self.find(booking.party_size, booking.start, booking.end, ignore=reservation_id)
+            if better and (self.seats_of(better), len(better)) < current:
+                self.assign(reservation_id, booking.party_size, booking.start, booking.end, better)
+                moves[reservation_id] = better
+        return moves
+
+    def utilization(self) -> Tuple[int, int]:
+        """
+        (guests seated, seats held by their tables) over all bookings.
+        """
+        guests = sum(booking.party_size for booking in self.bookings.values())
+        held = sum(self.seats_of(booking.table_ids) for booking in self.bookings.values())
+        return guests, held
+
+
+def load_tables(db: Session, restaurant_id: int) -> List[Table]:
+    return [
+        Table(row.table_id, row.seats, row.combine_group)
+        for row in db.query(
+            models.RestaurantTable.table_id,
+            models.RestaurantTable.seats,
+            models.RestaurantTable.combine_group
+        ).filter(models.RestaurantTable.restaurant_id == restaurant_id).all()
+    ]
+
+
+def load_day_allocation(db: Session, restaurant: models.Restaurant, day: date, tables: Optional[List[Table]] = None) -> Optional[DayAllocation]:
+    """
+    The allocation state of a restaurant's day, or None if it has no table inventory.
+    Active reservations without table assignments (made before the inventory was
+    set up) are placed best-fit in memory so they still take up capacity.
+    """
+    tables = tables if tables is not None else load_tables(db, restaurant.restaurant_id)
+    if not tables:
+        return None
+    allocation = DayAllocation(tables)
+    rows = db.query(
+        models.Reservation.reservation_id,
+        models.Reservation.reservation_time,
+        models.Reservation.number_of_guests,
+        models.ReservationTable.table_id
+    ).outerjoin(models.ReservationTable).filter(
+        models.Reservation.restaurant_id == restaurant.restaurant_id,
+        models.Reservation.reservation_date == day,
+        models.Reservation.status != models.ReservationStatus.CANCELLED
+    ).order_by(models.Reservation.reservation_time, models.Reservation.reservation_id).all()
+
+    assigned: Dict[int, List[int]] = defaultdict(list)
+    details = {}
+    for reservation_id, reservation_time, guests, table_id in rows:
+        details[reservation_id] = (reservation_time, guests)
+        if table_id is not None and table_id in allocation.by_id:
+            assigned[reservation_id].append(table_id)
+    unassigned = []
+    for reservation_id, (reservation_time, guests) in details.items():
+        start = minutes(reservation_time)
+        end = start + dining_duration(restaurant.dining_duration_minutes, guests)
+        if assigned[reservation_id]:
+            allocation.assign(reservation_id, guests, start, end, tuple(assigned[reservation_id]))
+        else:
+            unassigned.append((reservation_id, guests, start, end))
+    for reservation_id, guests, start, end in unassigned:
+        table_ids = allocation.find(guests, start, end)
+        if table_ids:
+            allocation.assign(reservation_id, guests, start, end, table_ids)
+    return allocation
+
+
+def allocate(db: Session, restaurant: models.Restaurant, day: date, start_time: time, party_size: int, exclude: Optional[int] = None) -> Tuple[bool, Optional[Tuple[int, ...]]]:
+    """
+    (bookable, table_ids). For restaurants without an inventory table_ids is None
+    and the caller falls back to the count-based check.
+    `exclude` is a reservation being modified, whose current tables count as free.
+    The caller holds `lock_restaurant`, so the tables are still free when it commits.
+    """
+    allocation = load_day_allocation(db, restaurant, day)
+    if allocation is None:
+        return True, None
+    start = minutes(start_time)
+    table_ids = allocation.find(party_size, start, start + dining_duration(restaurant.dining_duration_minutes, party_size), ignore=exclude)
+    return table_ids is not None, table_ids
+
+
+def save_assignment(db: Session, reservation_id: int, table_ids: Iterable[int]) -> None:
+    """
+    Replaces a reservation's table assignment; the caller commits.
+    """
+    db.query(models.ReservationTable).filter(models.ReservationTable.reservation_id == reservation_id).delete(synchronize_session=False)
+    db.add_all(models.ReservationTable(reservation_id=reservation_id, table_id=table_id) for table_id in table_ids)
+
+
+def reoptimize_day(db: Session, restaurant: models.Restaurant, day: date, start: int = 0, end: int = MINUTES_PER_DAY) -> Dict[int, Tuple[int, ...]]:
+    """
+    Re-optimization pass after cancellations freed capacity in [start, end)
+    (minutes; the whole day by default). Persists and returns the moves.
+    """
+    lock_restaurant(db, restaurant.restaurant_id)
+    allocation = load_day_allocation(db, restaurant, day)
+    if allocation is None:
+        db.commit()
+        return {}
+    moves = allocation.reoptimize(start, end)
+    for reservation_id, table_ids in moves.items():
+        save_assignment(db, reservation_id, table_ids)
+    db.commit()
+    if moves:
+        allocation_index.invalidate(restaurant.restaurant_id, day)
+    return moves
+
+
+def bookable_options(allocation: DayAllocation, start: int, end: int, party_size: Optional[int] = None) -> int:
+    """
+    What availability reports for a restaurant with an inventory: the free tables
+    that seat the party on their own, or 1 if only a combination of tables does.
+    """
+    party_size = party_size or 1
+    fitting = sum(1 for table in allocation.free_tables(start, end) if table.seats >= party_size)
+    if fitting == 0 and allocation.find(party_size, start, end):
+        return 1
+    return fitting
+
+
+class AllocationIndex(DayCache):
+    """
+    Cached DayAllocation state keyed by (restaurant_id, date); None for restaurants
+    without a table inventory, so those cost a lookup rather than a query.
+    """
+    def day(self, db: Session, restaurant: models.Restaurant, day: date) -> Optional[DayAllocation]:
+        return self._cached((restaurant.restaurant_id, day), lambda: load_day_allocation(db, restaurant, day))
+
+    def bookable_options(self, db: Session, restaurant: models.Restaurant, day: date, start_time: time, party_size: Optional[int] = None) -> Optional[int]:
+        """
+        `bookable_options` from the cached day, or None if the restaurant has no inventory.
+        """
+        start = minutes(start_time)
+        end = start + dining_duration(restaurant.dining_duration_minutes, party_size)
+        with self._lock:
+            allocation = self.day(db, restaurant, day)
+            if allocation is None:
+                return None
+            return bookable_options(allocation, start, end, party_size)
+
+    def record(self, reservation: models.Reservation, table_ids: Iterable[int]) -> None:
+        """
+        Applies a committed booking, or a booking's new slot or tables, to its cached day.
+        """
+        start = minutes(reservation.reservation_time)
+        end = start + dining_duration(reservation.restaurant.dining_duration_minutes, reservation.number_of_guests)
+        with self._lock:
+            allocation = self._peek((reservation.restaurant_id, reservation.reservation_date))
+            if allocation is not None:
+                allocation.assign(reservation.reservation_id, reservation.number_of_guests, start, end, tuple(table_ids))
+
+    def release(self, restaurant_id: int, day: date, reservation_id: int) -> None:
+        """
+        Frees the tables of a committed cancellation, or of a booking moved away from the day.
+        """
+        with self._lock:
+            allocation = self._peek((restaurant_id, day))
+            if allocation is not None:
+                allocation.release(reservation_id)
+
+
+allocation_index = AllocationIndex(
+    ttl=settings.OCCUPANCY_INDEX_TTL_SECONDS,
+    max_days=settings.OCCUPANCY_INDEX_MAX_DAYS
+)
@@ -0,0 +1,159 @@
+"""
+Archival of past reservations.
+
+`reservations` only has to serve today and the future: availability, booking
+and check-in never look further back. Reservations dated more than
+RESERVATION_ARCHIVE_AFTER_DAYS ago (by then every one of them is either
+completed or cancelled) are moved to `reservations_archive`, so the live
+table and its indexes stop growing with history. A user's full history is
+still paged through with crud.get_user_reservations.
+
+On PostgreSQL the archive is range-partitioned by reservation_date, one
+partition per year, created when the first reservation of that year is
+archived; old years can be detached or dropped without touching the rest.
+Other databases get a plain archive table.
+
+Rows move in batches of `batch_size`, each batch copied and deleted in one
+transaction. Batches are claimed with FOR UPDATE SKIP LOCKED where the
+database supports it, so several API processes can run the job at once.
+
+    python -m app.archive --older-than-days 90
+"""
+import argparse
+import asyncio
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, insert, select, text, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+from .database import SessionLocal
+from .logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_COLUMNS = (
+    "reservation_id",
+    "reservation_date",
+    "user_id",
+    "restaurant_id",
+    "reservation_time",
+    "number_of_guests",
+    "status",
+    "reservation_code",
+)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _ensure_partitions(db: Session, years: Iterable[int]) -> None:
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for year in sorted(set(years)):
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS reservations_archive_{year} PARTITION OF reservations_archive "
+            f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+        ))
+
+
+def archive_reservations(
+    db: Session,
+    older_than_days: int,
+    batch_size: int = 5000,
+    today: Optional[date] = None,
+    dry_run: bool = False
+) -> int:
+    """
+    Moves reservations dated more than `older_than_days` days before `today` to the
+    archive and returns how many were moved (or would be, with dry_run).
+    """
+    cutoff = (today or date.today()) - timedelta(days=older_than_days)
+    Reservation = models.Reservation
+    if dry_run:
+        return db.query(Reservation).filter(Reservation.reservation_date < cutoff).count()
+
+    columns = [getattr(Reservation, name) for name in ARCHIVED_COLUMNS]
+    moved = 0
+    while True:
+        rows = db.execute(
+            select(*columns)
+            .where(Reservation.reservation_date < cutoff)
+            .order_by(Reservation.reservation_id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            break
+        reservation_ids = [row.reservation_id for row in rows]
+        archived_at = _utcnow()
+        _ensure_partitions(db, (row.reservation_date.year for row in rows))
+        db.execute(
+            insert(models.ArchivedReservation),
+            [{**row._mapping, "archived_at": archived_at} for row in rows]
+        )
+        # Table assignments only matter for upcoming service, and the waitlist keeps
+        # the entry but not the link to a row that has left the live table
+        db.execute(delete(models.ReservationTable).where(models.ReservationTable.reservation_id.in_(reservation_ids)))
+        db.execute(
+            update(models.WaitlistEntry)
+            .where(models.WaitlistEntry.reservation_id.in_(reservation_ids))
+            .values(reservation_id=None)
+        )
+        db.execute(delete(Reservation).where(Reservation.reservation_id.in_(reservation_ids)))
+        db.commit()
+        moved += len(rows)
+        logger.info("Archived %d reservations dated before %s", moved, cutoff)
+        if len(rows) < batch_size:
+            break
+    return moved
+
+
+def run_archival() -> int:
+    db = SessionLocal()
+    try:
+        return archive_reservations(
+            db,
+            settings.RESERVATION_ARCHIVE_AFTER_DAYS,
+            batch_size=settings.RESERVATION_ARCHIVE_BATCH_SIZE
+        )
+    finally:
+        db.close()
+
+
+async def run_periodic_archival(interval: float):
+    """
+    Background loop started by the API when RESERVATION_ARCHIVE_INTERVAL_SECONDS is set.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(run_archival)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Error in archive.run_periodic_archival()")
+        await asyncio.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move past reservations to the reservations archive.")
+    parser.add_argument("--older-than-days", type=int, default=settings.RESERVATION_ARCHIVE_AFTER_DAYS, help="Archive reservations dated more than this many days ago")
+    parser.add_argument("--batch-size", type=int, default=settings.RESERVATION_ARCHIVE_BATCH_SIZE, help="Reservations moved per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the reservations that would be archived")
+    args = parser.parse_args()
+
+    setup_logging(settings.LOG_LEVEL, json_format=settings.LOG_JSON)
+    db = SessionLocal()
+    try:
+        count = archive_reservations(db, args.older_than_days, batch_size=args.batch_size, dry_run=args.dry_run)
+    finally:
+        db.close()
+    logger.info("%s %d reservations", "Would archive" if args.dry_run else "Archived", count)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,7 @@ from typing import Optional
 from sqlalchemy.orm import Session
 
 from . import crud, schemas, models
-from .dependencies import get_db
+from .dependencies import get_db, read_db
 from .config import settings
 
 SECRET_KEY = settings.SECRET_KEY
@@ -58,6 +58,13 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         raise credentials_exception
     return user
 
+def get_current_user_read_db(current_user: models.User = Depends(get_current_user)):
+    """
+    Read session for the current user's own data: stays on the primary until
+    their latest write has replicated.
+    """
+    yield from read_db(current_user.user_id)
+
 async def get_api_key_or_current_user(
     api_key: Optional[str] = Security(api_key_header),
     token: Optional[str] = Depends(oauth2_scheme),
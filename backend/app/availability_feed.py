@@ -0,0 +1,242 @@
+"""
+Server-sent availability change feed.
+
+Clients subscribe to one restaurant and date and receive a `snapshot` event
+with the day's availability (as returned by the availability endpoint),
+followed by `delta` events carrying only the slots whose count changed.
+
+Write paths in crud call `availability_feed.publish(restaurant_id, day)` after
+committing. Publishing only marks subscribed days dirty, so it is cheap from
+any thread and a burst of writes to one day (e.g. a bulk import) is coalesced
+into a single recomputation. A publisher task on the event loop recomputes
+dirty days in a worker thread, diffs them against the last published state
+and fans the delta out to every subscriber. Subscribed days are also
+recomputed every `refresh_interval` seconds, which picks up writes made by
+other API processes.
+
+Every subscriber has a bounded queue. A client that falls `queue_size` events
+behind has its backlog dropped and replaced by a fresh snapshot, so a slow
+consumer never holds more than one queue of memory or blocks the others.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from datetime import date
+from itertools import count
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+
+from . import models, slot_search
+from .config import settings
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[int, date]
+
+
+class Subscription:
+    def __init__(self, key: Key, queue_size: int):
+        self.key = key
+        self.queue: "asyncio.Queue[dict]" = asyncio.Queue(maxsize=queue_size)
+        self.resyncs = 0
+
+    def offer(self, event: dict) -> bool:
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def resync(self, snapshot: dict) -> None:
+        """
+        Replaces everything still queued with the latest full state.
+        """
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(snapshot)
+        self.resyncs += 1
+        logger.debug("Availability subscriber for %s fell behind, resynced", self.key)
+
+
+class AvailabilityFeed:
+    def __init__(self, queue_size: int = 64, refresh_interval: float = 30.0, max_subscribers: int = 1000):
+        self.queue_size = queue_size
+        self.refresh_interval = refresh_interval
+        self.max_subscribers = max_subscribers
+        self._subscribers: Dict[Key, Set[Subscription]] = defaultdict(set)
+        # Last published availability per subscribed day; only touched on the event loop
+        self._snapshots: Dict[Key, Dict[str, int]] = {}
+        self._dirty: Set[Key] = set()
+        self._lock = threading.Lock()
+        self._sequence = count(1)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._loop = None
+
+    def publish(self, restaurant_id: int, day: Optional[date] = None) -> None:
+        """
+        Marks a restaurant's day (or all its subscribed days) as changed. Safe to call from
+        any thread; does nothing when nobody is subscribed.
+        """
+        with self._lock:
+            keys = [key for key in self._subscribers if key[0] == restaurant_id and (day is None or key[1] == day)]
+            if not keys:
+                return
+            self._dirty.update(keys)
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                # The loop is shutting down
+                pass
+
+    def _event(self, event_type: str, key: Key, slots: Dict[str, int]) -> dict:
+        return {
+            "type": event_type,
+            "id": next(self._sequence),
+            "restaurant_id": key[0],
+            "date": key[1].isoformat(),
+            "slots": slots,
+        }
+
+    @staticmethod
+    def _load(key: Key) -> Optional[Dict[str, int]]:
+        db = SessionLocal()
+        try:
+            restaurant = db.get(models.Restaurant, key[0])
+            if restaurant is None:
+                return None
+            return {
+                slot.strftime("%H:%M"): available_tables
+                for slot, available_tables in slot_search.day_availability(db, restaurant, key[1]).items()
+            }
+        finally:
+            db.close()
+
+    @property
+    def has_capacity(self) -> bool:
+        return self.subscriber_count < self.max_subscribers
+
+    async def subscribe(self, restaurant_id: int, day: date) -> Optional[Subscription]:
+        """
+        A new subscription whose queue starts with a snapshot of the day,
+        or None when the subscriber limit is reached.
+        """
+        if not self.has_capacity:
+            return None
+        key = (restaurant_id, day)
+        subscription = Subscription(key, self.queue_size)
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            snapshot = await asyncio.to_thread(self._load, key) or {}
+            snapshot = self._snapshots.setdefault(key, snapshot)
+        # No await from here on: deltas published later are relative to this snapshot
+        subscription.queue.put_nowait(self._event("snapshot", key, snapshot))
+        with self._lock:
+            self._subscribers[key].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.key)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.key]
+                self._dirty.discard(subscription.key)
+                self._snapshots.pop(subscription.key, None)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.refresh_interval)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    self._dirty.update(self._subscribers)
+            self._wakeup.clear()
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+            for key in dirty:
+                try:
+                    availability = await asyncio.to_thread(self._load, key)
+                except Exception:
+                    logger.exception("Error in AvailabilityFeed._run()")
+                    continue
+                self._fan_out(key, availability or {})
+
+    def _fan_out(self, key: Key, availability: Dict[str, int]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(key, ()))
+        if not subscribers:
+            return
+        previous = self._snapshots.get(key, {})
+        changes = {slot: tables for slot, tables in availability.items() if previous.get(slot) != tables}
+        # Slots that disappeared (e.g. the restaurant was deleted) drop to zero
+        changes.update({slot: 0 for slot in previous if slot not in availability and previous[slot] != 0})
+        self._snapshots[key] = availability
+        if not changes:
+            return
+        delta = self._event("delta", key, changes)
+        for subscription in subscribers:
+            if not subscription.offer(delta):
+                # Too far behind for deltas to be useful
+                subscription.resync(self._event("snapshot", key, availability))
+
+    async def events(self, restaurant_id: int, day: date, heartbeat: float, is_disconnected) -> AsyncIterator[str]:
+        """
+        A subscription to the day as a text/event-stream body, with comment lines as
+        keepalives. It subscribes only once the body is being sent, so a client that
+        goes away before that leaves nothing behind, and unsubscribes when the client
+        goes away. If the subscriber limit was reached meanwhile, sends an `error`
+        event and ends.
+        """
+        subscription = await self.subscribe(restaurant_id, day)
+        if subscription is None:
+            yield f"event: error\ndata: {json.dumps({'detail': 'Too many availability subscribers'})}\n\n"
+            return
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+
+availability_feed = AvailabilityFeed(
+    queue_size=settings.AVAILABILITY_FEED_QUEUE_SIZE,
+    refresh_interval=settings.AVAILABILITY_FEED_REFRESH_SECONDS,
+    max_subscribers=settings.AVAILABILITY_FEED_MAX_SUBSCRIBERS
+)
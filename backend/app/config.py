@@ -1,14 +1,54 @@
 
+from typing import Dict, List
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     DATABASE_URL: str 
+    # Read replicas for read-only endpoints, as a JSON list of URLs (empty sends every read to
+    # DATABASE_URL). A replica whose heartbeat trails the primary's by more than the maximum lag
+    # gets no reads; lag is measured every check interval, which should be well below the maximum
+    DATABASE_REPLICA_URLS: List[str] = []
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_CHECK_INTERVAL_SECONDS: float = 1.0
     SECRET_KEY:str 
     BACKEND_API_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     ADMIN_USERNAME: str 
     ADMIN_PASSWORD: str
     ALGORITHM: str 
+    INIT_DB_ON_STARTUP: bool = False
+    # Minutes a table is held by a booking, unless the restaurant sets its own duration
+    DINING_DURATION_MINUTES: int = 90
+    # Extra minutes for large parties: {minimum party size: extra minutes}
+    DINING_DURATION_PARTY_EXTRA_MINUTES: Dict[int, int] = {5: 30, 9: 60}
+    # Cached per-restaurant, per-day occupancy; the TTL bounds staleness from writes in other processes
+    OCCUPANCY_INDEX_TTL_SECONDS: float = 30.0
+    OCCUPANCY_INDEX_MAX_DAYS: int = 1024
+    # Nearest-slot search: widest date window, and most restaurant-days evaluated per query
+    SLOT_SEARCH_MAX_DAYS: int = 14
+    SLOT_SEARCH_MAX_DAY_LOADS: int = 30
+    SLOT_SEARCH_MAX_RESTAURANTS: int = 10
+    # Server-sent availability feed: events buffered per client before it is resynced with a
+    # snapshot, keepalive interval, and how often subscribed days are recomputed to pick up
+    # writes made by other processes
+    AVAILABILITY_FEED_QUEUE_SIZE: int = 64
+    AVAILABILITY_FEED_HEARTBEAT_SECONDS: float = 15.0
+    AVAILABILITY_FEED_REFRESH_SECONDS: float = 30.0
+    AVAILABILITY_FEED_MAX_SUBSCRIBERS: int = 1000
+    # Reservations dated more than this many days ago are moved to reservations_archive, in
+    # batches, every RESERVATION_ARCHIVE_INTERVAL_SECONDS (0 leaves it to `python -m app.archive`)
+    RESERVATION_ARCHIVE_AFTER_DAYS: int = 90
+    RESERVATION_ARCHIVE_INTERVAL_SECONDS: float = 0.0
+    RESERVATION_ARCHIVE_BATCH_SIZE: int = 5000
+    # Background job workers per process for post-booking side effects (0 disables them)
+    TASK_WORKERS: int = 2
+    TASK_POLL_INTERVAL_SECONDS: float = 5.0
+    # First retry delay; doubles on every further attempt
+    TASK_RETRY_BASE_SECONDS: float = 2.0
+    # Listing endpoints write ORM rows straight to JSON instead of validating each one into its response model
+    FAST_JSON_RESPONSES: bool = True
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = True
 
 
 
@@ -1,8 +1,14 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
-from datetime import date, time, datetime, timedelta
-from . import models, schemas
-from typing import Optional
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, or_, insert, update
+from datetime import date, time, datetime
+from . import models, schemas, tasks
+from .occupancy import occupancy_index, load_day_occupancy, lock_restaurant, free_tables, dining_duration, minutes
+from . import allocation, slot_search, waitlist
+from .allocation import allocation_index
+from .availability_feed import availability_feed
+from .replicas import replica_router
+from .utils import unused_reservation_codes
+from typing import Optional, List, Tuple
 from passlib.context import CryptContext
 
 # Password hashing
@@ -38,6 +44,9 @@ def update_restaurant(db: Session, restaurant_id: int, restaurant: schemas.Resta
             setattr(db_restaurant, key, value)
         db.commit()
         db.refresh(db_restaurant)
+        # The dining duration may have changed
+        _invalidate_days(restaurant_id)
+        availability_feed.publish(restaurant_id)
     return db_restaurant
 
 def delete_restaurant(db: Session, restaurant_id: int):
@@ -45,65 +54,76 @@ def delete_restaurant(db: Session, restaurant_id: int):
     if db_restaurant:
         db.delete(db_restaurant)
         db.commit()
+        _invalidate_days(restaurant_id)
+        availability_feed.publish(restaurant_id)
         return True
     return False
 
-def get_available_tables_count(db: Session, restaurant_id: int, reservation_date: date, reservation_time: time):
+def get_restaurant_tables(db: Session, restaurant_id: int):
+    return db.query(models.RestaurantTable).filter(models.RestaurantTable.restaurant_id == restaurant_id).order_by(models.RestaurantTable.table_id).all()
+
+def replace_restaurant_tables(db: Session, restaurant_id: int, tables: List[schemas.RestaurantTableCreate]):
+    """
+    Replace a restaurant's table inventory. Existing bookings lose their table
+    assignments and are placed best-fit on the new tables when a day is loaded;
+    an empty list returns the restaurant to the count-based model.
+    """
+    db_restaurant = get_restaurant(db, restaurant_id)
+    if not db_restaurant:
+        return None
+    old_table_ids = [table.table_id for table in db_restaurant.tables]
+    if old_table_ids:
+        db.query(models.ReservationTable).filter(models.ReservationTable.table_id.in_(old_table_ids)).delete(synchronize_session=False)
+    db_restaurant.tables = [models.RestaurantTable(**table.model_dump()) for table in tables]
+    if tables:
+        db_restaurant.total_tables = len(tables)
+    db.commit()
+    _invalidate_days(restaurant_id)
+    availability_feed.publish(restaurant_id)
+    return get_restaurant_tables(db, restaurant_id)
+
+def _invalidate_days(restaurant_id: int, reservation_date: Optional[date] = None):
+    """
+    Drop cached days whose changes are easier to reload than to replay.
+    """
+    occupancy_index.invalidate(restaurant_id, reservation_date)
+    allocation_index.invalidate(restaurant_id, reservation_date)
+
+def get_available_tables_count(db: Session, restaurant_id: int, reservation_date: date, reservation_time: time, party_size: Optional[int] = None):
     """
-    Calculate the number of available tables at a specific date and time
-    by checking existing reservations.
+    Calculate the number of tables free for the whole stay of a party arriving
+    at a specific date and time, using the cached allocation or occupancy index.
     """
-    # Get the restaurant
     restaurant = get_restaurant(db, restaurant_id)
     if not restaurant:
         return 0
-    
-    # Define the time window for the reservation (typically 1.5 hours)
-    time_obj = datetime.combine(date.today(), reservation_time)
-    end_time = (time_obj + timedelta(hours=1, minutes=30)).time()
-    
-    # Count reservations that overlap with the requested time
-    overlapping_reservations = db.query(func.count(models.Reservation.reservation_id)).filter(
-        and_(
-            models.Reservation.restaurant_id == restaurant_id,
-            models.Reservation.reservation_date == reservation_date,
-            models.Reservation.status != models.ReservationStatus.CANCELLED,
-            or_(
-                # Reservation starts during our time window
-                and_(
-                    models.Reservation.reservation_time >= reservation_time,
-                    models.Reservation.reservation_time < end_time
-                ),
-                # Reservation ends during our time window
-                and_(
-                    models.Reservation.reservation_time < reservation_time,
-                    # We'll consider any reservation that starts up to 1.5 hours before our time
-                    models.Reservation.reservation_time >= (datetime.combine(date.today(), reservation_time) - timedelta(hours=1, minutes=30)).time()
-                )
-            )
-        )
-    ).scalar()
-    
-    # If there was an error with the query, fall back to a simpler approach
-    if overlapping_reservations is None:
-        # Simplified approach: just count reservations at the exact same time
-        overlapping_reservations = db.query(func.count(models.Reservation.reservation_id)).filter(
-            and_(
-                models.Reservation.restaurant_id == restaurant_id,
-                models.Reservation.reservation_date == reservation_date,
-                models.Reservation.reservation_time == reservation_time,
-                models.Reservation.status != models.ReservationStatus.CANCELLED
-            )
-        ).scalar() or 0
-    
-    # Calculate available tables
-    available_tables = max(0, restaurant.total_tables - overlapping_reservations)
-    return available_tables
+    options = allocation_index.bookable_options(db, restaurant, reservation_date, reservation_time, party_size)
+    if options is not None:
+        return options
+    return occupancy_index.available_tables(db, restaurant, reservation_date, reservation_time, party_size)
 
 
-def is_table_available(db: Session, restaurant_id: int, reservation_date: date, reservation_time: time):
+def is_table_available(db: Session, restaurant_id: int, reservation_date: date, reservation_time: time, party_size: Optional[int] = None):
     """Check if there are any tables available at the given time."""
-    return get_available_tables_count(db, restaurant_id, reservation_date, reservation_time) > 0
+    return get_available_tables_count(db, restaurant_id, reservation_date, reservation_time, party_size) > 0
+
+def _reserve_tables(db: Session, restaurant: models.Restaurant, reservation_date: date, reservation_time: time, party_size: int, exclude: Optional[models.Reservation] = None):
+    """
+    Capacity check for a booking. Returns (bookable, table_ids); table_ids is None
+    for restaurants without a table inventory, which are checked by table count.
+    The restaurant stays locked until the caller commits, and the day is loaded fresh
+    rather than from the occupancy index, which may not have other processes' bookings yet.
+    """
+    lock_restaurant(db, restaurant.restaurant_id)
+    bookable, table_ids = allocation.allocate(
+        db, restaurant, reservation_date, reservation_time, party_size,
+        exclude=exclude.reservation_id if exclude is not None else None
+    )
+    if table_ids is None and bookable:
+        key = (restaurant.restaurant_id, reservation_date)
+        occupancy = load_day_occupancy(db, [key])[key]
+        bookable = free_tables(occupancy, restaurant, reservation_date, reservation_time, party_size, exclude=exclude) > 0
+    return bookable, table_ids
 
 # User CRUD operations
 def create_user(db: Session, user: schemas.UserCreate):
@@ -142,22 +162,36 @@ def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate):
             setattr(db_user, key, value)
         db.commit()
         db.refresh(db_user)
+        replica_router.record_write(user_id)
     return db_user
 
 # Reservation CRUD operations
 def create_reservation(db: Session, reservation: schemas.ReservationCreate, user_id: int):
+    restaurant = get_restaurant(db, reservation.restaurant_id)
+    if not restaurant:
+        return None
     # Check if tables are available at the requested time
-    if not is_table_available(db, reservation.restaurant_id, reservation.reservation_date, reservation.reservation_time):
+    bookable, table_ids = _reserve_tables(db, restaurant, reservation.reservation_date, reservation.reservation_time, reservation.number_of_guests)
+    if not bookable:
         return None
     
     db_reservation = models.Reservation(
-        **reservation.model_dump(),
+        **reservation.model_dump(exclude={"user_id"}),
         user_id=user_id,
         status=models.ReservationStatus.CONFIRMED
     )
     db.add(db_reservation)
+    db.flush()
+    if table_ids:
+        allocation.save_assignment(db, db_reservation.reservation_id, table_ids)
+    tasks.enqueue_booking_side_effects(db, db_reservation, channel="reservations")
     db.commit()
     db.refresh(db_reservation)
+    replica_router.record_write(user_id)
+    occupancy_index.record_reservation(db_reservation, +1)
+    if table_ids:
+        allocation_index.record(db_reservation, table_ids)
+    availability_feed.publish(db_reservation.restaurant_id, db_reservation.reservation_date)
     return db_reservation
 
 def create_reservation_by_restaurant_name(db: Session, reservation: schemas.SimpleReservationCreate, user_id: int):
@@ -174,7 +208,8 @@ def create_reservation_by_restaurant_name(db: Session, reservation: schemas.Simp
         return None
     
     # Check if tables are available at the requested time
-    if not is_table_available(db, restaurant.restaurant_id, reservation_date, reservation_time):
+    bookable, table_ids = _reserve_tables(db, restaurant, reservation_date, reservation_time, reservation.guests)
+    if not bookable:
         return None
     
     # Create reservation
@@ -187,15 +222,46 @@ def create_reservation_by_restaurant_name(db: Session, reservation: schemas.Simp
         status=models.ReservationStatus.CONFIRMED
     )
     db.add(db_reservation)
+    db.flush()
+    if table_ids:
+        allocation.save_assignment(db, db_reservation.reservation_id, table_ids)
+    # Confirmation and analytics run after the commit, off the request path
+    tasks.enqueue_booking_side_effects(db, db_reservation, channel="book_restaurant")
     db.commit()
     db.refresh(db_reservation)
+    replica_router.record_write(user_id)
+    occupancy_index.record_reservation(db_reservation, +1)
+    if table_ids:
+        allocation_index.record(db_reservation, table_ids)
+    availability_feed.publish(db_reservation.restaurant_id, db_reservation.reservation_date)
     return db_reservation, restaurant
 
 def get_reservation(db: Session, reservation_id: int):
     return db.query(models.Reservation).filter(models.Reservation.reservation_id == reservation_id).first()
 
-def get_user_reservations(db: Session, user_id: int):
-    return db.query(models.Reservation).filter(models.Reservation.user_id == user_id).all()
+# Largest page of a user's reservation history
+MAX_HISTORY_PAGE = 100
+
+def get_user_reservations(db: Session, user_id: int, limit: Optional[int] = None, before: Optional[Tuple[date, int]] = None):
+    """
+    Without a limit, the user's live reservations (upcoming and recent ones).
+    With one, a page of their whole history including archived reservations, newest
+    first; pass the (reservation_date, reservation_id) of a page's last row as
+    `before` for the next page.
+    """
+    if limit is None:
+        return db.query(models.Reservation).filter(models.Reservation.user_id == user_id).all()
+    page = []
+    for model in (models.Reservation, models.ArchivedReservation):
+        query = db.query(model).options(joinedload(model.restaurant)).filter(model.user_id == user_id)
+        if before is not None:
+            query = query.filter(or_(
+                model.reservation_date < before[0],
+                and_(model.reservation_date == before[0], model.reservation_id < before[1])
+            ))
+        page += query.order_by(model.reservation_date.desc(), model.reservation_id.desc()).limit(limit).all()
+    page.sort(key=lambda row: (row.reservation_date, row.reservation_id), reverse=True)
+    return page[:limit]
 
 def get_restaurant_reservations(db: Session, restaurant_id: int, reservation_date: Optional[date] = None):
     query = db.query(models.Reservation).filter(models.Reservation.restaurant_id == restaurant_id)
@@ -213,21 +279,48 @@ def update_reservation(db: Session, reservation_id: int, reservation_update: sch
     
     if db_reservation:
         update_data = reservation_update.model_dump(exclude_unset=True)
+        table_ids = None
         
-        # If changing date or time, check availability
-        if ('reservation_date' in update_data or 'reservation_time' in update_data):
+        # If changing date, time or party size, check availability
+        if ('reservation_date' in update_data or 'reservation_time' in update_data or 'number_of_guests' in update_data):
             new_date = update_data.get('reservation_date', db_reservation.reservation_date)
             new_time = update_data.get('reservation_time', db_reservation.reservation_time)
+            new_guests = update_data.get('number_of_guests', db_reservation.number_of_guests)
             
-            # Check if the new time slot is available
-            if not is_table_available(db, db_reservation.restaurant_id, new_date, new_time):
+            # Check if the new time slot is available, not counting this reservation's current table
+            bookable, table_ids = _reserve_tables(db, db_reservation.restaurant, new_date, new_time, new_guests, exclude=db_reservation)
+            if not bookable:
                 return None
+            if table_ids:
+                allocation.save_assignment(db, db_reservation.reservation_id, table_ids)
         
+        was_active = db_reservation.status != models.ReservationStatus.CANCELLED
+        previous = (db_reservation.restaurant_id, db_reservation.reservation_date, db_reservation.reservation_time, db_reservation.number_of_guests)
         for key, value in update_data.items():
             setattr(db_reservation, key, value)
         
+        # Capacity freed on the old slot goes to the waitlist in the same transaction
+        promoted = []
+        moved = previous[1:] != (db_reservation.reservation_date, db_reservation.reservation_time, db_reservation.number_of_guests)
+        if was_active and (moved or db_reservation.status == models.ReservationStatus.CANCELLED):
+            freed_start = minutes(previous[2])
+            freed_end = freed_start + dining_duration(db_reservation.restaurant.dining_duration_minutes, previous[3])
+            promoted = waitlist.promote_waiters(db, db_reservation.restaurant, previous[1], freed_start, freed_end)
         db.commit()
         db.refresh(db_reservation)
+        replica_router.record_write(user_id, *(entry.user_id for entry in promoted))
+        if promoted:
+            _invalidate_days(previous[0], previous[1])
+        if was_active:
+            occupancy_index.record(*previous, db_reservation.restaurant.dining_duration_minutes, -1)
+        if db_reservation.status != models.ReservationStatus.CANCELLED:
+            occupancy_index.record_reservation(db_reservation, +1)
+        if was_active and (moved or db_reservation.status == models.ReservationStatus.CANCELLED):
+            allocation_index.release(previous[0], previous[1], db_reservation.reservation_id)
+            if table_ids and db_reservation.status != models.ReservationStatus.CANCELLED:
+                allocation_index.record(db_reservation, table_ids)
+        availability_feed.publish(previous[0], previous[1])
+        availability_feed.publish(db_reservation.restaurant_id, db_reservation.reservation_date)
     return db_reservation
 
 def cancel_reservation(db: Session, reservation_id: int, user_id: int):
@@ -239,26 +332,278 @@ def cancel_reservation(db: Session, reservation_id: int, user_id: int):
     ).first()
     
     if db_reservation:
+        was_active = db_reservation.status != models.ReservationStatus.CANCELLED
         db_reservation.status = models.ReservationStatus.CANCELLED
+        promoted = []
+        if was_active:
+            freed_start = minutes(db_reservation.reservation_time)
+            freed_end = freed_start + dining_duration(db_reservation.restaurant.dining_duration_minutes, db_reservation.number_of_guests)
+            promoted = waitlist.promote_waiters(db, db_reservation.restaurant, db_reservation.reservation_date, freed_start, freed_end)
+            _enqueue_reoptimization(db, db_reservation)
         db.commit()
         db.refresh(db_reservation)
+        replica_router.record_write(user_id, *(entry.user_id for entry in promoted))
+        if promoted:
+            _invalidate_days(db_reservation.restaurant_id, db_reservation.reservation_date)
+        elif was_active:
+            occupancy_index.record_reservation(db_reservation, -1)
+            allocation_index.release(db_reservation.restaurant_id, db_reservation.reservation_date, db_reservation.reservation_id)
+        availability_feed.publish(db_reservation.restaurant_id, db_reservation.reservation_date)
     return db_reservation
 
-def get_restaurant_availability(db: Session, restaurant_id: int, date: date):
+def _enqueue_reoptimization(db: Session, db_reservation: models.Reservation):
+    """
+    Queue a pass that moves other bookings onto better fitting tables freed by a cancellation.
+    """
+    if not db_reservation.restaurant.tables:
+        return
+    start = minutes(db_reservation.reservation_time)
+    tasks.enqueue(
+        db, "reoptimize_tables",
+        restaurant_id=db_reservation.restaurant_id,
+        reservation_date=db_reservation.reservation_date.isoformat(),
+        start=start,
+        end=start + dining_duration(db_reservation.restaurant.dining_duration_minutes, db_reservation.number_of_guests)
+    )
+
+# Most codes per batch check-in lookup
+MAX_CODE_LOOKUP = 500
+
+def get_reservations_by_codes(db: Session, codes: List[str]):
+    """
+    Reservations keyed by code, looked up through the unique index on reservation_code.
+    Codes are matched case-insensitively; unknown codes are missing from the result.
+    """
+    normalized = list({code.strip().upper() for code in codes})
+    if not normalized:
+        return {}
+    return {
+        db_reservation.reservation_code: db_reservation
+        for db_reservation in db.query(models.Reservation)
+        .options(joinedload(models.Reservation.restaurant))
+        .filter(models.Reservation.reservation_code.in_(normalized))
+        .all()
+    }
+
+# Waitlist operations
+def join_waitlist(db: Session, entry: schemas.WaitlistCreate, user_id: int):
+    """
+    Queue a party for a slot. If the slot has room by now the party is booked right away,
+    so the returned entry may already be promoted.
+    """
+    restaurant = get_restaurant_by_name(db, entry.restaurant_name)
+    if not restaurant:
+        return None
+    try:
+        reservation_date = datetime.strptime(entry.date, "%Y-%m-%d").date()
+        reservation_time = datetime.strptime(entry.time, "%H:%M").time()
+    except ValueError:
+        return None
+    # A slot that has begun would only expire
+    if datetime.combine(reservation_date, reservation_time) <= datetime.now():
+        return None
+
+    db_entry = waitlist.add_entry(db, restaurant, user_id, reservation_date, reservation_time, entry.guests)
+    # Only the window of the new entry's stay needs checking
+    start = minutes(reservation_time)
+    promoted = waitlist.promote_waiters(db, restaurant, reservation_date, start, start + dining_duration(restaurant.dining_duration_minutes, entry.guests))
+    db.commit()
+    db.refresh(db_entry)
+    replica_router.record_write(user_id, *(promoted_entry.user_id for promoted_entry in promoted))
+    if promoted:
+        _invalidate_days(restaurant.restaurant_id, reservation_date)
+        availability_feed.publish(restaurant.restaurant_id, reservation_date)
+    return db_entry
+
+def get_waitlist_entry(db: Session, entry_id: int):
+    return db.get(models.WaitlistEntry, entry_id)
+
+def leave_waitlist(db: Session, db_entry: models.WaitlistEntry):
+    if db_entry.status == models.WaitlistStatus.WAITING:
+        db_entry.status = models.WaitlistStatus.CANCELLED
+        db.commit()
+        db.refresh(db_entry)
+        replica_router.record_write(db_entry.user_id)
+    return db_entry
+
+# Bulk reservation operations
+MAX_BULK_RESERVATIONS = 5000
+
+def create_reservations_bulk(db: Session, reservations: List[schemas.ReservationCreate], user_id: Optional[int] = None):
+    """
+    Create many reservations in one transaction.
+    Capacity is checked for the whole batch against existing reservations and
+    earlier items of the same batch, and accepted rows are written with a single
+    multi-row INSERT. Returns one schemas.BulkReservationResult per input item.
+    """
+    results = [None] * len(reservations)
+
+    restaurant_ids = {item.restaurant_id for item in reservations}
+    # In ID order, so concurrent batches cannot deadlock
+    for restaurant_id in sorted(restaurant_ids):
+        lock_restaurant(db, restaurant_id)
+    restaurants = {
+        row.restaurant_id: row
+        for row in db.query(
+            models.Restaurant.restaurant_id,
+            models.Restaurant.total_tables,
+            models.Restaurant.dining_duration_minutes
+        ).filter(models.Restaurant.restaurant_id.in_(restaurant_ids)).all()
+    } if restaurant_ids else {}
+
+    groups = {
+        (item.restaurant_id, item.reservation_date)
+        for item in reservations
+        if item.restaurant_id in restaurants
+    }
+    # Fresh copies rather than the shared index: they also hold the not yet committed batch
+    booked = load_day_occupancy(db, groups)
+    # Restaurants with a table inventory get concrete tables instead
+    inventories = {restaurant_id: allocation.load_tables(db, restaurant_id) for restaurant_id in restaurants}
+    day_allocations = {}
+
+    accepted_rows = []
+    accepted_indexes = []
+    accepted_tables = []
+    for index, item in enumerate(reservations):
+        item_user_id = user_id if user_id is not None else item.user_id
+        if item_user_id is None:
+            results[index] = schemas.BulkReservationResult(index=index, success=False, error="User ID is required")
+            continue
+        if item.restaurant_id not in restaurants:
+            results[index] = schemas.BulkReservationResult(index=index, success=False, error="Restaurant not found")
+            continue
+
+        restaurant = restaurants[item.restaurant_id]
+        group = (item.restaurant_id, item.reservation_date)
+        start = minutes(item.reservation_time)
+        end = start + dining_duration(restaurant.dining_duration_minutes, item.number_of_guests)
+        table_ids = None
+        if inventories[item.restaurant_id]:
+            if group not in day_allocations:
+                day_allocations[group] = allocation.load_day_allocation(db, restaurant, item.reservation_date, inventories[item.restaurant_id])
+            table_ids = day_allocations[group].find(item.number_of_guests, start, end)
+            if table_ids is None:
+                results[index] = schemas.BulkReservationResult(index=index, success=False, error="No tables available at the requested time")
+                continue
+            # Placeholder ID until the row is inserted
+            day_allocations[group].assign(-1 - index, item.number_of_guests, start, end, table_ids)
+        elif booked[group].max_occupancy(start, end) >= (restaurant.total_tables or 0):
+            results[index] = schemas.BulkReservationResult(index=index, success=False, error="No tables available at the requested time")
+            continue
+        else:
+            booked[group].add(start, end)
+
+        accepted_indexes.append(index)
+        accepted_tables.append(table_ids)
+        accepted_rows.append({
+            **item.model_dump(exclude={"user_id"}),
+            "user_id": item_user_id,
+            "status": models.ReservationStatus.CONFIRMED
+        })
+
+    if accepted_rows:
+        # One collision check for the whole batch instead of one per row
+        for row, code in zip(accepted_rows, unused_reservation_codes(db.connection(), len(accepted_rows))):
+            row["reservation_code"] = code
+        created = db.scalars(
+            insert(models.Reservation).returning(models.Reservation, sort_by_parameter_order=True),
+            accepted_rows
+        ).all()
+        assignments = [
+            {"reservation_id": db_reservation.reservation_id, "table_id": table_id}
+            for db_reservation, table_ids in zip(created, accepted_tables)
+            for table_id in table_ids or ()
+        ]
+        if assignments:
+            db.execute(insert(models.ReservationTable), assignments)
+        db.commit()
+        replica_router.record_write(*{row["user_id"] for row in accepted_rows})
+        for index, db_reservation, table_ids in zip(accepted_indexes, created, accepted_tables):
+            if table_ids:
+                allocation_index.record(db_reservation, table_ids)
+            occupancy_index.record(
+                db_reservation.restaurant_id,
+                db_reservation.reservation_date,
+                db_reservation.reservation_time,
+                db_reservation.number_of_guests,
+                restaurants[db_reservation.restaurant_id].dining_duration_minutes,
+                +1
+            )
+            availability_feed.publish(db_reservation.restaurant_id, db_reservation.reservation_date)
+            results[index] = schemas.BulkReservationResult(
+                index=index,
+                success=True,
+                reservation=schemas.Reservation.model_validate(db_reservation)
+            )
+    return results
+
+def cancel_reservations_bulk(db: Session, reservation_ids: List[int], user_id: Optional[int] = None):
+    """
+    Cancel many reservations with a single UPDATE.
+    When user_id is given only reservations owned by that user are cancelled.
+    Returns one schemas.BulkCancelResult per requested reservation ID.
+    """
+    unique_ids = list(dict.fromkeys(reservation_ids))
+    existing = {
+        row.reservation_id: row
+        for row in db.query(
+            models.Reservation.reservation_id,
+            models.Reservation.user_id,
+            models.Reservation.status,
+            models.Reservation.restaurant_id,
+            models.Reservation.reservation_date
+        ).filter(models.Reservation.reservation_id.in_(unique_ids)).all()
+    } if unique_ids else {}
+
+    results = []
+    to_cancel = []
+    for reservation_id in unique_ids:
+        row = existing.get(reservation_id)
+        if row is None or (user_id is not None and row.user_id != user_id):
+            results.append(schemas.BulkCancelResult(reservation_id=reservation_id, success=False, error="Reservation not found or not owned by you"))
+        elif row.status == models.ReservationStatus.CANCELLED:
+            results.append(schemas.BulkCancelResult(reservation_id=reservation_id, success=False, error="Reservation already cancelled"))
+        else:
+            to_cancel.append(reservation_id)
+            results.append(schemas.BulkCancelResult(reservation_id=reservation_id, success=True))
+
+    if to_cancel:
+        db.execute(
+            update(models.Reservation)
+            .where(models.Reservation.reservation_id.in_(to_cancel))
+            .values(status=models.ReservationStatus.CANCELLED)
+            .execution_options(synchronize_session=False)
+        )
+        affected = {(existing[i].restaurant_id, existing[i].reservation_date) for i in to_cancel}
+        with_inventory = {
+            restaurant_id
+            for (restaurant_id,) in db.query(models.RestaurantTable.restaurant_id)
+            .filter(models.RestaurantTable.restaurant_id.in_({restaurant_id for restaurant_id, _ in affected}))
+            .distinct()
+        }
+        promoted = []
+        for restaurant_id, reservation_date in sorted(affected):
+            promoted += waitlist.promote_waiters(db, get_restaurant(db, restaurant_id), reservation_date)
+            if restaurant_id in with_inventory:
+                tasks.enqueue(db, "reoptimize_tables", restaurant_id=restaurant_id, reservation_date=reservation_date.isoformat())
+        db.commit()
+        replica_router.record_write(*{existing[i].user_id for i in to_cancel}, *(entry.user_id for entry in promoted))
+        for restaurant_id, reservation_date in affected:
+            _invalidate_days(restaurant_id, reservation_date)
+            availability_feed.publish(restaurant_id, reservation_date)
+    return results
+
+def get_restaurant_availability(db: Session, restaurant_id: int, date: date, party_size: Optional[int] = None):
     """
     Get the availability of a restaurant for all hours in a day.
-    Returns a dictionary with hour -> available tables.
+    Returns a dictionary with hour -> tables free for the whole stay of a party of `party_size`.
     """
     restaurant = get_restaurant(db, restaurant_id)
     if not restaurant:
         return {}
     
-    # Create a dictionary for all hours of operation (assuming 9 AM to 10 PM)
-    availability = {}
-    for hour in range(9, 23):  # 9 AM to 10 PM
-        for minute in [0, 30]:  # Every 30 minutes
-            time_slot = time(hour, minute)
-            available_tables = get_available_tables_count(db, restaurant_id, date, time_slot)
-            availability[f"{hour:02d}:{minute:02d}"] = available_tables
-    
-    return availability
\ No newline at end of file
+    return {
+        slot.strftime("%H:%M"): available_tables
+        for slot, available_tables in slot_search.day_availability(db, restaurant, date, party_size).items()
+    }
@@ -8,4 +8,7 @@ SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Read-only copies of the primary; sessions on them come from app.replicas
+replica_engines = [create_engine(url) for url in settings.DATABASE_REPLICA_URLS]
+
 Base = declarative_base()
\ No newline at end of file
@@ -1,8 +1,37 @@
+from typing import Optional
+
+from sqlalchemy.exc import OperationalError
+
 from .database import SessionLocal
+from .replicas import replica_router
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def read_db(user_id: Optional[int] = None):
+    """
+    Session on a read replica when one is caught up (see app.replicas), else on the primary.
+    Only for requests that do not write.
+    """
+    db = replica_router.session(user_id)
+    try:
+        yield db
+    except OperationalError:
+        replica_router.mark_failed(db)
+        raise
+    finally:
+        db.close()
+
+def get_read_db():
+    yield from read_db()
+
+def get_user_read_db(user_id: int):
+    """
+    Read session for routes with a `user_id` path parameter: stays on the primary until
+    that user's latest write has replicated.
+    """
+    yield from read_db(user_id)
@@ -1,11 +1,27 @@
+import logging
+from .config import settings
 from .database import engine, Base
+from .logging_config import setup_logging
 from .seed import seed_data
+from .profiling import startup_profile
+
+logger = logging.getLogger(__name__)
 
 def init_database():
-    print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    print("Tables created successfully!")
+    logger.info("Creating database tables...")
+    with startup_profile.step("create_all"):
+        Base.metadata.create_all(bind=engine)
+    logger.info("Tables created successfully!")
     
-    print("Starting to seed data...")
-    seed_data()
-    print("Data seeded successfully!")
+    logger.info("Starting to seed data...")
+    with startup_profile.step("seed_data"):
+        seed_data()
+    logger.info("Data seeded successfully!")
+
+
+if __name__ == "__main__":
+    # Bootstrap the database outside of the serving process:
+    # python -m app.init_db
+    setup_logging(settings.LOG_LEVEL, json_format=settings.LOG_JSON)
+    init_database()
+    logger.info(startup_profile.report())
@@ -1,28 +1,56 @@
-from fastapi import FastAPI, HTTPException, Depends, Query
+import asyncio
+import logging
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from contextlib import asynccontextmanager
 from typing import List, Optional, Dict
-from datetime import date, timedelta
+from datetime import date, datetime, time, timedelta
 
-from . import schemas, crud, models
-from .dependencies import get_db
-from .auth import get_current_user, get_api_key_or_current_user, create_access_token
-from .init_db import init_database
+from .profiling import startup_profile
+from . import schemas, crud, models, slot_search, tasks, waitlist
+from .config import settings
+from .archive import run_periodic_archival
+from .availability_feed import availability_feed
+from .replicas import replica_router
+from .serialization import fast_json
+from .logging_config import setup_logging, request_id_var, new_request_id, REQUEST_ID_HEADER
+from .dependencies import get_db, get_read_db, get_user_read_db
+from .auth import get_current_user, get_current_user_read_db, get_api_key_or_current_user, create_access_token
+
+setup_logging(settings.LOG_LEVEL, json_format=settings.LOG_JSON)
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_database()
+    # Schema creation and seeding normally run once via `python -m app.init_db`
+    if settings.INIT_DB_ON_STARTUP:
+        from .init_db import init_database
+        init_database()
+    logger.info(startup_profile.report())
+    if settings.TASK_WORKERS > 0:
+        tasks.worker_pool.start()
+    replica_router.start()
+    await availability_feed.start()
+    archive_task = None
+    if settings.RESERVATION_ARCHIVE_INTERVAL_SECONDS > 0:
+        archive_task = asyncio.create_task(run_periodic_archival(settings.RESERVATION_ARCHIVE_INTERVAL_SECONDS))
     yield
-    # Currently nothing to do here (when the app is shutting down)
+    if archive_task is not None:
+        archive_task.cancel()
+    await availability_feed.stop()
+    replica_router.stop()
+    tasks.worker_pool.stop()
 
 app = FastAPI(
     title="FoodieSpot API",
     description="API for restaurant management system",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -33,6 +61,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def correlate_request(request: Request, call_next):
+    # Reuse the caller's request ID (e.g. from the agents service) so logs can be joined across services
+    request_id = request.headers.get(REQUEST_ID_HEADER) or new_request_id()
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers[REQUEST_ID_HEADER] = request_id
+    return response
+
 
 # Authentication endpoints
 @app.post("/register", response_model=schemas.User)
@@ -73,7 +113,7 @@ async def read_users_me(current_user: models.User = Depends(get_current_user)):
     return current_user
 
 @app.get("/users/{user_id}", response_model=schemas.User)
-async def read_user(user_id: int, db: Session = Depends(get_db),auth: str = Depends(get_api_key_or_current_user)):
+async def read_user(user_id: int, db: Session = Depends(get_read_db),auth: str = Depends(get_api_key_or_current_user)):
     """
     Get user information by user ID.
     """
@@ -85,10 +125,23 @@ async def read_user(user_id: int, db: Session = Depends(get_db),auth: str = Depe
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
+def _history_cursor(before_date: Optional[date], before_id: Optional[int]):
+    if (before_date is None) != (before_id is None):
+        raise HTTPException(status_code=400, detail="before_date and before_id must be given together")
+    return None if before_date is None else (before_date, before_id)
+
 @app.get("/users/{user_id}/reservations", response_model=List[schemas.Reservation])
-async def read_user_reservations(user_id: int, db: Session = Depends(get_db),auth: str = Depends(get_api_key_or_current_user)):
+async def read_user_reservations(
+    user_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=crud.MAX_HISTORY_PAGE),
+    before_date: Optional[date] = None,
+    before_id: Optional[int] = None,
+    db: Session = Depends(get_user_read_db),
+    auth: str = Depends(get_api_key_or_current_user)
+):
     """
     Get all reservations for a specific user by user ID.
+    With `limit`, pages through the user's whole history, archive included (see get_my_reservations).
     """
     if isinstance(auth, models.User):
         raise HTTPException(status_code=403, detail="API key required for this operation")
@@ -96,7 +149,7 @@ async def read_user_reservations(user_id: int, db: Session = Depends(get_db),aut
     db_user = crud.get_user(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return crud.get_user_reservations(db, user_id=user_id)
+    return fast_json(crud.get_user_reservations(db, user_id=user_id, limit=limit, before=_history_cursor(before_date, before_id)), schemas.Reservation)
 
 @app.put("/users/me", response_model=schemas.User)
 async def update_user_me(
@@ -127,7 +180,7 @@ async def create_restaurant(
 async def list_restaurants(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     List all restaurants (public endpoint).
@@ -135,12 +188,12 @@ async def list_restaurants(
     restaurants = crud.get_restaurants(db, skip=skip, limit=limit)
     if not restaurants:
         raise HTTPException(status_code=404, detail="No restaurants found")
-    return restaurants
+    return fast_json(restaurants, schemas.Restaurant)
 
 @app.get("/restaurants/{restaurant_id}", response_model=schemas.Restaurant)
 async def get_restaurant_detail(
     restaurant_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get details of a specific restaurant (public endpoint).
@@ -154,19 +207,117 @@ async def get_restaurant_detail(
 async def get_restaurant_availability(
     restaurant_id: int,
     date: date,
+    party_size: Optional[int] = Query(None, ge=1),
     db: Session = Depends(get_db)
 ):
     """
     Get the availability of a restaurant for all hours in a day.
-    Returns a dictionary with time slots and available tables.
+    Returns a dictionary with time slots and the tables free for the whole stay
+    (which is longer for large parties when `party_size` is given).
     """
     restaurant = crud.get_restaurant(db, restaurant_id=restaurant_id)
     if restaurant is None:
         raise HTTPException(status_code=404, detail="Restaurant not found")
     
-    availability = crud.get_restaurant_availability(db, restaurant_id, date)
+    availability = crud.get_restaurant_availability(db, restaurant_id, date, party_size)
     return availability
 
+@app.get("/restaurants/{restaurant_id}/availability/stream")
+async def stream_restaurant_availability(
+    restaurant_id: int,
+    date: date,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Server-sent events with a restaurant's availability for a day (public endpoint).
+    The first `snapshot` event holds every slot as returned by the availability
+    endpoint; each `delta` event holds only the slots whose count changed. A client
+    that falls behind is sent a new `snapshot` instead of the events it missed.
+    """
+    restaurant = crud.get_restaurant(db, restaurant_id=restaurant_id)
+    if restaurant is None:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    # Only a pre-check: the subscription itself is made by the body, so it cannot leak before the stream starts
+    if not availability_feed.has_capacity:
+        raise HTTPException(status_code=503, detail="Too many availability subscribers, poll the availability endpoint instead")
+    return StreamingResponse(
+        availability_feed.events(restaurant_id, date, settings.AVAILABILITY_FEED_HEARTBEAT_SECONDS, request.is_disconnected),
+        media_type="text/event-stream",
+        # Keep proxies from buffering or caching the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/availability/nearest", response_model=List[schemas.SlotOption])
+async def find_nearest_available_slots(
+    date: date,
+    time: time,
+    party_size: int = Query(..., ge=1),
+    restaurant_id: Optional[List[int]] = Query(None),
+    restaurant_name: Optional[List[str]] = Query(None),
+    limit: int = Query(5, ge=1, le=20),
+    max_days: int = Query(7, ge=0, le=settings.SLOT_SEARCH_MAX_DAYS),
+    db: Session = Depends(get_db)
+):
+    """
+    Find the bookable slots nearest to a preferred date and time for a party,
+    across the given restaurants (by ID and/or name) and up to `max_days` days
+    before or after. Options are ordered by distance from the requested time.
+    """
+    restaurants = []
+    for restaurant_key in restaurant_id or []:
+        restaurant = crud.get_restaurant(db, restaurant_id=restaurant_key)
+        if restaurant is None:
+            raise HTTPException(status_code=404, detail=f"Restaurant {restaurant_key} not found")
+        restaurants.append(restaurant)
+    for name in restaurant_name or []:
+        restaurant = crud.get_restaurant_by_name(db, name)
+        if restaurant is None:
+            raise HTTPException(status_code=404, detail=f"Restaurant {name} not found")
+        restaurants.append(restaurant)
+    restaurants = list({restaurant.restaurant_id: restaurant for restaurant in restaurants}.values())
+    if not restaurants:
+        raise HTTPException(status_code=400, detail="At least one restaurant_id or restaurant_name is required")
+    if len(restaurants) > settings.SLOT_SEARCH_MAX_RESTAURANTS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.SLOT_SEARCH_MAX_RESTAURANTS} restaurants per search")
+
+    return slot_search.find_nearest_slots(
+        db, restaurants, datetime.combine(date, time), party_size,
+        limit=limit, max_days=max_days, max_day_loads=settings.SLOT_SEARCH_MAX_DAY_LOADS
+    )
+
+@app.get("/restaurants/{restaurant_id}/tables", response_model=List[schemas.RestaurantTable])
+async def get_restaurant_tables(
+    restaurant_id: int,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get the table inventory of a restaurant (public endpoint).
+    An empty list means bookings are checked against `total_tables` only.
+    """
+    restaurant = crud.get_restaurant(db, restaurant_id=restaurant_id)
+    if restaurant is None:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    return crud.get_restaurant_tables(db, restaurant_id)
+
+@app.put("/restaurants/{restaurant_id}/tables", response_model=List[schemas.RestaurantTable])
+async def replace_restaurant_tables(
+    restaurant_id: int,
+    tables: List[schemas.RestaurantTableCreate],
+    db: Session = Depends(get_db),
+    auth: str = Depends(get_api_key_or_current_user)
+):
+    """
+    Replace the table inventory of a restaurant (API key required).
+    Bookings are then assigned to concrete tables by party size.
+    """
+    if isinstance(auth, models.User):
+        raise HTTPException(status_code=403, detail="API key required for this operation")
+    result = crud.replace_restaurant_tables(db, restaurant_id, tables)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    return result
+
 @app.put("/restaurants/{restaurant_id}", response_model=schemas.Restaurant)
 async def update_restaurant(
     restaurant_id: int,
@@ -240,6 +391,14 @@ async def book_restaurant_by_name(
         current_user_id = reservation.user_id
     result = crud.create_reservation_by_restaurant_name(db=db, reservation=reservation, user_id=current_user_id)
     if not result:
+        # Clients such as the agents service only offer the waitlist for a full slot
+        if not crud.get_restaurant_by_name(db, reservation.restaurant_name):
+            raise HTTPException(status_code=404, detail="Restaurant not found")
+        try:
+            datetime.strptime(reservation.date, "%Y-%m-%d")
+            datetime.strptime(reservation.time, "%H:%M")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date or time format. Use YYYY-MM-DD and HH:MM.")
         raise HTTPException(status_code=404, detail="No tables available at the requested time.")
     
     db_reservation, restaurant = result
@@ -251,18 +410,28 @@ async def book_restaurant_by_name(
         date=reservation.date,
         time=reservation.time,
         guests=reservation.guests,
-        status=db_reservation.status.value
+        status=db_reservation.status.value,
+        table_ids=[assignment.table_id for assignment in db_reservation.table_assignments]
     )
 
 @app.get("/my-reservations/", response_model=List[schemas.ReservationWithRestaurant])
 async def get_my_reservations(
+    limit: Optional[int] = Query(None, ge=1, le=crud.MAX_HISTORY_PAGE),
+    before_date: Optional[date] = None,
+    before_id: Optional[int] = None,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_current_user_read_db)
 ):
     """
     Get all reservations for the current user.
+    Past reservations are archived after a while; to page through the whole history,
+    newest first, pass `limit`, then the `reservation_date` and `reservation_id` of the
+    last reservation of a page as `before_date` and `before_id` for the next one.
     """
-    return crud.get_user_reservations(db, user_id=current_user.user_id)
+    return fast_json(
+        crud.get_user_reservations(db, user_id=current_user.user_id, limit=limit, before=_history_cursor(before_date, before_id)),
+        schemas.ReservationWithRestaurant
+    )
 
 @app.put("/my-reservations/{reservation_id}", response_model=schemas.Reservation)
 async def update_my_reservation(
@@ -301,10 +470,149 @@ async def cancel_my_reservation(
         raise HTTPException(status_code=404, detail="Reservation not found or not owned by you")
     return cancelled_reservation
 
+# Waitlist endpoints
+def _waitlist_response(db: Session, db_entry: models.WaitlistEntry) -> schemas.WaitlistEntry:
+    response = schemas.WaitlistEntry.model_validate(db_entry)
+    response.position = waitlist.position(db, db_entry)
+    return response
+
+def _get_own_waitlist_entry(db: Session, entry_id: int, auth) -> models.WaitlistEntry:
+    db_entry = crud.get_waitlist_entry(db, entry_id)
+    if db_entry is None or (isinstance(auth, models.User) and db_entry.user_id != auth.user_id):
+        raise HTTPException(status_code=404, detail="Waitlist entry not found or not owned by you")
+    return db_entry
+
+@app.post("/waitlist/", response_model=schemas.WaitlistEntry)
+async def join_waitlist(
+    entry: schemas.WaitlistCreate,
+    auth: models.User = Depends(get_api_key_or_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Join the waitlist of a fully booked slot. The party is booked automatically as soon
+    as a table frees up; if one is free already the entry comes back promoted.
+    """
+    if isinstance(auth,models.User):
+        current_user_id = auth.user_id
+    else:
+        if entry.user_id is None:
+            raise HTTPException(status_code=400, detail="User ID is required")
+        current_user_id = entry.user_id
+    db_entry = crud.join_waitlist(db, entry, current_user_id)
+    if db_entry is None:
+        raise HTTPException(status_code=404, detail="Restaurant not found or invalid date or time")
+    return _waitlist_response(db, db_entry)
+
+@app.get("/waitlist/{entry_id}", response_model=schemas.WaitlistEntry)
+async def get_waitlist_entry(
+    entry_id: int,
+    auth: models.User = Depends(get_api_key_or_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Status of a waitlist entry and its position in the queue while waiting.
+    """
+    return _waitlist_response(db, _get_own_waitlist_entry(db, entry_id, auth))
+
+@app.delete("/waitlist/{entry_id}", response_model=schemas.WaitlistEntry)
+async def leave_waitlist(
+    entry_id: int,
+    auth: models.User = Depends(get_api_key_or_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Leave the waitlist. Entries that were already promoted keep their reservation.
+    """
+    db_entry = crud.leave_waitlist(db, _get_own_waitlist_entry(db, entry_id, auth))
+    return _waitlist_response(db, db_entry)
+
+# Bulk reservation endpoints
+@app.post("/reservations/bulk", response_model=List[schemas.BulkReservationResult])
+async def create_reservations_bulk(
+    bulk: schemas.BulkReservationCreate,
+    auth: models.User = Depends(get_api_key_or_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Create many reservations at once.
+    Users book for themselves; with an API key every item must carry a user_id.
+    Returns a result for each item in request order.
+    """
+    if len(bulk.reservations) > crud.MAX_BULK_RESERVATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {crud.MAX_BULK_RESERVATIONS} reservations per request")
+    current_user_id = auth.user_id if isinstance(auth, models.User) else None
+    return crud.create_reservations_bulk(db, bulk.reservations, user_id=current_user_id)
+
+@app.post("/reservations/bulk-cancel", response_model=List[schemas.BulkCancelResult])
+async def cancel_reservations_bulk(
+    bulk: schemas.BulkCancelRequest,
+    auth: models.User = Depends(get_api_key_or_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Cancel many reservations at once.
+    Users can only cancel their own reservations; an API key can cancel any reservation.
+    Returns a result for each reservation ID.
+    """
+    if len(bulk.reservation_ids) > crud.MAX_BULK_RESERVATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {crud.MAX_BULK_RESERVATIONS} reservations per request")
+    current_user_id = auth.user_id if isinstance(auth, models.User) else None
+    return crud.cancel_reservations_bulk(db, bulk.reservation_ids, user_id=current_user_id)
+
+# Check-in endpoints
+def _find_reservations_by_codes(db: Session, read_db: Session, codes: List[str]) -> Dict[str, models.Reservation]:
+    # A guest may check in right after booking, before the replica has the reservation
+    found = crud.get_reservations_by_codes(read_db, codes)
+    missing = [code for code in codes if code.strip().upper() not in found]
+    if missing and read_db.info.get("replica") is not None:
+        found.update(crud.get_reservations_by_codes(db, missing))
+    return found
+
+@app.get("/reservations/by-code/{code}", response_model=schemas.ReservationWithRestaurant)
+async def get_reservation_by_code(
+    code: str,
+    auth: models.User = Depends(get_api_key_or_current_user),
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db)
+):
+    """
+    Look up a reservation by its code, e.g. at check-in (case-insensitive).
+    Users can only look up their own reservations; an API key can look up any.
+    """
+    db_reservation = _find_reservations_by_codes(db, read_db, [code]).get(code.strip().upper())
+    if db_reservation is None or (isinstance(auth, models.User) and db_reservation.user_id != auth.user_id):
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    return db_reservation
+
+@app.post("/reservations/by-code", response_model=List[schemas.ReservationCodeResult])
+async def get_reservations_by_codes(
+    lookup: schemas.ReservationCodeLookup,
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db),
+    auth: str = Depends(get_api_key_or_current_user)
+):
+    """
+    Look up many reservation codes in one query, for host-stand scanners (API key required).
+    Returns a result for each code, in request order.
+    """
+    if isinstance(auth, models.User):
+        raise HTTPException(status_code=403, detail="API key required for this operation")
+    if len(lookup.codes) > crud.MAX_CODE_LOOKUP:
+        raise HTTPException(status_code=400, detail=f"At most {crud.MAX_CODE_LOOKUP} codes per request")
+    found = _find_reservations_by_codes(db, read_db, lookup.codes)
+    return [
+        schemas.ReservationCodeResult(
+            code=code,
+            found=code.strip().upper() in found,
+            reservation=found.get(code.strip().upper())
+        )
+        for code in lookup.codes
+    ]
+
 # Admin reservation endpoints (API key required)
 @app.get("/reservations/", response_model=List[schemas.Reservation])
 async def get_all_reservations(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     auth: str = Depends(get_api_key_or_current_user)
 ):
     """
@@ -313,13 +621,13 @@ async def get_all_reservations(
     if isinstance(auth, models.User):
         raise HTTPException(status_code=403, detail="API key required for this operation")
     
-    return db.query(models.Reservation).all()
+    return fast_json(db.query(models.Reservation).all(), schemas.Reservation)
 
 @app.get("/restaurants/{restaurant_id}/reservations/", response_model=List[schemas.Reservation])
 async def get_restaurant_reservations(
     restaurant_id: int,
     reservation_date: Optional[date] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     auth: str = Depends(get_api_key_or_current_user)
 ):
     """
@@ -328,4 +636,35 @@ async def get_restaurant_reservations(
     if isinstance(auth, models.User):
         raise HTTPException(status_code=403, detail="API key required for this operation")
     
-    return crud.get_restaurant_reservations(db, restaurant_id, reservation_date)
\ No newline at end of file
+    return fast_json(crud.get_restaurant_reservations(db, restaurant_id, reservation_date), schemas.Reservation)
+
+# Background job endpoints (API key required)
+@app.get("/jobs/dead", response_model=List[schemas.BackgroundJob])
+async def get_dead_jobs(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    auth: str = Depends(get_api_key_or_current_user)
+):
+    """
+    List background jobs that failed every attempt (API key required).
+    """
+    if isinstance(auth, models.User):
+        raise HTTPException(status_code=403, detail="API key required for this operation")
+    return tasks.get_dead_jobs(db, skip=skip, limit=limit)
+
+@app.post("/jobs/{job_id}/retry", response_model=schemas.BackgroundJob)
+async def retry_dead_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    auth: str = Depends(get_api_key_or_current_user)
+):
+    """
+    Queue a dead background job again (API key required).
+    """
+    if isinstance(auth, models.User):
+        raise HTTPException(status_code=403, detail="API key required for this operation")
+    job = tasks.retry_dead_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Dead job not found")
+    return job
@@ -1,13 +1,26 @@
-from sqlalchemy import Column, Integer, String, Date, Time, ForeignKey, Enum, Text
+from sqlalchemy import Column, Integer, String, Date, Time, DateTime, ForeignKey, Enum, Text, Index
 from sqlalchemy.orm import relationship
 from .database import Base
-from .utils import generate_reservation_code
+from .utils import unique_reservation_code
 import enum
 
 class ReservationStatus(enum.Enum):
     CONFIRMED = "Confirmed"
     CANCELLED = "Cancelled"
 
+class WaitlistStatus(enum.Enum):
+    WAITING = "Waiting"
+    PROMOTED = "Promoted"
+    CANCELLED = "Cancelled"
+    # The slot began while the party was still waiting
+    EXPIRED = "Expired"
+
+class JobStatus(enum.Enum):
+    PENDING = "Pending"
+    RUNNING = "Running"
+    DONE = "Done"
+    DEAD = "Dead"
+
 
 class Restaurant(Base):
     __tablename__ = "restaurants"
@@ -16,8 +29,11 @@ class Restaurant(Base):
     restaurant_description = Column(String(1000), nullable=True)
     total_tables = Column(Integer, default=0)
     booked_tables = Column(Integer, default=0)  
+    # Minutes a table is held per booking; NULL uses settings.DINING_DURATION_MINUTES
+    dining_duration_minutes = Column(Integer, nullable=True)
 
     reservations = relationship("Reservation", back_populates="restaurant")
+    tables = relationship("RestaurantTable", back_populates="restaurant", cascade="all, delete-orphan")
 
 class User(Base):
     __tablename__ = "users"
@@ -38,7 +54,102 @@ class Reservation(Base):
     reservation_time = Column(Time, nullable=False)
     number_of_guests = Column(Integer, nullable=False)
     status = Column(Enum(ReservationStatus, name='reservation_status'), nullable=False)
-    reservation_code = Column(String(10), nullable=False, default=generate_reservation_code)
+    # Unique index: codes are checked for collisions when drawn, and looked up at check-in
+    reservation_code = Column(String(10), nullable=False, unique=True, index=True, default=unique_reservation_code)
     
     user = relationship("User", back_populates="reservations")
-    restaurant = relationship("Restaurant", back_populates="reservations")
\ No newline at end of file
+    restaurant = relationship("Restaurant", back_populates="reservations")
+    table_assignments = relationship("ReservationTable", cascade="all, delete-orphan")
+
+    # A user's reservations, newest first, without a scan of the whole table
+    __table_args__ = (Index("ix_reservations_user_date", "user_id", "reservation_date", "reservation_id"),)
+
+class ArchivedReservation(Base):
+    """
+    A reservation moved out of `reservations` by the archival job (see app.archive), with
+    its original ID and code. On PostgreSQL the table is range-partitioned by
+    reservation_date, one partition per year, so the date is part of the primary key.
+    """
+    __tablename__ = "reservations_archive"
+    reservation_id = Column(Integer, primary_key=True, autoincrement=False)
+    reservation_date = Column(Date, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.user_id'), nullable=False)
+    restaurant_id = Column(Integer, ForeignKey('restaurants.restaurant_id'), nullable=False)
+    reservation_time = Column(Time, nullable=False)
+    number_of_guests = Column(Integer, nullable=False)
+    status = Column(Enum(ReservationStatus, name='reservation_status'), nullable=False)
+    # Not unique on its own (Postgres requires the partition key in unique indexes);
+    # new codes are still checked against it when drawn
+    reservation_code = Column(String(10), nullable=False, index=True)
+    archived_at = Column(DateTime, nullable=False)
+
+    restaurant = relationship("Restaurant")
+
+    __table_args__ = (
+        Index("ix_reservations_archive_user_date", "user_id", "reservation_date", "reservation_id"),
+        {"postgresql_partition_by": "RANGE (reservation_date)"},
+    )
+
+class RestaurantTable(Base):
+    __tablename__ = "restaurant_tables"
+    table_id = Column(Integer, primary_key=True, autoincrement=True)
+    restaurant_id = Column(Integer, ForeignKey('restaurants.restaurant_id'), nullable=False, index=True)
+    label = Column(String(20), nullable=False)
+    seats = Column(Integer, nullable=False)
+    # Tables with the same group can be pushed together for a larger party
+    combine_group = Column(String(20), nullable=True)
+
+    restaurant = relationship("Restaurant", back_populates="tables")
+
+class ReservationTable(Base):
+    __tablename__ = "reservation_tables"
+    reservation_id = Column(Integer, ForeignKey('reservations.reservation_id'), primary_key=True)
+    table_id = Column(Integer, ForeignKey('restaurant_tables.table_id'), primary_key=True, index=True)
+
+class WaitlistEntry(Base):
+    """
+    A party waiting for a full slot; promoted to a reservation when capacity frees up.
+    Lower entry_id means an earlier request and a higher priority.
+    """
+    __tablename__ = "waitlist_entries"
+    entry_id = Column(Integer, primary_key=True, autoincrement=True)
+    restaurant_id = Column(Integer, ForeignKey('restaurants.restaurant_id'), nullable=False)
+    user_id = Column(Integer, ForeignKey('users.user_id'), nullable=False)
+    reservation_date = Column(Date, nullable=False)
+    reservation_time = Column(Time, nullable=False)
+    number_of_guests = Column(Integer, nullable=False)
+    status = Column(Enum(WaitlistStatus, name='waitlist_status'), nullable=False, default=WaitlistStatus.WAITING)
+    created_at = Column(DateTime, nullable=False)
+    reservation_id = Column(Integer, ForeignKey('reservations.reservation_id'), nullable=True)
+
+    restaurant = relationship("Restaurant")
+
+    # Serves both the promotion scan of a day and the position count within a slot
+    __table_args__ = (Index("ix_waitlist_slot", "restaurant_id", "reservation_date", "status", "reservation_time", "entry_id"),)
+
+class BackgroundJob(Base):
+    """
+    A side effect queued by a request (see app.tasks). The row is written in the same
+    transaction as the change that caused it, so a committed booking always has its jobs.
+    """
+    __tablename__ = "background_jobs"
+    job_id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(100), nullable=False)
+    payload = Column(Text, nullable=False)
+    status = Column(Enum(JobStatus, name='job_status'), nullable=False, default=JobStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    run_after = Column(DateTime, nullable=False)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (Index("ix_background_jobs_status_run_after", "status", "run_after"),)
+
+class ReplicationHeartbeat(Base):
+    """
+    A single row stamped on the primary and read back from each read replica to
+    measure replication lag (see app.replicas).
+    """
+    __tablename__ = "replication_heartbeat"
+    heartbeat_id = Column(Integer, primary_key=True)
+    written_at = Column(DateTime, nullable=False)
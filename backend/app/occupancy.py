@@ -0,0 +1,273 @@
+"""
+In-memory occupancy index for reservation overlap queries.
+
+Every active reservation occupies one table for [start, start + dining duration).
+For each (restaurant, day) a segment tree over the minutes of the day answers
+"most tables in use at any moment of [t, t + d)" in O(log n), which is what
+capacity checks need. Days are loaded from the database on first use, kept up
+to date by the write paths in crud (`record`), and reloaded after
+`OCCUPANCY_INDEX_TTL_SECONDS` so writes made by other processes are picked up.
+
+The cached index only answers read-only availability and slot search, which
+may be a few seconds stale. Bookings are checked against a day loaded fresh
+inside the booking transaction after `lock_restaurant`, so concurrent bookings
+of one restaurant, from any process, are checked one after the other.
+"""
+import threading
+import time as _time
+from array import array
+from collections import OrderedDict, defaultdict
+from datetime import date, time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def minutes(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+def dining_duration(restaurant_duration: Optional[int], party_size: Optional[int]) -> int:
+    """
+    Minutes a party occupies its table: the restaurant's own duration (or the default)
+    plus the extra time configured for the largest party-size threshold reached.
+    """
+    duration = restaurant_duration or settings.DINING_DURATION_MINUTES
+    extra = 0
+    for min_party_size, extra_minutes in sorted(settings.DINING_DURATION_PARTY_EXTRA_MINUTES.items()):
+        if party_size is not None and party_size >= min_party_size:
+            extra = extra_minutes
+    return duration + extra
+
+
+class DayOccupancy:
+    """
+    Segment tree over the minutes of one day supporting "add to a range" and
+    "max over a range". Each node stores the max of its subtree including the
+    adds applied to the whole node, so no lazy push-down is needed.
+    """
+    def __init__(self):
+        # Compact int arrays: a cached day costs about 46 KB
+        self._max = array("i", bytes(4 * 4 * MINUTES_PER_DAY))
+        self._add = array("i", bytes(4 * 4 * MINUTES_PER_DAY))
+
+    @staticmethod
+    def _clamp(start: int, end: int) -> Tuple[int, int]:
+        # A booking running past midnight only counts until the end of its day
+        return max(0, start), min(MINUTES_PER_DAY, end)
+
+    def add(self, start: int, end: int, delta: int = 1) -> None:
+        start, end = self._clamp(start, end)
+        if start < end:
+            self._update(1, 0, MINUTES_PER_DAY, start, end, delta)
+
+    def max_occupancy(self, start: int, end: int) -> int:
+        start, end = self._clamp(start, end)
+        if start >= end:
+            return 0
+        return self._query(1, 0, MINUTES_PER_DAY, start, end)
+
+    def _update(self, node: int, low: int, high: int, start: int, end: int, delta: int) -> None:
+        if start <= low and high <= end:
+            self._add[node] += delta
+            self._max[node] += delta
+            return
+        middle = (low + high) // 2
+        if start < middle:
+            self._update(2 * node, low, middle, start, end, delta)
+        if end > middle:
+            self._update(2 * node + 1, middle, high, start, end, delta)
+        self._max[node] = max(self._max[2 * node], self._max[2 * node + 1]) + self._add[node]
+
+    def _query(self, node: int, low: int, high: int, start: int, end: int) -> int:
+        if start <= low and high <= end:
+            return self._max[node]
+        middle = (low + high) // 2
+        best = 0
+        if start < middle:
+            best = self._query(2 * node, low, middle, start, end)
+        if end > middle:
+            best = max(best, self._query(2 * node + 1, middle, high, start, end))
+        return best + self._add[node]
+
+
+def load_day_occupancy(db: Session, groups: Iterable[Tuple[int, date]]) -> Dict[Tuple[int, date], DayOccupancy]:
+    """
+    Builds the occupancy of the given (restaurant_id, reservation_date) groups
+    from their active reservations with a single query.
+    """
+    groups = list(groups)
+    days = defaultdict(DayOccupancy)
+    if not groups:
+        return days
+    rows = db.query(
+        models.Reservation.restaurant_id,
+        models.Reservation.reservation_date,
+        models.Reservation.reservation_time,
+        models.Reservation.number_of_guests,
+        models.Restaurant.dining_duration_minutes
+    ).join(models.Restaurant).filter(
+        tuple_(models.Reservation.restaurant_id, models.Reservation.reservation_date).in_(groups),
+        models.Reservation.status != models.ReservationStatus.CANCELLED
+    ).all()
+    for restaurant_id, reservation_date, reservation_time, guests, restaurant_duration in rows:
+        start = minutes(reservation_time)
+        days[(restaurant_id, reservation_date)].add(start, start + dining_duration(restaurant_duration, guests))
+    return days
+
+
+def lock_restaurant(db: Session, restaurant_id: int) -> None:
+    """
+    Locks the restaurant row until the caller's transaction ends. Every write path
+    that checks capacity takes this lock first, so the reservations it then reads
+    include every booking committed before, and nothing else books the restaurant
+    until it commits.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        # No row locks in SQLite: a no-op write takes the database write lock instead
+        db.execute(
+            update(models.Restaurant)
+            .where(models.Restaurant.restaurant_id == restaurant_id)
+            .values(restaurant_id=models.Restaurant.restaurant_id)
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        db.execute(
+            select(models.Restaurant.restaurant_id)
+            .where(models.Restaurant.restaurant_id == restaurant_id)
+            .with_for_update()
+        )
+
+
+def _interval(reservation: models.Reservation, restaurant: models.Restaurant) -> Optional[Tuple[int, int]]:
+    if reservation.restaurant_id != restaurant.restaurant_id or reservation.status == models.ReservationStatus.CANCELLED:
+        return None
+    start = minutes(reservation.reservation_time)
+    return start, start + dining_duration(restaurant.dining_duration_minutes, reservation.number_of_guests)
+
+
+def free_tables(
+    occupancy: DayOccupancy,
+    restaurant: models.Restaurant,
+    day: date,
+    start_time: time,
+    party_size: Optional[int] = None,
+    exclude: Optional[models.Reservation] = None
+) -> int:
+    """
+    Tables of `occupancy` free for the whole stay of a party of `party_size` arriving
+    at `start_time`. `exclude` is an existing reservation to leave out, e.g. the one
+    being modified.
+    """
+    start = minutes(start_time)
+    end = start + dining_duration(restaurant.dining_duration_minutes, party_size)
+    excluded = _interval(exclude, restaurant) if exclude is not None and exclude.reservation_date == day else None
+    if excluded:
+        occupancy.add(*excluded, delta=-1)
+    try:
+        in_use = occupancy.max_occupancy(start, end)
+    finally:
+        if excluded:
+            occupancy.add(*excluded, delta=1)
+    return max(0, (restaurant.total_tables or 0) - in_use)
+
+
+class DayCache:
+    """
+    LRU cache of per-day state keyed by (restaurant_id, date). Entries are reloaded
+    after `ttl` seconds so writes made by other processes are picked up.
+    """
+    def __init__(self, ttl: float = 30.0, max_days: int = 1024):
+        self.ttl = ttl
+        self.max_days = max_days
+        self._days: "OrderedDict[Tuple[int, date], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _cached(self, key: Tuple[int, date], load: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._days.get(key)
+            if entry is not None and _time.monotonic() - entry[0] < self.ttl:
+                self._days.move_to_end(key)
+                return entry[1]
+            value = load()
+            self._days[key] = (_time.monotonic(), value)
+            self._days.move_to_end(key)
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+            return value
+
+    def _peek(self, key: Tuple[int, date]) -> Any:
+        """
+        The cached value of a day, or None if it is not cached. Call with the lock held.
+        """
+        entry = self._days.get(key)
+        return entry[1] if entry is not None else None
+
+    def invalidate(self, restaurant_id: int, day: Optional[date] = None) -> None:
+        """
+        Drops one cached day, or every cached day of the restaurant.
+        """
+        with self._lock:
+            keys: List[Tuple[int, date]] = [key for key in self._days if key[0] == restaurant_id and (day is None or key[1] == day)]
+            for key in keys:
+                del self._days[key]
+
+
+class OccupancyIndex(DayCache):
+    """
+    Cached DayOccupancy trees keyed by (restaurant_id, date).
+    """
+    def day(self, db: Session, restaurant_id: int, day: date) -> DayOccupancy:
+        key = (restaurant_id, day)
+        return self._cached(key, lambda: load_day_occupancy(db, [key])[key])
+
+    def available_tables(
+        self,
+        db: Session,
+        restaurant: models.Restaurant,
+        day: date,
+        start_time: time,
+        party_size: Optional[int] = None
+    ) -> int:
+        """
+        Tables free for the whole stay of a party of `party_size` arriving at `start_time`,
+        from the cached day. For read-only availability; bookings use `free_tables` on a
+        fresh day instead.
+        """
+        with self._lock:
+            occupancy = self.day(db, restaurant.restaurant_id, day)
+            return free_tables(occupancy, restaurant, day, start_time, party_size)
+
+    def record(self, restaurant_id: int, day: date, start_time: time, party_size: int, restaurant_duration: Optional[int], delta: int) -> None:
+        """
+        Applies a committed write (delta +1 booked, -1 cancelled) to a cached day.
+        Days that are not cached are loaded fresh when next needed.
+        """
+        with self._lock:
+            occupancy = self._peek((restaurant_id, day))
+            if occupancy is None:
+                return
+            start = minutes(start_time)
+            occupancy.add(start, start + dining_duration(restaurant_duration, party_size), delta)
+
+    def record_reservation(self, reservation: models.Reservation, delta: int) -> None:
+        self.record(
+            reservation.restaurant_id,
+            reservation.reservation_date,
+            reservation.reservation_time,
+            reservation.number_of_guests,
+            reservation.restaurant.dining_duration_minutes,
+            delta
+        )
+
+
+occupancy_index = OccupancyIndex(
+    ttl=settings.OCCUPANCY_INDEX_TTL_SECONDS,
+    max_days=settings.OCCUPANCY_INDEX_MAX_DAYS
+)
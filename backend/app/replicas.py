@@ -0,0 +1,179 @@
+"""
+Read replica routing.
+
+Read-only endpoints take their session from `get_read_db` (app.dependencies),
+which binds it to a read replica when one is configured and caught up, and to
+the primary otherwise. Everything that writes keeps using `get_db`.
+
+Replication itself is left to the database: streaming replication for
+Postgres, or a copy of the database file when trying this out locally with
+SQLite. Lag is measured with a heartbeat. A checker thread stamps the single
+`replication_heartbeat` row on the primary every `check_interval` seconds and
+reads the row back from every replica. A replica's lag is how far its stamp
+trails the one just written. A replica that is more than `max_lag` behind, or
+cannot be reached, gets no reads until it catches up; with no usable replica
+all reads go to the primary.
+
+Read-your-writes: crud records when each user last wrote. That user's reads go
+to a replica only once the replica's stamp is newer than the write, so someone
+who has just booked always sees the booking. The record is kept per process:
+a write made through another API process is only covered by `max_lag`.
+
+Availability is not read from replicas. It is answered from the occupancy
+index, which is kept up to date by this process's own writes and must only be
+filled from the primary to stay consistent with them.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from itertools import count
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import models
+from .config import settings
+from .database import SessionLocal, replica_engines
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_ID = 1
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ReplicaRouter:
+    def __init__(self, engines: List[Engine], max_lag: float = 5.0, check_interval: float = 1.0):
+        self.engines = engines
+        self.max_lag = timedelta(seconds=max_lag)
+        self.check_interval = check_interval
+        self._session_factories = [
+            sessionmaker(autocommit=False, autoflush=False, bind=engine) for engine in engines
+        ]
+        # Newest primary stamp each replica has applied; None while it gets no reads
+        self._applied: List[Optional[datetime]] = [None] * len(engines)
+        # user_id -> time of that user's last write through this process
+        self._writes: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self._turn = count()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if not self.engines or self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-checker", daemon=True)
+        self._thread.start()
+        logger.info("Routing reads to %d read replicas", len(self.engines))
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def record_write(self, *user_ids: Optional[int]) -> None:
+        """
+        Notes that these users just committed a change, so their reads stay on the
+        primary until it has replicated.
+        """
+        if not self.engines:
+            return
+        now = _utcnow()
+        with self._lock:
+            for user_id in user_ids:
+                if user_id is not None:
+                    self._writes[user_id] = now
+
+    def session(self, user_id: Optional[int] = None) -> Session:
+        """
+        A session on a usable replica, taking turns between them, or on the primary.
+        With a user_id, only replicas that already have that user's last write are used.
+        """
+        index = self._pick(user_id)
+        if index is None:
+            return SessionLocal()
+        db = self._session_factories[index]()
+        db.info["replica"] = index
+        return db
+
+    def _pick(self, user_id: Optional[int]) -> Optional[int]:
+        if not self.engines:
+            return None
+        with self._lock:
+            written = self._writes.get(user_id) if user_id is not None else None
+            usable = [
+                index for index, applied in enumerate(self._applied)
+                if applied is not None and (written is None or applied > written)
+            ]
+        if not usable:
+            return None
+        return usable[next(self._turn) % len(usable)]
+
+    def mark_failed(self, db: Session) -> None:
+        """
+        Takes the session's replica out of rotation after a connection error, until
+        the next check finds it healthy again.
+        """
+        index = db.info.get("replica")
+        if index is None:
+            return
+        with self._lock:
+            self._applied[index] = None
+        logger.warning("Read replica %d failed, sending its reads to the primary", index)
+
+    def check(self) -> None:
+        """
+        Stamps the primary heartbeat and re-measures the lag of every replica.
+        """
+        now = _utcnow()
+        with SessionLocal() as db:
+            heartbeat = db.get(models.ReplicationHeartbeat, HEARTBEAT_ID)
+            if heartbeat is None:
+                db.add(models.ReplicationHeartbeat(heartbeat_id=HEARTBEAT_ID, written_at=now))
+            else:
+                heartbeat.written_at = now
+            db.commit()
+
+        applied = []
+        for index, engine in enumerate(self.engines):
+            try:
+                with engine.connect() as connection:
+                    stamp = connection.execute(
+                        select(models.ReplicationHeartbeat.written_at)
+                        .where(models.ReplicationHeartbeat.heartbeat_id == HEARTBEAT_ID)
+                    ).scalar()
+            except Exception as exc:
+                logger.warning("Read replica %d unreachable: %s", index, exc)
+                stamp = None
+            if stamp is not None and now - stamp > self.max_lag:
+                logger.warning("Read replica %d is %.1fs behind, sending its reads to the primary", index, (now - stamp).total_seconds())
+                stamp = None
+            applied.append(stamp)
+
+        with self._lock:
+            self._applied = applied
+            # Every usable replica has applied writes older than this
+            horizon = now - self.max_lag
+            self._writes = {user_id: written for user_id, written in self._writes.items() if written >= horizon}
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Error in ReplicaRouter._run()")
+            self._stopping.wait(self.check_interval)
+
+
+replica_router = ReplicaRouter(
+    replica_engines,
+    max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.REPLICA_CHECK_INTERVAL_SECONDS
+)
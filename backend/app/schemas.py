@@ -1,7 +1,7 @@
-from pydantic import BaseModel, EmailStr
-from datetime import date, time
+from pydantic import BaseModel, EmailStr, Field
+from datetime import date, time, datetime
 from typing import Optional, List
-from .models import ReservationStatus
+from .models import ReservationStatus, JobStatus, WaitlistStatus
 
 # Restaurant schemas
 class RestaurantBase(BaseModel):
@@ -9,6 +9,7 @@ class RestaurantBase(BaseModel):
     restaurant_description: Optional[str] = None
     total_tables: Optional[int] = 0
     booked_tables: Optional[int] = 0
+    dining_duration_minutes: Optional[int] = None
 
 class RestaurantCreate(RestaurantBase):
     pass
@@ -19,6 +20,22 @@ class Restaurant(RestaurantBase):
     class Config:
         from_attributes = True
 
+# Table inventory schemas
+class RestaurantTableBase(BaseModel):
+    label: str
+    seats: int = Field(gt=0)
+    combine_group: Optional[str] = None
+
+class RestaurantTableCreate(RestaurantTableBase):
+    pass
+
+class RestaurantTable(RestaurantTableBase):
+    table_id: int
+    restaurant_id: int
+
+    class Config:
+        from_attributes = True
+
 # User schemas
 class UserBase(BaseModel):
     name: str
@@ -99,7 +116,79 @@ class ReservationResponse(BaseModel):
     guests: int
     status: str
     reservation_code: str
+    table_ids: List[int] = []
     message: str = "Reservation confirmed"
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Check-in lookup schemas
+class ReservationCodeLookup(BaseModel):
+    codes: List[str] = Field(min_length=1)
+
+class ReservationCodeResult(BaseModel):
+    code: str
+    found: bool
+    reservation: Optional[ReservationWithRestaurant] = None
+
+# Bulk reservation schemas
+class BulkReservationCreate(BaseModel):
+    reservations: List[ReservationCreate]
+
+class BulkReservationResult(BaseModel):
+    index: int
+    success: bool
+    reservation: Optional[Reservation] = None
+    error: Optional[str] = None
+
+class BulkCancelRequest(BaseModel):
+    reservation_ids: List[int]
+
+class BulkCancelResult(BaseModel):
+    reservation_id: int
+    success: bool
+    error: Optional[str] = None
+
+# Availability search schemas
+class SlotOption(BaseModel):
+    restaurant_id: int
+    restaurant_name: str
+    date: str
+    time: str
+    available_tables: int
+    # Negative when the option is earlier than requested
+    minutes_from_requested: int
+
+# Waitlist schemas
+class WaitlistCreate(SimpleReservationCreate):
+    pass
+
+class WaitlistEntry(BaseModel):
+    entry_id: int
+    restaurant_id: int
+    user_id: int
+    reservation_date: date
+    reservation_time: time
+    number_of_guests: int
+    status: WaitlistStatus
+    created_at: datetime
+    reservation_id: Optional[int] = None
+    # Place in the slot's queue while waiting
+    position: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+# Background job schemas
+class BackgroundJob(BaseModel):
+    job_id: int
+    name: str
+    payload: str
+    status: JobStatus
+    attempts: int
+    run_after: datetime
+    last_error: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
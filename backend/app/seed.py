@@ -1,128 +1,299 @@
+import argparse
+import csv
+import io
+import logging
 import random
+import time as timer
 from datetime import time, date, timedelta
+from itertools import islice
+from sqlalchemy import insert, func
+from .config import settings
 from .database import SessionLocal
+from .logging_config import setup_logging
 from .models import Restaurant, User, Reservation, ReservationStatus
 from .crud import get_password_hash
+from .utils import sequence_reservation_code
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PASSWORD = "password123"
+
+# Seed Restaurants
+restaurant_data = [
+    {
+        "name": "Taj Mahal",
+        "description": "Authentic North Indian cuisine in a luxurious setting with royal Mughal ambiance"
+    },
+    {
+        "name": "Punjab Grill",
+        "description": "Authentic Punjabi cuisine with traditional charm"
+    },
+    {
+        "name": "Dakshin Flavors",
+        "description": "Traditional South Indian cuisine served with authentic flavors"
+    },
+    {
+        "name": "Dragon House",
+        "description": "Premium Chinese dining experience with modern Asian decor"
+    },
+    {
+        "name": "Bella Italia",
+        "description": "Authentic Italian cuisine with imported ingredients"
+    },
+    {
+        "name": "Kerala Kitchen",
+        "description": "Authentic Kerala cuisine with coastal flavors"
+    },
+    {
+        "name": "Hyderabad House",
+        "description": "Famous for authentic Hyderabadi cuisine"
+    },
+    {
+        "name": "Bengal Bay",
+        "description": "Traditional Bengali cuisine with home-style cooking"
+    },
+    {
+        "name": "Gujarati Thali",
+        "description": "Unlimited Gujarati thali restaurant"
+    },
+    {
+        "name": "Thai Orchid",
+        "description": "Authentic Thai cuisine in elegant setting"
+    },
+    {
+        "name": "Sushi Square",
+        "description": "Premium Japanese dining experience"
+    },
+    {
+        "name": "Mediterranean Blue",
+        "description": "Mediterranean cuisine with fresh ingredients"
+    },
+    {
+        "name": "Mughlai Darbar",
+        "description": "Royal Mughlai cuisine experience"
+    },
+    {
+        "name": "Continental Corner",
+        "description": "Classic Continental cuisine with modern twist"
+    },
+    {
+        "name": "Mexican Cantina",
+        "description": "Vibrant Mexican restaurant with authentic flavors"
+    },
+    {
+        "name": "Seoul Kitchen",
+        "description": "Authentic Korean BBQ and traditional dishes"
+    },
+    {
+        "name": "Vietnam House",
+        "description": "Fresh Vietnamese cuisine with authentic flavors"
+    },
+    {
+        "name": "Maharaja Kitchen",
+        "description": "Royal Rajasthani dining experience with desert ambiance"
+    },
+    {
+        "name": "Dim Sum Dynasty",
+        "description": "Specializing in handcrafted dim sum and Cantonese cuisine"
+    },
+    {
+        "name": "BBQ Nation",
+        "description": "Interactive BBQ dining experience"
+    }
+]
 
 def seed_data():
     db = SessionLocal()
     try:
-        # Seed Restaurants
-        restaurant_data = [
-            {
-                "name": "Taj Mahal",
-                "description": "Authentic North Indian cuisine in a luxurious setting with royal Mughal ambiance"
-            },
-            {
-                "name": "Punjab Grill",
-                "description": "Authentic Punjabi cuisine with traditional charm"
-            },
-            {
-                "name": "Dakshin Flavors",
-                "description": "Traditional South Indian cuisine served with authentic flavors"
-            },
-            {
-                "name": "Dragon House",
-                "description": "Premium Chinese dining experience with modern Asian decor"
-            },
-            {
-                "name": "Bella Italia",
-                "description": "Authentic Italian cuisine with imported ingredients"
-            },
-            {
-                "name": "Kerala Kitchen",
-                "description": "Authentic Kerala cuisine with coastal flavors"
-            },
-            {
-                "name": "Hyderabad House",
-                "description": "Famous for authentic Hyderabadi cuisine"
-            },
-            {
-                "name": "Bengal Bay",
-                "description": "Traditional Bengali cuisine with home-style cooking"
-            },
-            {
-                "name": "Gujarati Thali",
-                "description": "Unlimited Gujarati thali restaurant"
-            },
-            {
-                "name": "Thai Orchid",
-                "description": "Authentic Thai cuisine in elegant setting"
-            },
-            {
-                "name": "Sushi Square",
-                "description": "Premium Japanese dining experience"
-            },
-            {
-                "name": "Mediterranean Blue",
-                "description": "Mediterranean cuisine with fresh ingredients"
-            },
-            {
-                "name": "Mughlai Darbar",
-                "description": "Royal Mughlai cuisine experience"
-            },
-            {
-                "name": "Continental Corner",
-                "description": "Classic Continental cuisine with modern twist"
-            },
-            {
-                "name": "Mexican Cantina",
-                "description": "Vibrant Mexican restaurant with authentic flavors"
-            },
-            {
-                "name": "Seoul Kitchen",
-                "description": "Authentic Korean BBQ and traditional dishes"
-            },
-            {
-                "name": "Vietnam House",
-                "description": "Fresh Vietnamese cuisine with authentic flavors"
-            },
-            {
-                "name": "Maharaja Kitchen",
-                "description": "Royal Rajasthani dining experience with desert ambiance"
-            },
-            {
-                "name": "Dim Sum Dynasty",
-                "description": "Specializing in handcrafted dim sum and Cantonese cuisine"
-            },
+        if db.query(Restaurant.restaurant_id).first() is not None:
+            logger.info("Database already contains data, skipping seeding.")
+            return
+
+        db.execute(insert(Restaurant), [
             {
-                "name": "BBQ Nation",
-                "description": "Interactive BBQ dining experience"
+                "restaurant_name": data["name"],
+                "restaurant_description": data["description"],
+                "total_tables": random.randint(10, 20),
+                "booked_tables": 0
             }
-        ]
-
-        restaurants = []
-        for data in restaurant_data:
-            restaurant = Restaurant(
-                restaurant_name=data["name"],
-                restaurant_description=data["description"],
-                total_tables=random.randint(10, 20),
-                booked_tables=0
-            )
-            db.add(restaurant)
-            restaurants.append(restaurant)
-        
-        db.commit()
-        
+            for data in restaurant_data
+        ])
+
         # Create a single user
         user = User(
             name="Aditya Bhattad",
             email="aditya.bhattad@example.com",
-            password=get_password_hash("password123") ,
+            password=get_password_hash(DEFAULT_PASSWORD),
             ai_preferences="I prefer vegetarian options."
         )
         db.add(user)
         db.commit()
         
-        print(f"Created user: {user.name} with ID: {user.user_id}")
-        print("Seed data created successfully!")
+        logger.info("Created user with ID: %s", user.user_id)
+        logger.info("Seed data created successfully!")
 
     except Exception as e:
         db.rollback()
-        print(f"Error seeding data: {str(e)}")
+        logger.exception("Error seeding data: %s", e)
+    finally:
+        db.close()
+
+
+# Synthetic load data generation
+RESERVATION_COLUMNS = (
+    "user_id", "restaurant_id", "reservation_date", "reservation_time",
+    "number_of_guests", "status", "reservation_code"
+)
+TIME_SLOTS = [time(hour, minute) for hour in range(9, 23) for minute in (0, 30)]
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _copy_rows(db, table, columns, rows):
+    """Stream rows into a PostgreSQL table with COPY ... FROM STDIN."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def _write_rows(db, model, columns, rows, batch_size, use_copy):
+    written = 0
+    for chunk in _chunks(rows, batch_size):
+        if use_copy:
+            _copy_rows(db, model.__tablename__, columns, chunk)
+        else:
+            db.execute(insert(model), [dict(zip(columns, row)) for row in chunk])
+        db.commit()
+        written += len(chunk)
+    return written
+
+
+def generate_load_data(
+    restaurants: int = 100,
+    users: int = 1000,
+    reservations: int = 10000,
+    seed: int = 42,
+    days: int = 30,
+    start_date: date = None,
+    batch_size: int = 10000,
+    use_copy: bool = None
+):
+    """
+    Append synthetic restaurants, users and reservations to the database.
+    The same seed and start date always produce the same rows. All users share
+    one precomputed password hash, and rows are written in batches with
+    multi-row INSERTs (or COPY on PostgreSQL). When no restaurants or users are
+    requested, reservations are spread over the existing ones.
+    """
+    rng = random.Random(seed)
+    start_date = start_date or date.today()
+    db = SessionLocal()
+    try:
+        if use_copy is None:
+            use_copy = db.get_bind().dialect.name == "postgresql"
+
+        restaurant_offset = db.query(func.coalesce(func.max(Restaurant.restaurant_id), 0)).scalar()
+        user_offset = db.query(func.coalesce(func.max(User.user_id), 0)).scalar()
+        # New reservations get IDs above this, so their sequence codes are unused
+        reservation_offset = db.query(func.coalesce(func.max(Reservation.reservation_id), 0)).scalar()
+
+        started = timer.perf_counter()
+        def restaurant_rows():
+            for n in range(1, restaurants + 1):
+                base = rng.choice(restaurant_data)
+                yield (f"{base['name']} #{restaurant_offset + n}", base["description"], rng.randint(10, 40), 0)
+
+        _write_rows(db, Restaurant, ("restaurant_name", "restaurant_description", "total_tables", "booked_tables"), restaurant_rows(), batch_size, use_copy)
+
+        password_hash = get_password_hash(DEFAULT_PASSWORD)
+        _write_rows(db, User, ("name", "email", "password", "ai_preferences"), (
+            (
+                f"Load User {user_offset + n}",
+                f"user{user_offset + n}.seed{seed}@loadtest.example.com",
+                password_hash,
+                None
+            )
+            for n in range(1, users + 1)
+        ), batch_size, use_copy)
+
+        # Reservations go to the rows generated above, or to existing rows when none were requested
+        restaurant_query = db.query(Restaurant.restaurant_id).order_by(Restaurant.restaurant_id)
+        if restaurants:
+            restaurant_query = restaurant_query.filter(Restaurant.restaurant_id > restaurant_offset)
+        user_query = db.query(User.user_id).order_by(User.user_id)
+        if users:
+            user_query = user_query.filter(User.user_id > user_offset)
+        restaurant_ids = [restaurant_id for (restaurant_id,) in restaurant_query]
+        user_ids = [user_id for (user_id,) in user_query]
+        if reservations and (not restaurant_ids or not user_ids):
+            raise ValueError("At least one restaurant and one user are needed to generate reservations")
+
+        # COPY writes enum labels directly, INSERT goes through the ORM enum type
+        confirmed = ReservationStatus.CONFIRMED.name if use_copy else ReservationStatus.CONFIRMED
+        cancelled = ReservationStatus.CANCELLED.name if use_copy else ReservationStatus.CANCELLED
+        _write_rows(db, Reservation, RESERVATION_COLUMNS, (
+            (
+                rng.choice(user_ids),
+                rng.choice(restaurant_ids),
+                start_date + timedelta(days=rng.randrange(days)),
+                rng.choice(TIME_SLOTS),
+                rng.randint(1, 8),
+                cancelled if rng.random() < 0.1 else confirmed,
+                sequence_reservation_code(reservation_offset + n)
+            )
+            for n in range(1, reservations + 1)
+        ), batch_size, use_copy)
+
+        elapsed = timer.perf_counter() - started
+        logger.info("Generated %d restaurants, %d users and %d reservations in %.2fs", restaurants, users, reservations, elapsed)
+    except Exception:
+        db.rollback()
+        raise
     finally:
         db.close()
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Seed the FoodieSpot database or generate synthetic load data.")
+    parser.add_argument("--restaurants", type=int, default=0, help="Number of synthetic restaurants to generate")
+    parser.add_argument("--users", type=int, default=0, help="Number of synthetic users to generate")
+    parser.add_argument("--reservations", type=int, default=0, help="Number of synthetic reservations to generate")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducible data")
+    parser.add_argument("--days", type=int, default=30, help="Spread reservations over this many days")
+    parser.add_argument("--start-date", type=date.fromisoformat, default=None, help="First reservation date (YYYY-MM-DD), defaults to today")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows written per batch")
+    parser.add_argument("--no-copy", action="store_true", help="Use multi-row INSERT even on PostgreSQL")
+    args = parser.parse_args()
+
+    setup_logging(settings.LOG_LEVEL, json_format=settings.LOG_JSON)
+
+    if not (args.restaurants or args.users or args.reservations):
+        seed_data()
+        return
+
+    generate_load_data(
+        restaurants=args.restaurants,
+        users=args.users,
+        reservations=args.reservations,
+        seed=args.seed,
+        days=args.days,
+        start_date=args.start_date,
+        batch_size=args.batch_size,
+        use_copy=False if args.no_copy else None
+    )
+
+
 if __name__ == "__main__":
-    seed_data()
+    main()
@@ -0,0 +1,114 @@
+"""
+Nearest-available-slot search.
+
+Given one or more restaurants, a preferred date and time and a party size,
+finds the k bookable (restaurant, date, time) options closest to the preferred
+moment. The search is best-first over one heap holding two kinds of nodes:
+restaurant-days not evaluated yet, keyed by a lower bound on the distance of
+any of their slots, and bookable slots, keyed by their exact distance. A slot
+popped from the heap is never farther than anything still unexplored, so
+results come out in order, and a day is only evaluated (through the occupancy
+index or the allocation index, cached between searches) once it could still hold
+one of the k nearest options. `max_day_loads` bounds the cost of a query.
+"""
+import heapq
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .allocation import allocation_index
+from .occupancy import occupancy_index
+
+# Bookable start times: every 30 minutes from 9 AM to 10:30 PM
+SERVICE_SLOTS = [time(hour, minute) for hour in range(9, 23) for minute in (0, 30)]
+
+# Heap node kinds; at equal distance found slots come out before unexplored days
+_SLOT, _DAY = 0, 1
+
+
+def day_availability(db: Session, restaurant: models.Restaurant, day: date, party_size: Optional[int] = None) -> Dict[time, int]:
+    """
+    Tables free for the whole stay of a party of `party_size`, per service slot.
+    """
+    availability = {}
+    for slot in SERVICE_SLOTS:
+        options = allocation_index.bookable_options(db, restaurant, day, slot, party_size)
+        if options is None:
+            options = occupancy_index.available_tables(db, restaurant, day, slot, party_size)
+        availability[slot] = options
+    return availability
+
+
+def _minutes_between(first: datetime, second: datetime) -> int:
+    return int(abs((first - second).total_seconds()) // 60)
+
+
+def _day_bound(day: date, preferred: datetime) -> int:
+    """
+    Lower bound on the distance between `preferred` and any slot of `day`.
+    """
+    opening = datetime.combine(day, SERVICE_SLOTS[0])
+    last_seating = datetime.combine(day, SERVICE_SLOTS[-1])
+    if opening <= preferred <= last_seating:
+        return 0
+    return min(_minutes_between(opening, preferred), _minutes_between(last_seating, preferred))
+
+
+def find_nearest_slots(
+    db: Session,
+    restaurants: List[models.Restaurant],
+    preferred: datetime,
+    party_size: int,
+    limit: int = 5,
+    max_days: int = 7,
+    max_day_loads: int = 30,
+    now: Optional[datetime] = None
+) -> List[schemas.SlotOption]:
+    """
+    The `limit` bookable options nearest to `preferred`, at most `max_days` days away
+    and not in the past. Ties go to the restaurant listed first. If `max_day_loads`
+    days have been evaluated the best options found so far are returned.
+    """
+    now = now or datetime.now()
+    first_day = max(preferred.date() - timedelta(days=max_days), now.date())
+    last_day = preferred.date() + timedelta(days=max_days)
+    if first_day > last_day:
+        return []
+    start_day = min(max(preferred.date(), first_day), last_day)
+
+    heap = []
+    seen = set()
+    for rank in range(len(restaurants)):
+        heapq.heappush(heap, (_day_bound(start_day, preferred), _DAY, rank, start_day, None))
+        seen.add((rank, start_day))
+
+    results = []
+    day_loads = 0
+    while heap and len(results) < limit:
+        distance, kind, rank, value, tables = heapq.heappop(heap)
+        restaurant = restaurants[rank]
+        if kind == _SLOT:
+            results.append(schemas.SlotOption(
+                restaurant_id=restaurant.restaurant_id,
+                restaurant_name=restaurant.restaurant_name,
+                date=value.date().isoformat(),
+                time=value.strftime("%H:%M"),
+                available_tables=tables,
+                minutes_from_requested=int((value - preferred).total_seconds() // 60)
+            ))
+            continue
+        # Past the budget only slots that were already found are returned
+        if day_loads >= max_day_loads:
+            continue
+        day_loads += 1
+        for slot, available in day_availability(db, restaurant, value, party_size).items():
+            when = datetime.combine(value, slot)
+            if available > 0 and when >= now:
+                heapq.heappush(heap, (_minutes_between(when, preferred), _SLOT, rank, when, available))
+        for neighbour in (value - timedelta(days=1), value + timedelta(days=1)):
+            if first_day <= neighbour <= last_day and (rank, neighbour) not in seen:
+                seen.add((rank, neighbour))
+                heapq.heappush(heap, (_day_bound(neighbour, preferred), _DAY, rank, neighbour, None))
+    return results
@@ -0,0 +1,263 @@
+"""
+Background jobs for side effects that should not hold up a request, such as
+booking confirmations.
+
+Jobs are rows in `background_jobs`. `enqueue` adds the row to the caller's
+session, so it is committed (or rolled back) together with the change that
+caused it, and wakes the worker pool once that commit happens. Workers claim
+due jobs with a conditional UPDATE, so several API processes can share the
+table. Failed jobs are retried with exponential backoff and moved to the dead
+letter state (`Dead`) after `max_attempts`.
+"""
+import json
+import logging
+import threading
+import traceback
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from . import allocation, models
+from .config import settings
+from .database import SessionLocal
+from .availability_feed import availability_feed
+
+logger = logging.getLogger(__name__)
+
+# name -> (handler, max attempts)
+TASKS: Dict[str, tuple] = {}
+
+# A job still Running after this long belongs to a worker that died
+LEASE_SECONDS = 300
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def task(name: str, max_attempts: int = 5):
+    """
+    Registers a handler. It is called as handler(db, **payload) in its own session
+    and must be safe to run more than once.
+    """
+    def register(handler: Callable[..., Any]):
+        TASKS[name] = (handler, max_attempts)
+        return handler
+    return register
+
+
+def enqueue(db: Session, name: str, **payload) -> models.BackgroundJob:
+    """
+    Queues a job as part of the caller's transaction; it runs after the caller commits.
+    """
+    if name not in TASKS:
+        raise ValueError(f"Unknown task: {name}")
+    now = _utcnow()
+    job = models.BackgroundJob(
+        name=name,
+        payload=json.dumps(payload),
+        status=models.JobStatus.PENDING,
+        attempts=0,
+        run_after=now,
+        created_at=now
+    )
+    db.add(job)
+    event.listen(db, "after_commit", lambda session: worker_pool.notify(), once=True)
+    return job
+
+
+def retry_dead_job(db: Session, job_id: int) -> Optional[models.BackgroundJob]:
+    job = db.get(models.BackgroundJob, job_id)
+    if job is None or job.status != models.JobStatus.DEAD:
+        return None
+    job.status = models.JobStatus.PENDING
+    job.attempts = 0
+    job.run_after = _utcnow()
+    db.commit()
+    db.refresh(job)
+    worker_pool.notify()
+    return job
+
+
+def get_dead_jobs(db: Session, skip: int = 0, limit: int = 100) -> List[models.BackgroundJob]:
+    return (
+        db.query(models.BackgroundJob)
+        .filter(models.BackgroundJob.status == models.JobStatus.DEAD)
+        .order_by(models.BackgroundJob.job_id)
+        .offset(skip).limit(limit).all()
+    )
+
+
+class WorkerPool:
+    """
+    Worker threads that run due jobs. Idle workers sleep until notified of a new
+    job or until `poll_interval` passes, which also picks up retries and jobs
+    queued by other processes.
+    """
+    def __init__(self, workers: int = 2, poll_interval: float = 5.0, retry_base_seconds: float = 2.0):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.retry_base_seconds = retry_base_seconds
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stopping.clear()
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"task-worker-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Started %d background task workers", self.workers)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                ran = self.run_next()
+            except Exception:
+                logger.exception("Error in WorkerPool._run()")
+                ran = False
+            if not ran:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _claim(self, db: Session) -> Optional[models.BackgroundJob]:
+        now = _utcnow()
+        Job = models.BackgroundJob
+        candidates = (
+            db.query(Job.job_id, Job.status)
+            .filter(
+                ((Job.status == models.JobStatus.PENDING) & (Job.run_after <= now))
+                | ((Job.status == models.JobStatus.RUNNING) & (Job.locked_at < now - timedelta(seconds=LEASE_SECONDS)))
+            )
+            .order_by(Job.run_after)
+            .limit(self.workers * 2)
+            .all()
+        )
+        for job_id, status in candidates:
+            # Only one worker (in any process) wins the UPDATE for a given job
+            claimed = db.execute(
+                update(Job)
+                .where(Job.job_id == job_id, Job.status == status)
+                .values(status=models.JobStatus.RUNNING, locked_at=now, attempts=Job.attempts + 1)
+            ).rowcount
+            db.commit()
+            if claimed:
+                return db.get(Job, job_id)
+        return None
+
+    def run_next(self) -> bool:
+        """
+        Runs one due job, if there is one. Returns whether a job was run.
+        """
+        db = SessionLocal()
+        try:
+            job = self._claim(db)
+            if job is None:
+                return False
+            handler, max_attempts = TASKS.get(job.name, (None, 1))
+            try:
+                if handler is None:
+                    raise LookupError(f"No handler registered for task {job.name}")
+                handler(db, **json.loads(job.payload))
+                db.commit()
+                job.status = models.JobStatus.DONE
+                job.last_error = None
+            except Exception:
+                db.rollback()
+                job.last_error = traceback.format_exc(limit=5)
+                if job.attempts >= max_attempts:
+                    job.status = models.JobStatus.DEAD
+                    logger.error("Task %s (job %d) failed %d times, moved to dead letter", job.name, job.job_id, job.attempts, extra={"data": {"job_id": job.job_id, "task": job.name}})
+                else:
+                    job.status = models.JobStatus.PENDING
+                    job.run_after = _utcnow() + timedelta(seconds=self.retry_base_seconds * 2 ** (job.attempts - 1))
+                    logger.warning("Task %s (job %d) failed, retry %d of %d scheduled", job.name, job.job_id, job.attempts, max_attempts - 1)
+            job.locked_at = None
+            db.commit()
+            return True
+        finally:
+            db.close()
+
+
+worker_pool = WorkerPool(
+    workers=settings.TASK_WORKERS,
+    poll_interval=settings.TASK_POLL_INTERVAL_SECONDS,
+    retry_base_seconds=settings.TASK_RETRY_BASE_SECONDS
+)
+
+
+# Booking side effects
+@task("reservation_confirmation")
+def send_reservation_confirmation(db: Session, reservation_id: int):
+    """
+    Confirmation message for a new booking. There is no mail or SMS integration
+    yet, so this records the message that would be sent.
+    """
+    reservation = db.get(models.Reservation, reservation_id)
+    if reservation is None or reservation.status != models.ReservationStatus.CONFIRMED:
+        return
+    logger.info(
+        "Reservation %s confirmed for %s",
+        reservation.reservation_code, reservation.user.email,
+        extra={"data": {
+            "reservation_id": reservation.reservation_id,
+            "restaurant": reservation.restaurant.restaurant_name,
+            "date": reservation.reservation_date.isoformat(),
+            "time": reservation.reservation_time.strftime("%H:%M"),
+            "guests": reservation.number_of_guests,
+        }}
+    )
+
+
+@task("booking_analytics")
+def record_booking_analytics(db: Session, reservation_id: int, channel: str):
+    reservation = db.get(models.Reservation, reservation_id)
+    if reservation is None:
+        return
+    logger.info(
+        "booking_created",
+        extra={"data": {
+            "event": "booking_created",
+            "channel": channel,
+            "reservation_id": reservation.reservation_id,
+            "restaurant_id": reservation.restaurant_id,
+            "user_id": reservation.user_id,
+            "guests": reservation.number_of_guests,
+            "lead_days": (reservation.reservation_date - _utcnow().date()).days,
+        }}
+    )
+
+
+@task("reoptimize_tables")
+def reoptimize_tables(db: Session, restaurant_id: int, reservation_date: str, start: int = 0, end: int = allocation.MINUTES_PER_DAY):
+    """
+    Moves bookings onto better fitting tables after cancellations freed some.
+    """
+    restaurant = db.get(models.Restaurant, restaurant_id)
+    if restaurant is None:
+        return
+    moves = allocation.reoptimize_day(db, restaurant, date.fromisoformat(reservation_date), start, end)
+    if moves:
+        # Moves can change which slots still have a table for each party size
+        availability_feed.publish(restaurant_id, date.fromisoformat(reservation_date))
+        logger.info("Moved %d reservations to better fitting tables", len(moves), extra={"data": {"restaurant_id": restaurant_id, "date": reservation_date, "moves": {str(k): list(v) for k, v in moves.items()}}})
+
+
+def enqueue_booking_side_effects(db: Session, reservation: models.Reservation, channel: str) -> None:
+    enqueue(db, "reservation_confirmation", reservation_id=reservation.reservation_id)
+    enqueue(db, "booking_analytics", reservation_id=reservation.reservation_id, channel=channel)
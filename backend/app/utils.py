@@ -1,6 +1,63 @@
 import random
 import string
+from typing import List
+
+from sqlalchemy import bindparam, text
+
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+# Attempts at drawing codes that are not taken before giving up
+MAX_CODE_ATTEMPTS = 10
 
 def generate_reservation_code(length=6):
     """Generate a random alphanumeric code for reservations"""
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
\ No newline at end of file
+    return ''.join(random.choices(CODE_ALPHABET, k=length))
+
+def unused_reservation_codes(connection, count: int) -> List[str]:
+    """
+    `count` distinct random codes that no reservation, live or archived, uses yet, checked
+    with one query per attempt. The unique index on reservations.reservation_code backs this up.
+    """
+    codes = set()
+    query = text(
+        "SELECT reservation_code FROM reservations WHERE reservation_code IN :codes "
+        "UNION ALL SELECT reservation_code FROM reservations_archive WHERE reservation_code IN :codes"
+    ).bindparams(bindparam("codes", expanding=True))
+    for _ in range(MAX_CODE_ATTEMPTS):
+        candidates = {generate_reservation_code() for _ in range(count - len(codes))} - codes
+        taken = set(connection.execute(query, {"codes": list(candidates)}).scalars())
+        codes |= candidates - taken
+        if len(codes) >= count:
+            return list(codes)
+    raise RuntimeError("Could not generate unique reservation codes")
+
+def unique_reservation_code(context) -> str:
+    """Column default: a random code that is not taken yet"""
+    return unused_reservation_codes(context.connection, 1)[0]
+
+def _to_code(value: int, length: int) -> str:
+    code = []
+    for _ in range(length):
+        value, digit = divmod(value, len(CODE_ALPHABET))
+        code.append(CODE_ALPHABET[digit])
+    return ''.join(code)
+
+def _reverse_digits(value: int, length: int) -> int:
+    reversed_value = 0
+    for _ in range(length):
+        value, digit = divmod(value, len(CODE_ALPHABET))
+        reversed_value = reversed_value * len(CODE_ALPHABET) + digit
+    return reversed_value
+
+def sequence_reservation_code(number: int, length: int = 7) -> str:
+    """
+    Collision-free code for the `number`-th generated row: a fixed permutation of
+    0 .. 36**length - 1 written in base 36, so consecutive numbers look unrelated.
+    Seven characters never clash with the six-character random codes.
+    """
+    space = len(CODE_ALPHABET) ** length
+    # Each step is a bijection on the code space (the multiplier is coprime to 36):
+    # scramble, reverse the digits so the low ones affect the high ones, scramble again
+    value = (number * 2_654_435_761 + 982_451_653) % space
+    value = _reverse_digits(value, length)
+    value = (value * 2_654_435_761 + 982_451_653) % space
+    return _to_code(value, length)
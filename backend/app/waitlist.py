@@ -0,0 +1,193 @@
+"""
+Waitlist for fully booked slots.
+
+A party that cannot be seated joins the waitlist of its slot. Whenever
+capacity frees up (a cancellation, or a booking moved away from a slot) the
+write path calls `promote_waiters` for the freed window before committing, so
+waiting parties are booked in the same transaction that freed the tables.
+Every slot has its own queue, earliest request first; a party that does not
+fit is skipped so a smaller party further back can take a table the party at
+the head cannot use. Promoted parties get the usual booking confirmation job.
+Entries for slots that have already begun are expired rather than promoted.
+
+Entries live in `waitlist_entries` rather than in process memory, so every API
+process sees the same queues. The (restaurant, date, status, time, entry_id)
+index is the set of per-slot queues: it serves both the promotion scan of the
+freed slots and the position count of an entry within its slot.
+"""
+import heapq
+from collections import defaultdict, deque
+from datetime import date, datetime, time, timezone
+from typing import Deque, Dict, List, Optional
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from . import allocation, models, tasks
+from .config import settings
+from .occupancy import MINUTES_PER_DAY, dining_duration, load_day_occupancy, lock_restaurant, minutes
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def add_entry(db: Session, restaurant: models.Restaurant, user_id: int, reservation_date: date, reservation_time, guests: int) -> models.WaitlistEntry:
+    """
+    Queues a party; the caller commits.
+    """
+    entry = models.WaitlistEntry(
+        restaurant_id=restaurant.restaurant_id,
+        user_id=user_id,
+        reservation_date=reservation_date,
+        reservation_time=reservation_time,
+        number_of_guests=guests,
+        status=models.WaitlistStatus.WAITING,
+        created_at=_utcnow()
+    )
+    db.add(entry)
+    db.flush()
+    return entry
+
+
+def position(db: Session, entry: models.WaitlistEntry) -> Optional[int]:
+    """
+    1-based place of a waiting entry in its slot's queue, None once it has left the queue.
+    Parties are promoted in this order; one ahead is only passed over if it does not fit.
+    """
+    if entry.status != models.WaitlistStatus.WAITING:
+        return None
+    ahead = db.query(func.count(models.WaitlistEntry.entry_id)).filter(
+        models.WaitlistEntry.restaurant_id == entry.restaurant_id,
+        models.WaitlistEntry.reservation_date == entry.reservation_date,
+        models.WaitlistEntry.status == models.WaitlistStatus.WAITING,
+        models.WaitlistEntry.reservation_time == entry.reservation_time,
+        models.WaitlistEntry.entry_id < entry.entry_id
+    ).scalar()
+    return ahead + 1
+
+
+def _expire_past(db: Session, restaurant: models.Restaurant, now: datetime) -> None:
+    """
+    Marks waiting entries of the restaurant whose slot has already begun as expired.
+    """
+    db.query(models.WaitlistEntry).filter(
+        models.WaitlistEntry.restaurant_id == restaurant.restaurant_id,
+        models.WaitlistEntry.status == models.WaitlistStatus.WAITING,
+        or_(
+            models.WaitlistEntry.reservation_date < now.date(),
+            and_(
+                models.WaitlistEntry.reservation_date == now.date(),
+                models.WaitlistEntry.reservation_time <= now.time()
+            )
+        )
+    ).update({models.WaitlistEntry.status: models.WaitlistStatus.EXPIRED}, synchronize_session=False)
+
+
+def _minutes_to_time(value: int) -> time:
+    return time(value // 60, value % 60)
+
+
+def promote_waiters(
+    db: Session,
+    restaurant: models.Restaurant,
+    day: date,
+    start: int = 0,
+    end: int = MINUTES_PER_DAY,
+    now: Optional[datetime] = None
+) -> List[models.WaitlistEntry]:
+    """
+    Books waiting parties of the restaurant's day that now fit, inside the caller's
+    transaction. Only slots whose stay overlaps the freed window [start, end) (minutes)
+    are considered. The caller commits and, if anything was promoted, invalidates the day
+    in the occupancy and allocation indexes.
+
+    Each slot is its own queue in request (entry_id) order, read from the
+    ix_waitlist_slot index. A heap keyed by the request of each queue's head pops
+    the earliest waiting request across the affected slots in O(log slots). A head
+    that does not fit is passed over for the next party of its slot. A slot with no
+    free table left for even the shortest stay is dropped, so a full slot costs nothing
+    further. Slots that have already begun are never promoted into; their entries
+    are expired.
+    """
+    now = now or datetime.now()
+    # Before reading the queue, so two promotions never book the same entry
+    lock_restaurant(db, restaurant.restaurant_id)
+    _expire_past(db, restaurant, now)
+    if day < now.date():
+        return []
+
+    shortest = dining_duration(restaurant.dining_duration_minutes, None)
+    longest = max(
+        [dining_duration(restaurant.dining_duration_minutes, size) for size in settings.DINING_DURATION_PARTY_EXTRA_MINUTES],
+        default=shortest
+    )
+    query = db.query(models.WaitlistEntry).filter(
+        models.WaitlistEntry.restaurant_id == restaurant.restaurant_id,
+        models.WaitlistEntry.reservation_date == day,
+        models.WaitlistEntry.status == models.WaitlistStatus.WAITING
+    )
+    # Slots whose longest possible stay reaches into the window
+    if start - longest >= 0:
+        query = query.filter(models.WaitlistEntry.reservation_time > _minutes_to_time(start - longest))
+    if end < MINUTES_PER_DAY:
+        query = query.filter(models.WaitlistEntry.reservation_time < _minutes_to_time(end))
+    queues: Dict[time, Deque[models.WaitlistEntry]] = defaultdict(deque)
+    for entry in query.order_by(models.WaitlistEntry.reservation_time, models.WaitlistEntry.entry_id):
+        queues[entry.reservation_time].append(entry)
+    if not queues:
+        return []
+
+    # The caller's pending change (e.g. the cancellation) must be visible to the capacity queries
+    db.flush()
+    day_allocation = allocation.load_day_allocation(db, restaurant, day)
+    occupancy = None
+    if day_allocation is None:
+        key = (restaurant.restaurant_id, day)
+        occupancy = load_day_occupancy(db, [key])[key]
+
+    def slot_full(slot_start: int) -> bool:
+        if day_allocation is not None:
+            return not day_allocation.free_tables(slot_start, slot_start + shortest)
+        return occupancy.max_occupancy(slot_start, slot_start + shortest) >= (restaurant.total_tables or 0)
+
+    heads = [(queue[0].entry_id, slot) for slot, queue in queues.items()]
+    heapq.heapify(heads)
+    promoted = []
+    while heads:
+        _, slot = heapq.heappop(heads)
+        queue = queues[slot]
+        entry = queue.popleft()
+        slot_start = minutes(slot)
+        slot_end = slot_start + dining_duration(restaurant.dining_duration_minutes, entry.number_of_guests)
+        fits = slot_end > start and slot_start < end
+        table_ids = None
+        if fits and day_allocation is not None:
+            table_ids = day_allocation.find(entry.number_of_guests, slot_start, slot_end)
+            fits = table_ids is not None
+        elif fits:
+            fits = occupancy.max_occupancy(slot_start, slot_end) < (restaurant.total_tables or 0)
+
+        if fits:
+            reservation = models.Reservation(
+                restaurant_id=restaurant.restaurant_id,
+                user_id=entry.user_id,
+                reservation_date=day,
+                reservation_time=entry.reservation_time,
+                number_of_guests=entry.number_of_guests,
+                status=models.ReservationStatus.CONFIRMED
+            )
+            db.add(reservation)
+            db.flush()
+            if table_ids:
+                allocation.save_assignment(db, reservation.reservation_id, table_ids)
+                day_allocation.assign(reservation.reservation_id, entry.number_of_guests, slot_start, slot_end, table_ids)
+            else:
+                occupancy.add(slot_start, slot_end)
+            entry.status = models.WaitlistStatus.PROMOTED
+            entry.reservation_id = reservation.reservation_id
+            tasks.enqueue_booking_side_effects(db, reservation, channel="waitlist")
+            promoted.append(entry)
+        if queue and not slot_full(slot_start):
+            heapq.heappush(heads, (queue[0].entry_id, slot))
+    return promoted
@@ -0,0 +1,183 @@
+"""
+Drive scripted multi-turn conversations through the agents service's /chat
+endpoint in-process, with the LLM providers, Pinecone and the backend API
+replaced by the stand-ins from benchmarks.fakes.
+
+    python -m benchmarks.bench_agents --sessions 50 --concurrency 10 --llm-latency-ms 300
+
+Turns refused by admission control (429) are counted under `chat_rejected` and
+end their conversation; `chat_turn_*` latencies cover admitted turns only.
+Overload the service and compare with --no-admission-control to see the effect:
+
+    python -m benchmarks.bench_agents --sessions 400 --concurrency 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from typing import Dict, List
+
+import httpx
+
+from .common import AGENTS_ENV, ROOT_DIR, LatencyRecorder, build_report, use_service, write_report
+from .fakes import FakeLLMResponder, FakePinecone, LatencyModel, fake_backend_transport
+
+FIND_SCRIPT = [
+    "Hi there",
+    "I'm looking for North Indian food in Indiranagar",
+    "Do they have vegetarian options?",
+]
+
+
+def booking_script(restaurant_name: str, rng: random.Random) -> List[str]:
+    return [
+        f"I want to book a table at {restaurant_name}",
+        f"2030-01-{rng.randint(1, 28):02d}",
+        f"{rng.randint(12, 21)}:{rng.choice(['00', '30'])}",
+        f"{rng.randint(1, 8)} people",
+        "Yes, please confirm",
+    ]
+
+
+def stage_breakdown() -> Dict[str, Dict[str, float]]:
+    """
+    Summarise the per-stage histograms recorded by app.core.utils.metrics.
+    Percentiles are estimated from the histogram buckets (upper bound of the bucket).
+    """
+    from app.core.utils.metrics import STAGE_LATENCY
+
+    stages: Dict[str, Dict] = {}
+    for metric in STAGE_LATENCY.collect():
+        for sample in metric.samples:
+            stage = stages.setdefault(sample.labels["stage"], {"buckets": []})
+            if sample.name.endswith("_count"):
+                stage["count"] = int(sample.value)
+            elif sample.name.endswith("_sum"):
+                stage["sum"] = sample.value
+            elif sample.name.endswith("_bucket"):
+                stage["buckets"].append((float(sample.labels["le"]), sample.value))
+
+    summary = {}
+    for name, stage in stages.items():
+        count = stage.get("count", 0)
+        if not count:
+            continue
+
+        def estimate(pct):
+            target = pct / 100 * count
+            for upper_bound, cumulative in stage["buckets"]:
+                if cumulative >= target:
+                    return upper_bound
+            return float("inf")
+
+        summary[name] = {
+            "count": count,
+            "mean_ms": round(stage["sum"] / count * 1000, 2),
+            "p50_le_ms": round(estimate(50) * 1000, 2),
+            "p95_le_ms": round(estimate(95) * 1000, 2),
+            "p99_le_ms": round(estimate(99) * 1000, 2),
+        }
+    return summary
+
+
+async def run_conversation(client: httpx.AsyncClient, name: str, script: List[str], recorder: LatencyRecorder, user_id: int):
+    session_id = str(uuid.uuid4())
+    conversation_started = time.perf_counter()
+    for message in script:
+        started = time.perf_counter()
+        response = await client.post("/chat", json={"message": message, "session_id": session_id, "user_id": user_id})
+        if response.status_code == 429:
+            recorder.record("chat_rejected", time.perf_counter() - started)
+            return
+        recorder.record(f"chat_turn_{name}", time.perf_counter() - started, ok=response.status_code == 200)
+    recorder.record(f"conversation_{name}", time.perf_counter() - conversation_started)
+
+
+async def drive(app, args, restaurant_names: List[str]) -> LatencyRecorder:
+    rng = random.Random(args.seed)
+    scripts = []
+    for n in range(args.sessions):
+        if rng.random() < args.booking_ratio:
+            scripts.append(("booking", booking_script(rng.choice(restaurant_names), rng)))
+        else:
+            scripts.append(("find", FIND_SCRIPT))
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    recorder = LatencyRecorder()
+
+    async def bounded(n, name, script):
+        async with semaphore:
+            await run_conversation(client, name, script, recorder, user_id=n + 1)
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://agents.benchmark", timeout=None) as client:
+            recorder.started = time.perf_counter()
+            await asyncio.gather(*(bounded(n, name, script) for n, (name, script) in enumerate(scripts)))
+            recorder.stop()
+    return recorder
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the agents /chat endpoint with mocked LLM, embedding, vector and backend services.")
+    parser.add_argument("--sessions", type=int, default=40, help="Number of scripted conversations")
+    parser.add_argument("--concurrency", type=int, default=8, help="Conversations in flight at once")
+    parser.add_argument("--booking-ratio", type=float, default=0.5, help="Fraction of conversations that book a table")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-providers", type=int, default=1, help="Number of stub LLM providers; more than one enables hedged requests")
+    parser.add_argument("--embed-latency-ms", type=float, default=40.0)
+    parser.add_argument("--vector-latency-ms", type=float, default=30.0)
+    parser.add_argument("--backend-latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-pct", type=float, default=20.0, help="Standard deviation of simulated latencies, as a percentage of the mean")
+    parser.add_argument("--no-admission-control", action="store_true", help="Admit every /chat turn and do not cap LLM calls per provider")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    use_service("agents", {**AGENTS_ENV, "CHAT_ADMISSION_ENABLED": str(not args.no_admission_control)})
+    from app.config import settings
+    from app.core import foodiespot_agent, vector_store
+    from app.core.utils.llm_client import LLMClient
+    from app.core.utils.llm_providers import StubProvider
+    from app.core.utils.llm_router import LLMRouter
+
+    with open(os.path.join(ROOT_DIR, "agents", "app", "core", "restaurants.json")) as f:
+        restaurants = json.load(f)
+    restaurant_names = [restaurant["name"] for restaurant in restaurants]
+
+    def latency(mean_ms, seed_offset):
+        return LatencyModel(mean_ms, mean_ms * args.jitter_pct / 100, seed=args.seed + seed_offset)
+
+    # Swap the external services before app.main builds the agent singletons
+    responder = FakeLLMResponder(restaurant_names)
+    stubs = [
+        StubProvider(responder, latency=latency(args.llm_latency_ms, 10 + n).sample, model=f"stub-{n}")
+        for n in range(args.llm_providers)
+    ]
+    router = LLMRouter(
+        {"default": stubs},
+        hedge=args.llm_providers > 1,
+        provider_max_concurrency=None if args.no_admission_control else settings.LLM_PROVIDER_MAX_CONCURRENCY
+    )
+    foodiespot_agent.LLMClient = lambda: LLMClient(router=router)
+    vector_store.pc = FakePinecone(restaurants, latency(args.embed_latency_ms, 2), latency(args.vector_latency_ms, 3))
+    vector_store.index = vector_store.pc.Index(vector_store.index_name)
+
+    from app import main as agents_main
+    transport = fake_backend_transport(latency(args.backend_latency_ms, 4), restaurants)
+    for api_client in (agents_main.api_client, agents_main.agent.api_client):
+        api_client.client = httpx.AsyncClient(
+            base_url=api_client.base_url,
+            transport=transport,
+            headers=api_client._get_default_headers()
+        )
+
+    recorder = asyncio.run(drive(agents_main.app, args, restaurant_names))
+    report = build_report("agents", vars(args), recorder, stages=stage_breakdown())
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
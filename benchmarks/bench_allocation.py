@@ -0,0 +1,142 @@
+"""
+Benchmark the table allocation engine on synthetic peak-night workloads: per
+booking allocation latency, acceptance and seat utilization, compared against
+a first-fit baseline (first free table that is large enough, no combining).
+Cancellations are followed by the re-optimization pass and a late wave of
+walk-in sized requests that can use the recovered capacity.
+
+    python -m benchmarks.bench_allocation --nights 200 --requests-per-night 120
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from .common import BACKEND_ENV, LatencyRecorder, build_report, use_service, write_report
+
+# (seats, count, combine group prefix or None); groups hold four tables each
+LAYOUT = [(2, 8, None), (4, 12, "four"), (6, 4, None), (8, 2, None)]
+# Party size distribution of a busy evening
+PARTY_SIZES = [(1, 4), (2, 40), (3, 10), (4, 22), (5, 6), (6, 7), (7, 3), (8, 3), (10, 3), (12, 2)]
+SERVICE_START, SERVICE_END = 17 * 60 + 30, 21 * 60 + 30
+
+
+def build_tables(table_cls) -> List:
+    specs = [
+        (seats, f"{group}-{number // 4}" if group else None)
+        for seats, count, group in LAYOUT
+        for number in range(count)
+    ]
+    # Table numbers follow the floor plan, not the size
+    random.Random(0).shuffle(specs)
+    return [table_cls(table_id, seats, group) for table_id, (seats, group) in enumerate(specs, start=1)]
+
+
+def night_requests(rng: random.Random, count: int) -> List[Tuple[int, int]]:
+    sizes, weights = zip(*PARTY_SIZES)
+    return sorted(
+        (SERVICE_START + 15 * rng.randrange((SERVICE_END - SERVICE_START) // 15), rng.choices(sizes, weights)[0])
+        for _ in range(count)
+    )
+
+
+def first_fit(allocation, party_size: int, start: int, end: int):
+    for table in sorted(allocation.tables, key=lambda table: table.table_id):
+        if table.seats >= party_size and allocation.is_free(table.table_id, start, end):
+            return (table.table_id,)
+    return None
+
+
+def run_night(strategy: str, requests, cancel_ratio: float, late_requests, rng: random.Random, recorder: LatencyRecorder, totals: Dict) -> None:
+    from app.allocation import DayAllocation, Table
+    from app.occupancy import dining_duration
+
+    allocation = DayAllocation(build_tables(Table))
+    find = allocation.find if strategy == "best_fit" else (lambda party, start, end: first_fit(allocation, party, start, end))
+
+    def book(reservation_id: int, start: int, party_size: int) -> None:
+        end = start + dining_duration(None, party_size)
+        started = time.perf_counter()
+        table_ids = find(party_size, start, end)
+        if table_ids:
+            allocation.assign(reservation_id, party_size, start, end, table_ids)
+        recorder.record(f"{strategy}.allocate", time.perf_counter() - started)
+        totals["requested_guests"] += party_size
+        totals["accepted" if table_ids else "rejected"] += 1
+
+    for reservation_id, (start, party_size) in enumerate(requests):
+        book(reservation_id, start, party_size)
+
+    cancelled = rng.sample(sorted(allocation.bookings), int(len(allocation.bookings) * cancel_ratio))
+    for reservation_id in cancelled:
+        booking = allocation.release(reservation_id)
+        totals["cancelled"] += 1
+        if strategy == "best_fit":
+            started = time.perf_counter()
+            totals["moves"] += len(allocation.reoptimize(booking.start, booking.end))
+            recorder.record(f"{strategy}.reoptimize", time.perf_counter() - started)
+
+    for offset, (start, party_size) in enumerate(late_requests):
+        book(len(requests) + offset, start, party_size)
+
+    # Seat-minutes: how much of the held table time is actually used by guests
+    for booking in allocation.bookings.values():
+        duration = booking.end - booking.start
+        totals["guest_minutes"] += booking.party_size * duration
+        totals["held_seat_minutes"] += allocation.seats_of(booking.table_ids) * duration
+        totals["seated_guests"] += booking.party_size
+    totals["available_seat_minutes"] += allocation.total_seats * (SERVICE_END + 150 - SERVICE_START)
+
+
+def summarize(totals: Dict) -> Dict:
+    requests = totals["accepted"] + totals["rejected"]
+    return {
+        "requests": requests,
+        "acceptance_rate": round(totals["accepted"] / requests, 4) if requests else 0.0,
+        "seated_guests": totals["seated_guests"],
+        "guests_seated_ratio": round(totals["seated_guests"] / totals["requested_guests"], 4) if totals["requested_guests"] else 0.0,
+        # Guests per seat at the tables they hold
+        "seat_utilization": round(totals["guest_minutes"] / totals["held_seat_minutes"], 4) if totals["held_seat_minutes"] else 0.0,
+        # Share of all seat time over the evening that is filled by guests
+        "occupancy": round(totals["guest_minutes"] / totals["available_seat_minutes"], 4) if totals["available_seat_minutes"] else 0.0,
+        "cancelled": totals["cancelled"],
+        "reoptimization_moves": totals["moves"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the table allocation engine on synthetic peak nights.")
+    parser.add_argument("--nights", type=int, default=100, help="Independent restaurant-nights to simulate")
+    parser.add_argument("--requests-per-night", type=int, default=90, help="Booking requests in the main wave")
+    parser.add_argument("--cancel-ratio", type=float, default=0.1, help="Share of bookings cancelled after the main wave")
+    parser.add_argument("--late-requests", type=int, default=30, help="Booking requests after the cancellations")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The engine needs no database, but the backend settings require a URL
+        use_service("backend", {**BACKEND_ENV, "DATABASE_URL": f"sqlite:///{os.path.join(tmp_dir, 'unused.db')}"})
+        recorder = LatencyRecorder()
+        outcomes = {}
+        for strategy in ("first_fit", "best_fit"):
+            totals = dict.fromkeys((
+                "accepted", "rejected", "requested_guests", "seated_guests", "cancelled", "moves",
+                "guest_minutes", "held_seat_minutes", "available_seat_minutes"
+            ), 0)
+            # Same workload for both strategies
+            rng = random.Random(args.seed)
+            for _ in range(args.nights):
+                requests = night_requests(rng, args.requests_per_night)
+                late_requests = night_requests(rng, args.late_requests)
+                run_night(strategy, requests, args.cancel_ratio, late_requests, random.Random(rng.random()), recorder, totals)
+            outcomes[strategy] = summarize(totals)
+        recorder.stop()
+        report = build_report("allocation", vars(args), recorder, allocation=outcomes)
+        write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
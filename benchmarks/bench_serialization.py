@@ -0,0 +1,134 @@
+"""
+Benchmark JSON serialization of the reservation listing endpoints: FastAPI's
+response_model path (validate every row, dump, encode) against the fast path of
+app.serialization (compiled row serializers and orjson), as rows per second.
+
+Serialization alone is measured on rows already loaded from the database;
+the endpoints are then called in-process with FAST_JSON_RESPONSES off and on.
+Both paths must produce the same JSON.
+
+    python -m benchmarks.bench_serialization --rows 20000 --repeats 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import date
+from typing import Dict, List
+
+import httpx
+
+from .common import BACKEND_ENV, LatencyRecorder, build_report, use_service, write_report
+
+API_HEADERS = {"X-API-Key": BACKEND_ENV["BACKEND_API_KEY"]}
+
+
+def serialize_standard(field, rows) -> bytes:
+    from fastapi.responses import ORJSONResponse
+    from fastapi.routing import serialize_response
+
+    content = asyncio.run(serialize_response(field=field, response_content=rows))
+    return ORJSONResponse(content).body
+
+
+def measure(recorder: LatencyRecorder, operation: str, repeats: int, rows: int, run) -> Dict:
+    body = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        body = run()
+        recorder.record(operation, time.perf_counter() - started)
+    seconds = sorted(recorder.samples[operation])[len(recorder.samples[operation]) // 2]
+    return {"rows": rows, "rows_per_sec": round(rows / seconds) if seconds else 0, "body": body}
+
+
+async def call_endpoints(app, settings, recorder: LatencyRecorder, repeats: int, user_id: int, restaurant_id: int) -> Dict:
+    endpoints = {
+        "all_reservations": ("/reservations/", {}),
+        "restaurant_reservations": (f"/restaurants/{restaurant_id}/reservations/", {}),
+        "user_reservations": (f"/users/{user_id}/reservations", {}),
+    }
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://backend.benchmark", headers=API_HEADERS) as client:
+        for name, (path, params) in endpoints.items():
+            for mode, fast in (("standard", False), ("fast", True)):
+                settings.FAST_JSON_RESPONSES = fast
+                operation = f"{mode}.{name}"
+                body = None
+                for _ in range(repeats):
+                    started = time.perf_counter()
+                    response = await client.get(path, params=params)
+                    recorder.record(operation, time.perf_counter() - started, ok=response.status_code == 200)
+                    body = response.content
+                rows = len(json.loads(body))
+                median = sorted(recorder.samples[operation])[repeats // 2]
+                results[operation] = {"rows": rows, "rows_per_sec": round(rows / median) if median else 0, "body": body}
+            results[f"{name}.identical"] = json.loads(results[f"standard.{name}"]["body"]) == json.loads(results[f"fast.{name}"]["body"])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON serialization of reservation listings.")
+    parser.add_argument("--rows", type=int, default=20000, help="Synthetic reservations to generate")
+    parser.add_argument("--repeats", type=int, default=10, help="Runs per path and endpoint")
+    parser.add_argument("--start-date", default="2030-01-01", help="First reservation date (YYYY-MM-DD)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_url = f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}"
+        use_service("backend", {**BACKEND_ENV, "DATABASE_URL": database_url, "TASK_WORKERS": "0"})
+        from fastapi.utils import create_model_field
+        from sqlalchemy import func
+        from sqlalchemy.orm import joinedload
+        from app import models, schemas
+        from app.config import settings
+        from app.database import SessionLocal
+        from app.init_db import init_database
+        from app.main import app
+        from app.seed import generate_load_data
+        from app.serialization import dump_rows
+
+        init_database()
+        generate_load_data(restaurants=0, users=0, reservations=args.rows, seed=args.seed, start_date=date.fromisoformat(args.start_date))
+
+        recorder = LatencyRecorder()
+        results: Dict[str, Dict] = {}
+        db = SessionLocal()
+        try:
+            rows = db.query(models.Reservation).options(joinedload(models.Reservation.restaurant)).all()
+            # The busiest user and restaurant, so their listings are long too
+            user_id = db.query(models.Reservation.user_id).group_by(models.Reservation.user_id).order_by(func.count().desc()).limit(1).scalar()
+            restaurant_id = db.query(models.Reservation.restaurant_id).group_by(models.Reservation.restaurant_id).order_by(func.count().desc()).limit(1).scalar()
+            for schema in (schemas.Reservation, schemas.ReservationWithRestaurant):
+                field = create_model_field(name="response", type_=List[schema], mode="serialization")
+                results[f"standard.serialize_{schema.__name__}"] = measure(
+                    recorder, f"standard.serialize_{schema.__name__}", args.repeats, len(rows),
+                    lambda: serialize_standard(field, rows)
+                )
+                results[f"fast.serialize_{schema.__name__}"] = measure(
+                    recorder, f"fast.serialize_{schema.__name__}", args.repeats, len(rows),
+                    lambda: dump_rows(rows, schema)
+                )
+                results[f"serialize_{schema.__name__}.identical"] = (
+                    json.loads(results[f"standard.serialize_{schema.__name__}"]["body"])
+                    == json.loads(results[f"fast.serialize_{schema.__name__}"]["body"])
+                )
+        finally:
+            db.close()
+
+        results.update(asyncio.run(call_endpoints(app, settings, recorder, args.repeats, user_id, restaurant_id)))
+        recorder.stop()
+        throughput = {
+            name: ({key: value for key, value in result.items() if key != "body"} if isinstance(result, dict) else result)
+            for name, result in results.items()
+        }
+        report = build_report("serialization", vars(args), recorder, serialization=throughput)
+        write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
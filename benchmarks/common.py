@@ -0,0 +1,119 @@
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Settings the services refuse to start without; the benchmarks never talk to real providers
+BACKEND_ENV = {
+    "SECRET_KEY": "benchmark-secret",
+    "BACKEND_API_KEY": "benchmark-api-key",
+    "ADMIN_USERNAME": "admin",
+    "ADMIN_PASSWORD": "admin123",
+    "ALGORITHM": "HS256",
+    "LOG_LEVEL": "WARNING",
+}
+AGENTS_ENV = {
+    "API_BASE_URL": "http://backend.benchmark",
+    "GROQ_API_KEY": "unused",
+    "GOOGLE_API_KEY": "unused",
+    "DEFAULT_MODEL": "stub-model",
+    "BACKEND_API_KEY": "benchmark-api-key",
+    "PINECONE_API_KEY": "unused",
+    "LOG_LEVEL": "WARNING",
+    "STATE_STORE_URL": "memory://",
+}
+
+
+def use_service(name: str, env: Dict[str, str]) -> None:
+    """
+    Make the `app` package of `name` (backend or agents) importable and fill in
+    any settings it needs. Both services call their package `app`, so each
+    benchmark process loads exactly one of them.
+    """
+    for key, value in env.items():
+        os.environ.setdefault(key, value)
+    sys.path.insert(0, os.path.join(ROOT_DIR, name))
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class LatencyRecorder:
+    """
+    Collects per-operation latencies and errors and summarises them.
+    """
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def record(self, operation: str, seconds: float, ok: bool = True) -> None:
+        self.samples.setdefault(operation, []).append(seconds)
+        if not ok:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    def stop(self) -> None:
+        self.finished = time.perf_counter()
+
+    @property
+    def wall_time(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        wall_time = self.wall_time
+        summary = {}
+        for operation, samples in self.samples.items():
+            ordered = sorted(samples)
+            summary[operation] = {
+                "count": len(ordered),
+                "errors": self.errors.get(operation, 0),
+                "throughput_rps": round(len(ordered) / wall_time, 2) if wall_time else 0.0,
+                "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+                "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+                "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+            }
+        return summary
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(benchmark: str, config: Dict, recorder: LatencyRecorder, **extra) -> Dict:
+    return {
+        "benchmark": benchmark,
+        "git_commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": config,
+        "wall_time_s": round(recorder.wall_time, 3),
+        "results": recorder.summary(),
+        **extra,
+    }
+
+
+def write_report(report: Dict, output: Optional[str]) -> None:
+    payload = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(payload)
+    else:
+        print(payload)
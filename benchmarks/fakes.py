@@ -0,0 +1,221 @@
+"""
+Stand-ins for the external services used by the agents service: the LLM
+providers, Pinecone (embedding + vector query) and the backend API.
+Each one sleeps for a configurable simulated latency so the benchmarks
+exercise the real request path without network calls or API quotas.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from typing import Dict, List
+
+import httpx
+
+BOOKING_WORDS = ("book", "reserve", "reservation", "table", "confirm", "yes", "people", "guests", "pm", "am")
+FIND_WORDS = ("restaurant", "food", "eat", "cuisine", "recommend", "place", "specialt", "vegetarian", "dinner", "lunch")
+
+DATE_PATTERN = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+TIME_PATTERN = re.compile(r"\b(\d{1,2}:\d{2})\b")
+PARTY_PATTERN = re.compile(r"\b(\d+)\s*(?:people|guests|persons)\b", re.IGNORECASE)
+
+
+class LatencyModel:
+    """
+    Normally distributed latency in seconds, never below zero.
+    """
+    def __init__(self, mean_ms: float, jitter_ms: float = 0.0, seed: int = 0):
+        self.mean = mean_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.rng = random.Random(seed)
+
+    def sample(self) -> float:
+        if not self.jitter:
+            return self.mean
+        return max(0.0, self.rng.gauss(self.mean, self.jitter))
+
+
+class FakeLLMResponder:
+    """
+    Responder for app.core.utils.llm_providers.StubProvider.
+    Recognises which prompt it is answering from the system message and returns a
+    plausible, deterministic response.
+    """
+    def __init__(self, restaurant_names: List[str]):
+        from app.core.utils import prompts
+        self.prompts = prompts
+        self.restaurant_names = restaurant_names
+
+    def __call__(self, messages: List[Dict[str, str]], is_json: bool, response_schema=None):
+        system_prompt = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+        conversation = "\n".join(message["content"] for message in messages[1:])
+        last_message = messages[-1]["content"] if messages else ""
+
+        if system_prompt == self.prompts.intent_classifier_prompt:
+            response = {"category": self._classify(last_message)}
+        elif system_prompt == self.prompts.similarity_search_filter_prompt:
+            response = ", ".join(word for word in re.findall(r"[A-Za-z]+", last_message) if len(word) > 3)
+        elif system_prompt == self.prompts.reservation_details_extraction_prompt:
+            response = self._extract_details(conversation)
+        elif system_prompt.startswith(self.prompts.find_restaurant_prompt):
+            response = f"I recommend **{self.restaurant_names[0]}**. It's a great fit for what you asked."
+        else:
+            response = "Could you tell me a little more about your reservation?"
+        return response
+
+    def _classify(self, message: str) -> str:
+        lowered = message.lower()
+        if any(word in lowered for word in BOOKING_WORDS) or DATE_PATTERN.search(lowered) or TIME_PATTERN.search(lowered):
+            return "MAKE_RESERVATION"
+        if any(word in lowered for word in FIND_WORDS):
+            return "FIND_RESTAURANT"
+        return "OTHER"
+
+    def _extract_details(self, conversation: str) -> Dict:
+        restaurant = next((name for name in self.restaurant_names if name.lower() in conversation.lower()), None)
+        date = DATE_PATTERN.findall(conversation)
+        times = TIME_PATTERN.findall(conversation)
+        party = PARTY_PATTERN.findall(conversation)
+        user_lines = [line for line in conversation.splitlines() if line.startswith("user:")]
+        confirmed = bool(user_lines) and any(word in user_lines[-1].lower() for word in ("yes", "confirm", "go ahead"))
+        return {
+            "restaurant_name": restaurant,
+            "date": date[-1] if date else None,
+            "time": times[-1] if times else None,
+            "party_size": int(party[-1]) if party else None,
+            "has_user_confirmed": confirmed,
+        }
+
+
+class _FakeIndex:
+    def __init__(self, records: List[Dict], latency: LatencyModel):
+        self.records = records
+        self.latency = latency
+
+    def query(self, namespace=None, vector=None, filter=None, top_k=5, include_metadata=True, **kwargs):
+        time.sleep(self.latency.sample())
+        scored = [
+            {"id": record["id"], "score": sum(a * b for a, b in zip(vector, record["values"])), "metadata": record["metadata"]}
+            for record in self.records
+        ]
+        scored.sort(key=lambda match: match["score"], reverse=True)
+        return {"matches": scored[:top_k], "namespace": namespace}
+
+    def upsert(self, vectors, namespace=None, **kwargs):
+        time.sleep(self.latency.sample())
+        by_id = {record["id"]: record for record in self.records}
+        for vector in vectors:
+            by_id[vector["id"]] = vector
+        self.records = list(by_id.values())
+
+    def list(self, namespace=None, limit=100, **kwargs):
+        ids = [record["id"] for record in self.records]
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def fetch(self, ids, namespace=None, **kwargs):
+        wanted = set(ids)
+        return {"vectors": {record["id"]: record for record in self.records if record["id"] in wanted}, "namespace": namespace}
+
+    def delete(self, ids=None, namespace=None, **kwargs):
+        time.sleep(self.latency.sample())
+        unwanted = set(ids or ())
+        self.records = [record for record in self.records if record["id"] not in unwanted]
+
+    def describe_index_stats(self):
+        return {"namespaces": {"restaurants": {"vector_count": len(self.records)}}}
+
+
+class _FakeInference:
+    def __init__(self, dimension: int, latency: LatencyModel):
+        self.dimension = dimension
+        self.latency = latency
+
+    def vector(self, text: str) -> List[float]:
+        # Deterministic pseudo-embedding: hashed bag of words, L2-normalised
+        values = [0.0] * self.dimension
+        for word in re.findall(r"[a-z]+", text.lower()):
+            values[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dimension] += 1.0
+        norm = math.sqrt(sum(value * value for value in values)) or 1.0
+        return [value / norm for value in values]
+
+    def embed(self, model=None, inputs=None, parameters=None):
+        time.sleep(self.latency.sample())
+        return [{"values": self.vector(text)} for text in inputs]
+
+
+class FakePinecone:
+    """
+    Minimal stand-in for the Pinecone client surface used by app.core.vector_store.
+    """
+    def __init__(self, restaurants: List[Dict], embed_latency: LatencyModel, query_latency: LatencyModel, dimension: int = 256):
+        self.inference = _FakeInference(dimension, embed_latency)
+        records = [
+            {
+                "id": str(restaurant["id"]),
+                "values": self.inference.vector(restaurant["text_for_embedding"]),
+                "metadata": {
+                    "name": restaurant["name"],
+                    "cuisine": restaurant["cuisine"],
+                    "area": restaurant["area"],
+                    "price_range": restaurant["price_range"],
+                    "ambiance": restaurant["ambiance"],
+                    "description": restaurant["description"],
+                    "specialties": restaurant["specialties"],
+                    "dietary_options": restaurant["dietary_options"],
+                    "features": restaurant["features"],
+                    **{key: restaurant["contact"][key] for key in ("phone", "address", "email", "website", "hours", "reservation_required")},
+                },
+            }
+            for restaurant in restaurants
+        ]
+        self._index = _FakeIndex(records, query_latency)
+
+    def has_index(self, name):
+        return True
+
+    def Index(self, name):
+        return self._index
+
+
+def fake_backend_transport(latency: LatencyModel, restaurants: List[Dict] = (), tables: int = 10) -> httpx.MockTransport:
+    """
+    httpx transport that answers the backend endpoints used by the agents service.
+    Every restaurant has `tables` free tables in every half-hour slot.
+    """
+    reservation_ids = iter(range(1, 10 ** 9))
+    catalog = [
+        {"restaurant_id": restaurant["id"], "restaurant_name": restaurant["name"], "restaurant_description": restaurant["description"], "total_tables": tables, "booked_tables": 0}
+        for restaurant in restaurants
+    ]
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency.sample())
+        path = request.url.path
+        if request.method == "GET" and re.fullmatch(r"/users/\d+", path):
+            user_id = int(path.rsplit("/", 1)[1])
+            return httpx.Response(200, json={"user_id": user_id, "name": "Bench User", "email": f"bench{user_id}@example.com", "ai_preferences": None})
+        if request.method == "GET" and path == "/restaurants/":
+            skip, limit = int(request.url.params.get("skip", 0)), int(request.url.params.get("limit", 100))
+            page = catalog[skip:skip + limit]
+            return httpx.Response(200, json=page) if page else httpx.Response(404, json={"detail": "No restaurants found"})
+        if request.method == "GET" and re.fullmatch(r"/restaurants/\d+/availability", path):
+            return httpx.Response(200, json={f"{hour:02d}:{minute:02d}": tables for hour in range(9, 23) for minute in (0, 30)})
+        if request.method == "POST" and path == "/book-restaurant/":
+            body = json.loads(request.content)
+            return httpx.Response(200, json={
+                "reservation_id": next(reservation_ids),
+                "restaurant_name": body["restaurant_name"],
+                "date": body["date"],
+                "time": body["time"],
+                "guests": body["guests"],
+                "status": "Confirmed",
+                "reservation_code": "BENCH1",
+                "message": "Reservation confirmed",
+            })
+        return httpx.Response(404, json={"detail": "Not found"})
+
+    return httpx.MockTransport(handler)
@@ -0,0 +1,94 @@
+"""
+Run the backend and agents benchmarks and merge their reports into one JSON
+file that can be compared across commits.
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --output bench.json --compare baseline.json --fail-threshold 10
+    python -m benchmarks.run --agents-args "--sessions 200 --llm-latency-ms 400"
+
+Each benchmark runs in its own interpreter because both services ship a
+top-level package named `app`.
+"""
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from .common import ROOT_DIR, git_commit
+
+BENCHMARKS = {
+    "backend": "benchmarks.bench_backend",
+    "agents": "benchmarks.bench_agents",
+    "allocation": "benchmarks.bench_allocation",
+    "serialization": "benchmarks.bench_serialization",
+}
+
+
+def run_benchmark(module: str, extra_args: List[str]) -> Dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output = os.path.join(tmp_dir, "report.json")
+        subprocess.run([sys.executable, "-m", module, "--output", output, *extra_args], cwd=ROOT_DIR, check=True)
+        with open(output) as f:
+            return json.load(f)
+
+
+def compare(current: Dict, baseline: Dict, threshold_pct: float) -> List[str]:
+    """
+    Print p95 and throughput changes per operation and return the regressions
+    that exceed `threshold_pct`.
+    """
+    regressions = []
+    for name, report in current["benchmarks"].items():
+        base_results = baseline.get("benchmarks", {}).get(name, {}).get("results", {})
+        for operation, result in report["results"].items():
+            base = base_results.get(operation)
+            if not base:
+                continue
+            p95_change = (result["p95_ms"] - base["p95_ms"]) / base["p95_ms"] * 100 if base["p95_ms"] else 0.0
+            rps_change = (result["throughput_rps"] - base["throughput_rps"]) / base["throughput_rps"] * 100 if base["throughput_rps"] else 0.0
+            print(f"{name}.{operation:<28} p95 {base['p95_ms']:>9.2f} -> {result['p95_ms']:>9.2f} ms ({p95_change:+6.1f}%)"
+                  f"  rps {base['throughput_rps']:>8.2f} -> {result['throughput_rps']:>8.2f} ({rps_change:+6.1f}%)")
+            if p95_change > threshold_pct:
+                regressions.append(f"{name}.{operation} p95 {p95_change:+.1f}%")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the FoodieSpot benchmark suite.")
+    parser.add_argument("--only", choices=sorted(BENCHMARKS), action="append", help="Run only these benchmarks")
+    for name in BENCHMARKS:
+        parser.add_argument(f"--{name}-args", default="", help=f"Extra arguments for the {name} benchmark")
+    parser.add_argument("--output", default="bench_output.json", help="Combined JSON report")
+    parser.add_argument("--compare", help="Baseline report to compare against")
+    parser.add_argument("--fail-threshold", type=float, default=None, help="Exit non-zero if any p95 regresses by more than this percentage")
+    args = parser.parse_args()
+
+    report = {
+        "git_commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "benchmarks": {
+            name: run_benchmark(module, shlex.split(getattr(args, f"{name}_args")))
+            for name, module in BENCHMARKS.items()
+            if not args.only or name in args.only
+        },
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.fail_threshold if args.fail_threshold is not None else float("inf"))
+        if regressions:
+            print("Regressions: " + ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()